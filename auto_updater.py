@@ -11,16 +11,26 @@ import time
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from extractor.text_chunker import chunk_text, get_embedding
+
+# Cargar variables de entorno antes de importar utils (sus módulos leen la configuración al importarse)
+load_dotenv()
+
+from extractor.text_chunker import chunk_text_iter
 from extractor.extractor_ocr import needs_ocr, extract_text_with_ocr_if_needed
-from utils.text_extractor import extract_text_from_file
-from uuid import uuid4
+from utils.text_extractor import iter_text_segments, read_head, segment_separator
 from typing import Optional
 from dropbox_auth_manager import get_dropbox_client, test_dropbox_connection
 from metadata_enricher import enrich_document_metadata, generate_document_summary
 from initial_document_analysis import InitialDocumentAnalyzer
 from weekly_document_monitor import WeeklyDocumentMonitor
+from utils.answer_cache import bump_index_version
+from utils.upsert_writer import UpsertWriter
+from utils.chunk_manifest import get_chunk_manifest, apply_delta
+from utils.document_store import get_document_store, vector_metadata
+from utils.embedding_config import EMBEDDING_DIMENSIONS
+from utils.vector_store import get_vector_store
+from utils.metrics import span, register_stats_gauge, start_metrics_server
+from utils.embedding_service import get_embedding_service, describe_reuse
 
 # Configurar logging
 logging.basicConfig(
@@ -33,9 +43,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Cargar variables de entorno
-load_dotenv()
-
 # Configuración
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
@@ -56,13 +63,26 @@ FOLDER_PATHS = [
 # Carpeta principal para compatibilidad
 FOLDER_PATH = "/Leopoldo Bassoco Nova/IA/PRUEBAS/VIZUM TECHNOLOGIES"
 
-# Inicializar Pinecone
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX_NAME)
+# Inicializar almacén vectorial (Pinecone o local según VECTOR_STORE_BACKEND)
+index = get_vector_store()
 
-# Inicializar analizadores
-initial_analyzer = InitialDocumentAnalyzer()
-weekly_monitor = WeeklyDocumentMonitor()
+# Analizadores (se crean en el primer uso)
+_initial_analyzer: Optional[InitialDocumentAnalyzer] = None
+_weekly_monitor: Optional[WeeklyDocumentMonitor] = None
+
+def get_initial_analyzer() -> InitialDocumentAnalyzer:
+    """Obtener el analizador inicial compartido"""
+    global _initial_analyzer
+    if _initial_analyzer is None:
+        _initial_analyzer = InitialDocumentAnalyzer()
+    return _initial_analyzer
+
+def get_weekly_monitor() -> WeeklyDocumentMonitor:
+    """Obtener el monitor semanal compartido"""
+    global _weekly_monitor
+    if _weekly_monitor is None:
+        _weekly_monitor = WeeklyDocumentMonitor()
+    return _weekly_monitor
 
 def is_supported_file(filename):
     """Verificar si el archivo es compatible"""
@@ -82,71 +102,101 @@ def process_file(file_path):
         dbx = get_dropbox_client()
         
         # Descargar archivo
-        _, res = dbx.files_download(file_path)
         local_path = f"/tmp/{os.path.basename(file_path)}"
+        with span("ingesta", "descarga"):
+            _, res = dbx.files_download(file_path)
+            with open(local_path, "wb") as f:
+                f.write(res.content)
         
-        with open(local_path, "wb") as f:
-            f.write(res.content)
-        
-        # Extraer texto
+        # Extraer texto: el inicio del documento alimenta el resumen y los metadatos; el resto
+        # se extrae por segmentos mientras se generan los chunks
         if needs_ocr(file_path):
             logger.info(f"🔍 Archivo {file_path} requiere OCR")
-            text = extract_text_with_ocr_if_needed(local_path)
+            with span("ingesta", "ocr"):
+                text = extract_text_with_ocr_if_needed(local_path)
+            head, segments = text, iter([text])
+            separator = "\n\n"
         else:
-            text = extract_text_from_file(local_path)
+            with span("ingesta", "extraccion"):
+                separator = segment_separator(local_path)
+                head, segments = read_head(iter_text_segments(local_path), separator=separator)
         
-        if not text.strip():
+        if not head.strip():
             logger.warning(f"⚠️ No se pudo extraer texto del archivo {file_path}")
             return False
         
-        # Generar resumen ejecutivo del documento completo
+        # Generar resumen ejecutivo del documento
         filename = os.path.basename(file_path)
         logger.info(f"📝 Generando resumen ejecutivo para {filename}")
-        resumen_ejecutivo = generate_document_summary(text, filename)
+        with span("ingesta", "resumen"):
+            resumen_ejecutivo = generate_document_summary(head, filename)
         
-        # Dividir en chunks
-        chunks = chunk_text(text)
         cliente = get_cliente_from_path(file_path)
         
         # Enriquecer metadatos del documento
         logger.info(f"🔍 Enriqueciendo metadatos para {filename}")
-        enriched_metadata = enrich_document_metadata(text, filename, file_path, cliente)
-        
-        # Subir chunks a Pinecone con metadatos enriquecidos
-        for i, chunk in enumerate(chunks):
-            try:
-                embedding = get_embedding(chunk)
-                
-                # Combinar metadatos básicos con enriquecidos
-                chunk_metadata = {
-                    "cliente": cliente,
-                    "nombre_archivo": filename,
-                    "ruta": file_path,
-                    "chunk_index": i,
-                    "texto": chunk,
-                    "procesado_con_ocr": needs_ocr(file_path),
-                    "fecha_procesamiento": datetime.now().isoformat(),
-                    "tipo_actualizacion": "automatica",
-                    "resumen_ejecutivo_documento": resumen_ejecutivo,
-                    "total_chunks": len(chunks),
-                    "chunk_actual": i + 1
-                }
-                
-                # Agregar metadatos enriquecidos
-                chunk_metadata.update(enriched_metadata)
+        with span("ingesta", "enriquecimiento"):
+            enriched_metadata = enrich_document_metadata(head, filename, file_path, cliente)
+        
+        # Metadatos del documento: se guardan una vez en el almacén local (el bot los une al
+        # responder) y cada vector lleva solo las llaves filtrables y el texto del chunk
+        document_metadata = {
+            **enriched_metadata,
+            "file_id": file_path,
+            "cliente": cliente,
+            "nombre_archivo": filename,
+            "ruta": file_path,
+            "procesado_con_ocr": needs_ocr(file_path),
+            "tipo_actualizacion": "automatica",
+            "resumen_ejecutivo_documento": resumen_ejecutivo
+        }
+        get_document_store().put(file_path, document_metadata)
+        
+        # Subir chunks a Pinecone con metadatos enriquecidos conforme se generan; con IDs estables
+        # solo los chunks nuevos o cambiados respecto al manifiesto del documento se generan y suben
+        manifest = get_chunk_manifest()
+        delta = manifest.delta(file_path)
+        # Los embeddings se generan por lotes en paralelo; un lote fallido aborta el documento
+        embedded_chunks = get_embedding_service().embed_tagged(delta.changed(chunk_text_iter(segments, separator=separator)))
+        # Los vectores se suben por lotes en paralelo; el resto se envía al cerrar el documento
+        with UpsertWriter(index) as writer:
+            for (i, vector_id), chunk, embedding in embedded_chunks:
+                try:
+                    chunk_metadata = vector_metadata({
+                        **document_metadata,
+                        "chunk_index": i,
+                        "texto": chunk,
+                        "fecha_procesamiento": datetime.now().isoformat(),
+                        "chunk_actual": i + 1
+                    })
                 
-                index.upsert(vectors=[{
-                    'id': str(uuid4()),
-                    'values': embedding,
-                    'metadata': chunk_metadata
-                }])
+                    vector = {
+                        'id': vector_id,
+                        'values': embedding,
+                        'metadata': chunk_metadata
+                    }
+                except Exception as e:
+                    logger.error(f"Error procesando chunk {i} de {file_path}: {e}")
+                    delta.skip(vector_id)
+                    continue
                 
-                logger.info(f"✅ Chunk {i+1}/{len(chunks)} de {filename} procesado con metadatos enriquecidos")
-                
-            except Exception as e:
-                logger.error(f"Error procesando chunk {i} de {file_path}: {e}")
+                # Un lote que falla tras los reintentos aborta el documento
+                writer.add(vector)
+                logger.info(f"✅ Chunk {i+1} de {filename} procesado con metadatos enriquecidos")
         
-        logger.info(f"✅ {file_path} procesado exitosamente ({len(chunks)} chunks con metadatos enriquecidos)")
+        logger.info(f"📤 {filename}: {writer.describe()}")
+        
+        # Borrar los chunks que ya no existen y guardar el manifiesto (los vectores anteriores
+        # al manifiesto se localizan por ruta)
+        apply_delta(index, manifest, delta, legacy_filter={"ruta": file_path}, dimension=EMBEDDING_DIMENSIONS)
+        chunk_count = len(delta.current)
+        logger.info(f"🔁 Delta de {filename}: {delta.describe()}")
+        
+        # Invalidar respuestas en caché generadas con el índice anterior
+        if delta.changed_count or delta.removed:
+            bump_index_version()
+        
+        logger.info(f"✅ {file_path} procesado exitosamente ({chunk_count} chunks con metadatos enriquecidos)")
         return True
         
     except Exception as e:
@@ -167,6 +217,7 @@ def scan_for_new_files():
         
         total_files = 0
         processed_files = 0
+        embedding_stats = get_embedding_service().stats()
         
         # Escanear cada carpeta configurada
         for folder_path in FOLDER_PATHS:
@@ -195,6 +246,7 @@ def scan_for_new_files():
         logger.info(f"   - Carpetas escaneadas: {len(FOLDER_PATHS)}")
         logger.info(f"   - Total de archivos encontrados: {total_files}")
         logger.info(f"   - Archivos procesados exitosamente: {processed_files}")
+        logger.info(f"   - ♻️ {describe_reuse(embedding_stats, get_embedding_service().stats())}")
         
         return processed_files
         
@@ -218,11 +270,11 @@ def weekly_update():
         
         # Ejecutar análisis semanal completo
         logger.info("🔄 Ejecutando análisis semanal completo...")
-        initial_analyzer.run_initial_analysis(force_full=False)
+        get_initial_analyzer().run_initial_analysis(force_full=False)
         
         # Generar reporte semanal
         logger.info("📄 Generando reporte semanal...")
-        weekly_report = weekly_monitor.generate_weekly_report()
+        weekly_report = get_weekly_monitor().generate_weekly_report()
         
         # Generar reporte adicional
         report = f"""
@@ -260,7 +312,7 @@ def initial_complete_analysis():
             return
         
         # Ejecutar análisis inicial completo
-        initial_analyzer.run_initial_analysis(force_full=True)
+        get_initial_analyzer().run_initial_analysis(force_full=True)
         
         logger.info("🎉 Análisis inicial completo finalizado")
         
@@ -277,7 +329,7 @@ def start_monitoring():
     logger.info("🚀 Iniciando monitoreo automático del sistema")
     
     # Verificar si es la primera ejecución
-    if not initial_analyzer.analysis_status.get("last_analysis"):
+    if not get_initial_analyzer().analysis_status.get("last_analysis"):
         logger.info("🆕 Primera ejecución detectada - Iniciando análisis inicial completo")
         initial_complete_analysis()
     
@@ -285,7 +337,7 @@ def start_monitoring():
     schedule.every().friday.at("00:01").do(weekly_update)
     
     # Programar verificación diaria de estado
-    schedule.every().day.at("09:00").do(weekly_monitor.daily_status_check)
+    schedule.every().day.at("09:00").do(get_weekly_monitor().daily_status_check)
     
     logger.info("✅ Monitoreo programado:")
     logger.info("   📅 Actualización semanal: Viernes 00:01")
@@ -311,6 +363,11 @@ def main():
     logger.info("📅 Análisis inicial completo: ✅ Disponible")
     logger.info("🔄 Seguimiento semanal: ✅ Activado")
     
+    # Endpoint /metrics con la latencia de cada etapa de la ingesta (si METRICS_PORT está definido)
+    register_stats_gauge("kawiil_embedding_service", "Peticiones, reintentos y fallos del servicio de embeddings",
+                         get_embedding_service().stats)
+    start_metrics_server()
+    
     # Verificar conexión inicial
     if not test_dropbox_connection():
         logger.error("❌ No se pudo conectar a Dropbox. Verifica la configuración.")
@@ -345,7 +402,7 @@ def main():
         
         elif option == "5":
             print("\n📊 Verificando estado del sistema...")
-            weekly_monitor.daily_status_check()
+            get_weekly_monitor().daily_status_check()
         
         else:
             print("❌ Opción no válida")
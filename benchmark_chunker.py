@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark del chunker de texto sobre documentos largos (p. ej. regulaciones de 500 páginas)
+Genera un documento sintético y mide el throughput de chunk_text. Con --layout pdf el texto
+imita la salida de extract_text_from_pdf (líneas de ~90 caracteres unidas con un salto simple,
+sin líneas en blanco); con --layout parrafos usa párrafos separados por líneas en blanco.
+
+Uso:
+    python benchmark_chunker.py                        # árbol actual
+    python benchmark_chunker.py --pages 500 --runs 3 --layout parrafos
+    python benchmark_chunker.py --baseline HEAD~1      # comparar contra otra revisión de git
+"""
+
+import os
+import sys
+import random
+import argparse
+import textwrap
+import statistics
+import subprocess
+import tempfile
+import time
+import importlib.util
+
+VOCABULARY = (
+    "la entidad deberá conservar los registros de operaciones relevantes inusuales e internas "
+    "preocupantes durante un plazo de diez años conforme a las disposiciones de carácter general "
+    "aplicables a los transmisores de dinero emitidas por la Secretaría de Hacienda y Crédito "
+    "Público en materia de prevención de lavado de dinero y financiamiento al terrorismo artículo "
+    "fracción inciso cliente usuario beneficiario controlador propietario real expediente "
+    "identificación verificación monitoreo transaccional matriz de riesgo oficial de cumplimiento"
+).split()
+
+
+def build_document(pages: int, layout: str = "pdf", seed: int = 42) -> str:
+    """Documento sintético de aproximadamente 3,000 caracteres por página"""
+    rng = random.Random(seed)
+
+    def sentence() -> str:
+        words = [rng.choice(VOCABULARY) for _ in range(rng.randint(8, 40))]
+        return " ".join(words).capitalize() + rng.choice([".", ".", ".", ";", "?"])
+
+    def paragraph(sentences: int) -> str:
+        return " ".join(sentence() for _ in range(sentences))
+
+    page_texts = []
+    for page in range(1, pages + 1):
+        parts = [f"Artículo {page}"]
+        if page % 7 == 0:
+            parts.append(paragraph(24))
+        else:
+            parts.extend(paragraph(rng.randint(2, 8)) for _ in range(3))
+        if layout == "pdf":
+            page_texts.append("\n".join(line for part in parts for line in textwrap.wrap(part, 90)))
+        else:
+            page_texts.append("\n\n".join(parts))
+    return ("\n" if layout == "pdf" else "\n\n").join(page_texts)
+
+
+def load_chunker(path: str):
+    spec = importlib.util.spec_from_file_location("text_chunker_benchmark", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.chunk_text
+
+
+def baseline_chunker(ref: str, directory: str):
+    """Cargar extractor/text_chunker.py de otra revisión de git"""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    source = subprocess.run(["git", "-C", repo, "show", f"{ref}:extractor/text_chunker.py"],
+                            check=True, capture_output=True, text=True).stdout
+    path = os.path.join(directory, "text_chunker_baseline.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+    return load_chunker(path)
+
+
+def measure(chunk_fn, text: str, max_tokens: int, runs: int) -> dict:
+    samples, chunks = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        chunks = chunk_fn(text, max_tokens=max_tokens)
+        samples.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(samples), "chunks": len(chunks)}
+
+
+def report(label: str, result: dict, pages: int, size: int):
+    seconds = result["seconds"]
+    print(f"{label:<10}{seconds:10.2f} s{pages / seconds:12.0f} pág/s"
+          f"{size / seconds / 1e6:10.2f} MB/s{result['chunks']:10d} chunks")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del chunker de texto")
+    parser.add_argument("--pages", type=int, default=500, help="Páginas del documento sintético (default: 500)")
+    parser.add_argument("--max-tokens", type=int, default=500, help="Tokens por chunk (default: 500)")
+    parser.add_argument("--runs", type=int, default=3, help="Repeticiones por chunker (default: 3)")
+    parser.add_argument("--layout", choices=["pdf", "parrafos"], default="pdf",
+                        help="Formato del texto: salida de PDF (default) o párrafos con líneas en blanco")
+    parser.add_argument("--baseline", help="Revisión de git contra la cual comparar (p. ej. HEAD~1)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from extractor.text_chunker import chunk_text
+
+    text = build_document(args.pages, args.layout)
+    size = len(text.encode("utf-8"))
+    print(f"✂️ Benchmark de chunking: {args.pages} páginas ({args.layout}), {size / 1e6:.1f} MB, "
+          f"max_tokens={args.max_tokens}")
+    print("=" * 70)
+
+    # Calentar el tokenizador para no medir su carga
+    chunk_text("calentamiento", max_tokens=args.max_tokens)
+    current = measure(chunk_text, text, args.max_tokens, args.runs)
+    report("Actual", current, args.pages, size)
+
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as directory:
+            baseline_fn = baseline_chunker(args.baseline, directory)
+            baseline_fn("calentamiento", max_tokens=args.max_tokens)
+            baseline = measure(baseline_fn, text, args.max_tokens, args.runs)
+        report("Base", baseline, args.pages, size)
+        print(f"\n🚀 Aceleración: {baseline['seconds'] / current['seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
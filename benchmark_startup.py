@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark del tiempo de importación del bot y de los scripts de línea de comandos
+Cada módulo se importa en un proceso nuevo (sin caché de módulos) y se reporta la mediana.
+
+Uso:
+    python benchmark_startup.py                      # árbol actual
+    python benchmark_startup.py --baseline HEAD~1    # comparar contra otra revisión de git
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+MODULES = [
+    "slack_bot",
+    "slack_bot_async",
+    "auto_updater",
+    "initial_document_analysis",
+    "enrich_existing_vectors",
+    "metadata_enricher",
+    "extractor.text_chunker",
+]
+
+# Valores ficticios para que la configuración a nivel de módulo no falle; sin red, cualquier
+# llamada de red al importar (p. ej. verificación del token de Slack) aparece como error o demora
+DUMMY_ENV = {
+    "SLACK_BOT_TOKEN": "xoxb-benchmark",
+    "SLACK_APP_TOKEN": "xapp-benchmark",
+    "SLACK_SIGNING_SECRET": "benchmark",
+    "OPENAI_API_KEY": "sk-benchmark",
+    "PINECONE_API_KEY": "benchmark",
+    "PINECONE_INDEX_NAME": "benchmark",
+}
+
+SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+try:
+    __import__({module!r})
+    error = None
+except BaseException as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+print("@@" + json.dumps({{"seconds": time.perf_counter() - start, "error": error}}))
+"""
+
+
+def measure(root: str, module: str, runs: int) -> dict:
+    """Importar un módulo en procesos nuevos y devolver la mediana en segundos"""
+    env = {**os.environ, **DUMMY_ENV}
+    samples, error = [], None
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            # Directorio de trabajo vacío: logs y bases SQLite no ensucian el repositorio
+            result = subprocess.run(
+                [sys.executable, "-c", SNIPPET.format(root=root, module=module)],
+                cwd=workdir, env=env, capture_output=True, text=True, timeout=300
+            )
+        lines = [line for line in result.stdout.splitlines() if line.startswith("@@")]
+        if not lines:
+            error = (result.stderr.strip().splitlines() or ["sin salida"])[-1]
+            break
+        data = json.loads(lines[-1][2:])
+        if data["error"]:
+            error = data["error"]
+        samples.append(data["seconds"])
+    return {
+        "median": statistics.median(samples) if samples else None,
+        "error": error
+    }
+
+
+def run_suite(root: str, runs: int) -> dict:
+    return {module: measure(root, module, runs) for module in MODULES}
+
+
+def baseline_suite(ref: str, runs: int) -> dict:
+    """Medir otra revisión en un worktree temporal de git"""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as directory:
+        worktree = os.path.join(directory, "baseline")
+        subprocess.run(["git", "-C", repo, "worktree", "add", "--detach", worktree, ref],
+                       check=True, capture_output=True)
+        try:
+            return run_suite(worktree, runs)
+        finally:
+            subprocess.run(["git", "-C", repo, "worktree", "remove", "--force", worktree], capture_output=True)
+
+
+def format_seconds(value) -> str:
+    return f"{value * 1000:8.0f} ms" if value is not None else "       -   "
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de tiempo de importación")
+    parser.add_argument("--runs", type=int, default=5, help="Importaciones por módulo (default: 5)")
+    parser.add_argument("--baseline", help="Revisión de git contra la cual comparar (p. ej. HEAD~1)")
+    args = parser.parse_args()
+
+    print("⏱️ Benchmark de arranque (mediana de importación en procesos nuevos)")
+    print("=" * 70)
+
+    current = run_suite(os.path.dirname(os.path.abspath(__file__)), args.runs)
+    baseline = baseline_suite(args.baseline, args.runs) if args.baseline else None
+
+    header = f"{'Módulo':<28}{'Actual':>12}"
+    if baseline:
+        header += f"{'Base':>12}{'Fracción':>10}"
+    print(header)
+
+    for module in MODULES:
+        row = f"{module:<28}{format_seconds(current[module]['median']):>12}"
+        if baseline:
+            base = baseline[module]["median"]
+            now = current[module]["median"]
+            ratio = f"{now / base:9.0%}" if base and now else "        -"
+            row += f"{format_seconds(base):>12}{ratio:>10}"
+        print(row)
+        for label, results in (("actual", current), ("base", baseline)):
+            if results and results[module]["error"]:
+                print(f"   ⚠️ [{label}] {results[module]['error'][:90]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,10 @@ import sys
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
+
+# Cargar variables de entorno antes de importar utils (sus módulos leen la configuración al importarse)
+load_dotenv()
+
 from metadata_enricher import enrich_existing_vectors, generate_folder_report
 
 # Configurar logging
@@ -1,29 +1,39 @@
-# Este archivo hace que extractor sea un paquete Python 
-from .extractor_pdf import extract_text_from_pdf
-from .extractor_word import extract_text_from_word
-from .extractor_excel import extract_text_from_excel
-from .extractor_csv import extract_text_from_csv
-from .extractor_pptx import extract_text_from_pptx
-from .extractor_ocr import (
-    extract_text_from_image,
-    extract_text_from_pdf_with_ocr,
-    needs_ocr,
-    extract_text_with_ocr_if_needed
-)
-from .text_chunker import chunk_text
-from .pinecone_uploader import upload_chunks_to_pinecone, query_pinecone
+# Este archivo hace que extractor sea un paquete Python
+# Los submódulos se importan al primer acceso (PEP 562) para no cargar pandas, PyMuPDF,
+# python-pptx, pytesseract ni pdf2image cuando solo se necesita, p. ej., text_chunker.
+import importlib
 
-__all__ = [
-    'extract_text_from_pdf',
-    'extract_text_from_word', 
-    'extract_text_from_excel',
-    'extract_text_from_csv',
-    'extract_text_from_pptx',
-    'extract_text_from_image',
-    'extract_text_from_pdf_with_ocr',
-    'needs_ocr',
-    'extract_text_with_ocr_if_needed',
-    'chunk_text',
-    'upload_chunks_to_pinecone',
-    'query_pinecone'
-] 
\ No newline at end of file
+_EXPORTS = {
+    'extract_text_from_pdf': 'extractor_pdf',
+    'extract_text_from_word': 'extractor_word',
+    'extract_text_from_excel': 'extractor_excel',
+    'extract_text_from_csv': 'extractor_csv',
+    'extract_text_from_pptx': 'extractor_pptx',
+    'extract_text_from_image': 'extractor_ocr',
+    'extract_text_from_pdf_with_ocr': 'extractor_ocr',
+    'needs_ocr': 'extractor_ocr',
+    'extract_text_with_ocr_if_needed': 'extractor_ocr',
+    'iter_pdf_pages': 'extractor_pdf',
+    'iter_word_paragraphs': 'extractor_word',
+    'iter_excel_sheets': 'extractor_excel',
+    'iter_pptx_slides': 'extractor_pptx',
+    'chunk_text': 'text_chunker',
+    'chunk_text_iter': 'text_chunker',
+    'upload_chunks_to_pinecone': 'pinecone_uploader',
+    'query_pinecone': 'pinecone_uploader'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
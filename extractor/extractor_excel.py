@@ -1,6 +1,6 @@
 import pandas as pd  # type: ignore
 import os
-from typing import List
+from typing import Iterator, List
 
 def extract_text_from_excel(path: str) -> str:
     """
@@ -17,33 +17,47 @@ def extract_text_from_excel(path: str) -> str:
         
         # Recorrer cada hoja
         for sheet_name in excel_file.sheet_names:
-            try:
-                # Leer la hoja actual
-                df = pd.read_excel(path, sheet_name=sheet_name, header=None, na_filter=False)
-                
-                # Agregar el nombre de la hoja como título
-                sheet_text = [f"=== HOJA: {sheet_name} ==="]
-                
-                # Convertir el DataFrame a texto
-                for index, row in df.iterrows():
-                    # Convertir cada fila a texto con tabuladores como separadores
-                    row_text = "\t".join(str(cell) for cell in row)
-                    if row_text.strip():  # Solo agregar filas que no estén vacías
-                        sheet_text.append(row_text)
-                
-                # Agregar un separador entre hojas
-                sheet_text.append("")  # Línea en blanco
-                all_text.extend(sheet_text)
-                
-            except Exception as e:
-                # Si hay error en una hoja específica, continuar con la siguiente
-                error_msg = f"Error al procesar la hoja '{sheet_name}': {str(e)}"
-                all_text.append(error_msg)
-                continue
+            all_text.extend(_sheet_lines(path, sheet_name))
         
         # Unir todo el texto
         full_text = "\n".join(all_text)
         return full_text
         
     except Exception as e:
-        return f"Error al leer el archivo Excel: {str(e)}" 
\ No newline at end of file
+        return f"Error al leer el archivo Excel: {str(e)}"
+
+def _sheet_lines(path: str, sheet_name: str) -> List[str]:
+    """Líneas de texto de una hoja (título, filas no vacías y una línea en blanco final)"""
+    try:
+        # Leer la hoja actual
+        df = pd.read_excel(path, sheet_name=sheet_name, header=None, na_filter=False)
+        
+        # Agregar el nombre de la hoja como título
+        sheet_text = [f"=== HOJA: {sheet_name} ==="]
+        
+        # Convertir el DataFrame a texto
+        for index, row in df.iterrows():
+            # Convertir cada fila a texto con tabuladores como separadores
+            row_text = "\t".join(str(cell) for cell in row)
+            if row_text.strip():  # Solo agregar filas que no estén vacías
+                sheet_text.append(row_text)
+        
+        # Agregar un separador entre hojas
+        sheet_text.append("")  # Línea en blanco
+        return sheet_text
+        
+    except Exception as e:
+        # Si hay error en una hoja específica, continuar con la siguiente
+        return [f"Error al procesar la hoja '{sheet_name}': {str(e)}"]
+
+def iter_excel_sheets(path: str) -> Iterator[str]:
+    """
+    Genera el texto de cada hoja de un archivo .xlsx, una hoja a la vez.
+    Args:
+        path (str): Ruta al archivo .xlsx.
+    Yields:
+        str: Texto de cada hoja.
+    """
+    excel_file = pd.ExcelFile(path, engine='openpyxl')
+    for sheet_name in excel_file.sheet_names:
+        yield "\n".join(_sheet_lines(path, sheet_name)).strip()
@@ -1,7 +1,4 @@
 import os
-import pytesseract
-from PIL import Image
-import pdf2image
 import tempfile
 from typing import List, Optional
 import logging
@@ -21,6 +18,10 @@ def extract_text_from_image(image_path: str) -> str:
         Texto extraído de la imagen
     """
     try:
+        # Dependencias de OCR cargadas solo al procesar una imagen
+        import pytesseract
+        from PIL import Image
+        
         # Abrir la imagen
         image = Image.open(image_path)
         
@@ -45,6 +46,9 @@ def extract_text_from_pdf_with_ocr(pdf_path: str) -> str:
         Texto extraído del PDF
     """
     try:
+        import pytesseract
+        import pdf2image
+        
         # Convertir PDF a imágenes
         images = pdf2image.convert_from_path(pdf_path)
         
@@ -1,6 +1,6 @@
 import fitz  # type: ignore  # PyMuPDF
 import re
-from typing import List
+from typing import Iterator, List
 
 def extract_text_from_pdf(path: str) -> str:
     """
@@ -46,4 +46,84 @@ def extract_text_from_pdf(path: str) -> str:
     full_text = "\n".join(cleaned_pages)
     # Limpieza adicional: eliminar múltiples saltos de línea
     full_text = re.sub(r'\n{2,}', '\n\n', full_text)
-    return full_text 
\ No newline at end of file
+    return full_text 
+
+# Páginas usadas para detectar encabezados y pies repetidos en modo streaming
+HEADER_SAMPLE_PAGES = 20
+# Separador para chunk_text_iter: los segmentos de iter_pdf_pages ya traen el salto entre páginas
+PDF_SEGMENT_SEPARATOR = ""
+
+
+def iter_pdf_pages(path: str) -> Iterator[str]:
+    """
+    Genera el texto limpio de un PDF página por página, sin cargar el documento completo en memoria.
+    El encabezado y el pie repetidos se detectan sobre las primeras HEADER_SAMPLE_PAGES páginas.
+    Los segmentos ya incluyen el salto de línea entre páginas y la misma limpieza de saltos que
+    extract_text_from_pdf: concatenados sin separador (PDF_SEGMENT_SEPARATOR) reproducen su texto,
+    así los chunks, sus IDs y hashes de contenido no cambian respecto a la extracción completa.
+    Args:
+        path (str): Ruta al archivo PDF.
+    Yields:
+        str: Texto de cada página (las páginas sin texto se unen a la siguiente).
+    """
+    doc = fitz.open(path)
+    try:
+        previous = None
+        pending = ""
+        first = True
+        for page_text in _iter_clean_pages(doc):
+            # Los saltos repetidos pueden cruzar el límite entre páginas: el espacio en blanco final
+            # queda pendiente hasta la siguiente página
+            pending = re.sub(r'\n{2,}', '\n\n', pending + ("" if first else "\n") + page_text)
+            first = False
+            text = pending.rstrip()
+            if text:
+                if previous is not None:
+                    yield previous
+                previous = text
+                pending = pending[len(text):]
+        # El espacio en blanco final también cuenta para el último chunk
+        if previous is not None:
+            yield previous + pending
+    finally:
+        doc.close()
+
+
+def _iter_clean_pages(doc) -> Iterator[str]:
+    """Líneas de cada página sin el encabezado ni el pie repetidos (como en extract_text_from_pdf)"""
+    sample = []
+    header_candidates = {}
+    footer_candidates = {}
+    header = footer = None
+
+    def clean(lines: List[str]) -> str:
+        if header and lines and lines[0].strip() == header:
+            lines = lines[1:]
+        if footer and lines and lines[-1].strip() == footer:
+            lines = lines[:-1]
+        return "\n".join(lines)
+
+    for page_num in range(len(doc)):
+        lines = doc.load_page(page_num).get_text("text").splitlines()
+        if not lines:
+            continue
+        if sample is None:
+            yield clean(lines)
+            continue
+
+        sample.append(lines)
+        header_candidates[lines[0].strip()] = header_candidates.get(lines[0].strip(), 0) + 1
+        footer_candidates[lines[-1].strip()] = footer_candidates.get(lines[-1].strip(), 0) + 1
+        if len(sample) == HEADER_SAMPLE_PAGES:
+            header = max(header_candidates, key=lambda k: header_candidates[k])
+            footer = max(footer_candidates, key=lambda k: footer_candidates[k])
+            for sampled in sample:
+                yield clean(sampled)
+            sample = None
+
+    # Documentos con menos páginas que la muestra
+    if sample:
+        header = max(header_candidates, key=lambda k: header_candidates[k])
+        footer = max(footer_candidates, key=lambda k: footer_candidates[k])
+        for sampled in sample:
+            yield clean(sampled)
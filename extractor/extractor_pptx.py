@@ -1,5 +1,5 @@
 from pptx import Presentation  # type: ignore
-from typing import List
+from typing import Iterator, List
 
 def extract_text_from_pptx(path: str) -> str:
     """
@@ -15,35 +15,57 @@ def extract_text_from_pptx(path: str) -> str:
         all_text = []
         
         # Recorrer cada diapositiva
-        for slide_num, slide in enumerate(prs.slides, 1):
-            slide_text = []
-            
-            # Agregar título de la diapositiva
-            slide_text.append(f"=== DIAPOSITIVA {slide_num} ===")
-            
-            # Extraer texto de cada forma en la diapositiva
-            for shape in slide.shapes:
-                # Verificar si la forma tiene texto
-                if hasattr(shape, "text") and shape.text.strip():
-                    slide_text.append(shape.text.strip())
-                
-                # Verificar si la forma es una tabla
-                if shape.has_table:
-                    table = shape.table
-                    for row in table.rows:
-                        row_text = []
-                        for cell in row.cells:
-                            if cell.text.strip():
-                                row_text.append(cell.text.strip())
-                        if row_text:
-                            slide_text.append(" | ".join(row_text))
-            
-            # Unir todo el texto de la diapositiva
-            if len(slide_text) > 1:  # Si hay más que solo el título
-                all_text.append("\n".join(slide_text))
+        for slide_text in iter_pptx_slides(path, prs):
+            all_text.append(slide_text)
         
         # Unir todo el texto de todas las diapositivas
         return "\n\n".join(all_text)
         
     except Exception as e:
-        return f"Error al procesar el archivo PowerPoint: {str(e)}" 
\ No newline at end of file
+        return f"Error al procesar el archivo PowerPoint: {str(e)}" 
+
+def _slide_text(slide_num: int, slide) -> str:
+    """Texto visible de una diapositiva (vacío si solo tiene el título)"""
+    slide_text = []
+    
+    # Agregar título de la diapositiva
+    slide_text.append(f"=== DIAPOSITIVA {slide_num} ===")
+    
+    # Extraer texto de cada forma en la diapositiva
+    for shape in slide.shapes:
+        # Verificar si la forma tiene texto
+        if hasattr(shape, "text") and shape.text.strip():
+            slide_text.append(shape.text.strip())
+        
+        # Verificar si la forma es una tabla
+        if shape.has_table:
+            table = shape.table
+            for row in table.rows:
+                row_text = []
+                for cell in row.cells:
+                    if cell.text.strip():
+                        row_text.append(cell.text.strip())
+                if row_text:
+                    slide_text.append(" | ".join(row_text))
+    
+    # Unir todo el texto de la diapositiva
+    if len(slide_text) > 1:  # Si hay más que solo el título
+        return "\n".join(slide_text)
+    return ""
+
+
+def iter_pptx_slides(path: str, prs=None) -> Iterator[str]:
+    """
+    Genera el texto de cada diapositiva con contenido de un archivo .pptx.
+    Args:
+        path (str): Ruta al archivo .pptx.
+        prs: Presentación ya abierta (opcional).
+    Yields:
+        str: Texto de cada diapositiva.
+    """
+    if prs is None:
+        prs = Presentation(path)
+    for slide_num, slide in enumerate(prs.slides, 1):
+        text = _slide_text(slide_num, slide)
+        if text:
+            yield text
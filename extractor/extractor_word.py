@@ -1,6 +1,6 @@
 from docx import Document  # type: ignore
 import re
-from typing import List
+from typing import Iterator, List
 
 def extract_text_from_word(path: str) -> str:
     """
@@ -29,4 +29,18 @@ def extract_text_from_word(path: str) -> str:
     # Eliminar espacios en blanco al inicio y final
     full_text = full_text.strip()
     
-    return full_text 
\ No newline at end of file
+    return full_text 
+
+def iter_word_paragraphs(path: str) -> Iterator[str]:
+    """
+    Genera los párrafos no vacíos de un archivo .docx, uno por uno.
+    Args:
+        path (str): Ruta al archivo .docx.
+    Yields:
+        str: Texto de cada párrafo.
+    """
+    doc = Document(path)
+    for paragraph in doc.paragraphs:
+        text = paragraph.text.strip()
+        if text:
+            yield text
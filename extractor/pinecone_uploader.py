@@ -1,13 +1,22 @@
 from dotenv import load_dotenv  # NUEVO: para cargar variables de entorno
 import os
-from openai import OpenAI  # NUEVO: importar OpenAI client
-from pinecone import Pinecone  # NUEVO: importar la nueva versión de Pinecone
-from typing import List, Dict
-import uuid
+import json
+from typing import List, Dict, Optional
 from datetime import datetime
 import certifi
 import ssl
-import openai
+
+# Cargar variables de entorno desde .env (antes de importar utils: leen la configuración al importarse)
+load_dotenv()
+
+from utils.openai_client import get_openai_client
+from utils.embedding_service import get_embedding_service
+from utils.embedding_config import EMBEDDING_DIMENSIONS
+from utils.answer_cache import bump_index_version
+from utils.upsert_writer import UpsertWriter
+from utils.chunk_manifest import chunk_id
+from utils.extraction_cache import get_extraction_cache, content_hash
+from utils.vector_store import get_vector_store, VECTOR_STORE_BACKEND
 
 # Configurar SSL para MacOS
 os.environ["SSL_CERT_FILE"] = certifi.where()
@@ -18,17 +27,21 @@ ssl_context = ssl.create_default_context(cafile=certifi.where())
 ssl_context.check_hostname = False
 ssl_context.verify_mode = ssl.CERT_NONE
 
-# Cargar variables de entorno desde .env
-load_dotenv()
-
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-def upload_chunks_to_pinecone(chunks: List[str], metadata: Dict) -> bool:
+# Extracción de metadatos con OpenAI: una vez por documento, a partir de una muestra del texto
+METADATA_ENRICHMENT_ENABLED = os.getenv("METADATA_ENRICHMENT_ENABLED", "1") == "1"  # 0 para cargas masivas
+METADATA_SAMPLE_CHARS = int(os.getenv("METADATA_SAMPLE_CHARS", "6000"))
+METADATA_SAMPLE_PIECES = 6
+
+def upload_chunks_to_pinecone(chunks: List[str], metadata: Dict, enrich: Optional[bool] = None) -> bool:
     """
     Sube chunks de texto a Pinecone usando embeddings de OpenAI.
     Args:
         chunks (List[str]): Lista de chunks de texto a procesar.
         metadata (Dict): Diccionario con metadatos (cliente, archivo, tipo, fecha).
+        enrich (bool, opcional): Extraer metadatos del documento con OpenAI
+            (default: METADATA_ENRICHMENT_ENABLED).
     Returns:
         bool: True si la operación fue exitosa, False en caso contrario.
     """
@@ -36,57 +49,32 @@ def upload_chunks_to_pinecone(chunks: List[str], metadata: Dict) -> bool:
         # Leer variables de entorno
         openai_api_key = os.getenv('OPENAI_API_KEY')
         pinecone_api_key = os.getenv('PINECONE_API_KEY')
-        pinecone_index_name = os.getenv('PINECONE_INDEX_NAME', 'default-index')
         
-        if not all([openai_api_key, pinecone_api_key]):
+        if not openai_api_key or (VECTOR_STORE_BACKEND == "pinecone" and not pinecone_api_key):
             print("Error: Faltan variables de entorno requeridas")
             print("OPENAI_API_KEY, PINECONE_API_KEY")
             return False
         
-        # Configurar OpenAI (nueva API)
-        client = OpenAI(api_key=openai_api_key)
-        
-        # Configurar Pinecone (nueva API)
-        pc = Pinecone(api_key=pinecone_api_key)
-        
-        # Verificar si el índice existe y su dimensión
-        existing_indexes = pc.list_indexes()
-        if pinecone_index_name in existing_indexes:
-            index_info = pc.describe_index(pinecone_index_name)
-            if hasattr(index_info, 'dimension') and index_info.dimension != 1536:
-                print(f"Eliminando índice '{pinecone_index_name}' con dimensión incorrecta ({index_info.dimension})...")
-                pc.delete_index(pinecone_index_name)
-                print(f"Índice '{pinecone_index_name}' eliminado.")
-        
-        # Crear el índice si no existe
-        existing_indexes = pc.list_indexes()
-        if pinecone_index_name not in existing_indexes:
-            print(f"Creando índice: {pinecone_index_name}")
-            pc.create_index(
-                name=pinecone_index_name,
-                dimension=1536,  # text-embedding-3-small dimension
-                metric='cosine'
-            )
-        
-        # Obtener el índice
-        index = pc.Index(pinecone_index_name)
+        # Almacén vectorial configurado (Pinecone o local); crea el índice si no existe
+        index = get_vector_store()
+        index.ensure_index(dimension=EMBEDDING_DIMENSIONS)
         
         # Generar embeddings para todos los chunks
         print(f"Generando embeddings para {len(chunks)} chunks...")
         
-        # Usar text-embedding-3-small para generar embeddings (nueva API)
-        response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=chunks
-        )
+        # Embeddings del modelo y dimensión configurados (por lotes, con reintentos)
+        embeddings = get_embedding_service(openai_api_key).embed(chunks)
         
-        embeddings = response.data
+        # Metadatos extraídos con OpenAI una sola vez para todo el documento
+        enrich = METADATA_ENRICHMENT_ENABLED if enrich is None else enrich
+        metadatos_documento = extraer_metadatos_documento(chunks) if enrich else {}
         
         # Preparar vectores para Pinecone
         vectors = []
         for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            # Crear ID único para el vector
-            vector_id = str(uuid.uuid4())
+            # ID estable (documento, posición y contenido): volver a subir el mismo archivo
+            # sobrescribe sus vectores en lugar de duplicarlos
+            vector_id = chunk_id(f"{metadata.get('cliente', '')}/{metadata.get('archivo', '')}", i, chunk)
             
             # Preparar metadatos del vector
             vector_metadata = {
@@ -100,33 +88,31 @@ def upload_chunks_to_pinecone(chunks: List[str], metadata: Dict) -> bool:
                 'timestamp': datetime.now().isoformat()
             }
             
-            # Extraer metadatos enriquecidos usando OpenAI
-            metadatos_enriquecidos = extraer_metadatos_con_openai(chunk)
-            vector_metadata.update(metadatos_enriquecidos)
+            # Agregar metadatos del documento (los proporcionados por el llamador tienen prioridad)
+            for key, value in metadatos_documento.items():
+                vector_metadata.setdefault(key, value)
             
             # Crear vector para Pinecone (nueva API)
             vector = {
                 'id': vector_id,
-                'values': embedding.embedding,
+                'values': embedding,
                 'metadata': vector_metadata
             }
             
             vectors.append(vector)
         
-        # Subir vectores a Pinecone en lotes
-        batch_size = 100  # Pinecone recomienda lotes de hasta 100 vectores
-        total_uploaded = 0
+        # Usar namespace basado en cliente y tipo de archivo
+        namespace = f"{metadata.get('cliente', 'default')}_{metadata.get('tipo', 'unknown')}"
         
-        for i in range(0, len(vectors), batch_size):
-            batch = vectors[i:i + batch_size]
-            print(f"Subiendo lote {i//batch_size + 1}/{(len(vectors) + batch_size - 1)//batch_size}...")
-            
-            # Usar namespace basado en cliente y tipo de archivo
-            namespace = f"{metadata.get('cliente', 'default')}_{metadata.get('tipo', 'unknown')}"
-            
-            # Subir el lote a Pinecone (nueva API)
-            index.upsert(vectors=batch, namespace=namespace)
-            total_uploaded += len(batch)
+        # Subir vectores a Pinecone en lotes acotados por vectores y bytes, en paralelo
+        with UpsertWriter(index, namespace=namespace) as writer:
+            for vector in vectors:
+                writer.add(vector)
+        total_uploaded = writer.stats()["vectors"]
+        print(f"📤 {writer.describe()}")
+        
+        # Invalidar respuestas en caché generadas con el índice anterior
+        bump_index_version()
         
         print(f"✅ Subidos exitosamente {total_uploaded} vectores a Pinecone")
         print(f"📁 Namespace: {namespace}")
@@ -158,23 +144,62 @@ def query_pinecone(index, embedding, top_k=5, namespace=None):
         query_kwargs["namespace"] = namespace
     return index.query(**query_kwargs)
 
+def muestra_documento(chunks: List[str], max_chars: int = METADATA_SAMPLE_CHARS) -> str:
+    """
+    Muestra representativa de un documento: chunks espaciados uniformemente del inicio al final,
+    cada uno recortado para que el total quede dentro de max_chars.
+    """
+    if not chunks:
+        return ""
+    pieces = min(len(chunks), METADATA_SAMPLE_PIECES)
+    positions = sorted({round(k * (len(chunks) - 1) / max(pieces - 1, 1)) for k in range(pieces)})
+    per_piece = max(max_chars // len(positions), 1)
+    return "\n[...]\n".join(chunks[position][:per_piece] for position in positions)
+
+def _metadato_valido(value) -> bool:
+    # Pinecone solo acepta cadenas, números, booleanos y listas de cadenas (sin null)
+    if isinstance(value, (str, int, float, bool)):
+        return True
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+def extraer_metadatos_documento(chunks: List[str]) -> Dict:
+    """
+    Extraer metadatos de un documento completo con una sola llamada a OpenAI.
+    El resultado se guarda por hash del contenido: volver a subir el mismo documento no
+    repite la llamada.
+    """
+    cache_key = content_hash(chunks)
+    cache = get_extraction_cache()
+    cached = cache.get(cache_key)
+    if cached is not None:
+        print("♻️ Metadatos del documento reutilizados (mismo contenido)")
+        return cached
+    
+    print("🔍 Extrayendo metadatos del documento con OpenAI...")
+    metadatos = {
+        key: value for key, value in extraer_metadatos_con_openai(muestra_documento(chunks)).items()
+        if _metadato_valido(value)
+    }
+    # Las extracciones fallidas no se guardan para reintentar en la próxima carga
+    if metadatos:
+        cache.put(cache_key, metadatos)
+    return metadatos
+
 # Función para extraer metadatos usando OpenAI
 def extraer_metadatos_con_openai(texto):
     prompt = (
         "Extrae los siguientes metadatos del texto de un documento. "
         "Devuelve el resultado en formato JSON con las claves: cliente, tipo_documento, fecha, autor, categoria, palabras_clave. "
         "Si algún dato no está presente, deja el valor como null.\n"
-        f"Texto: {texto[:2000]}"
+        f"Texto: {texto[:METADATA_SAMPLE_CHARS]}"
     )
     try:
-        response = openai.ChatCompletion.create(
-            api_key=OPENAI_API_KEY,
+        response = get_openai_client(OPENAI_API_KEY).chat.completions.create(
             model="gpt-4",
             messages=[{"role": "user", "content": prompt}],
             max_tokens=300,
             temperature=0.0
         )
-        import json
         content = response.choices[0].message.content
         # Intentar extraer JSON del resultado
         start = content.find('{')
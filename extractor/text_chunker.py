@@ -1,9 +1,16 @@
-import tiktoken  # type: ignore
 import re
-from typing import List
 import os
-import certifi
 import ssl
+import time
+import bisect
+import logging
+import threading
+import certifi
+import numpy as np
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 # Configurar SSL para MacOS
 os.environ["SSL_CERT_FILE"] = certifi.where()
@@ -14,100 +21,232 @@ ssl_context = ssl.create_default_context(cafile=certifi.where())
 ssl_context.check_hostname = False
 ssl_context.verify_mode = ssl.CERT_NONE
 
-def chunk_text(text: str, max_tokens: int = 500) -> List[str]:
+# Configuración
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+CHUNK_ENCODING_MODEL = "text-embedding-3-small"
+
+# Fronteras sobre el texto en UTF-8: línea en blanco (fin de párrafo) y puntuación de cierre
+# seguida de espacio (fin de frase). El corte queda justo antes del espacio.
+PARAGRAPH_BREAK = re.compile(rb"\n[ \t]*\n")
+SENTENCE_BREAK = re.compile(rb"[.!?][.!?\"')\]\xc2\xbb]*\s")
+# Bytes por token cuando no hay tokenizador (misma estimación que el empaquetado de contexto)
+APPROX_BYTES_PER_TOKEN = 4
+# Modo streaming: se corta cuando el texto acumulado equivale a ~STREAM_WINDOW_CHUNKS chunks y los
+# últimos STREAM_TAIL_TOKENS tokens se retienen porque pueden cambiar al llegar el siguiente segmento
+STREAM_WINDOW_CHUNKS = 8
+STREAM_TAIL_TOKENS = 8
+# Segundos antes de reintentar la carga del tokenizador tras un fallo (p. ej. sin red para descargarlo)
+ENCODING_RETRY_SECONDS = 300
+
+_encoding = None
+_encoding_failed_at: Optional[float] = None
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """
+    Tokenizador del modelo de embeddings. Solo se guarda una carga exitosa: tras un fallo se
+    estiman tokens por bytes y se vuelve a intentar pasados ENCODING_RETRY_SECONDS.
+    """
+    global _encoding, _encoding_failed_at
+    if _encoding is not None:
+        return _encoding
+    with _encoding_lock:
+        if _encoding is not None:
+            return _encoding
+        if _encoding_failed_at is not None and time.monotonic() - _encoding_failed_at < ENCODING_RETRY_SECONDS:
+            return None
+        try:
+            import tiktoken  # type: ignore
+            try:
+                _encoding = tiktoken.encoding_for_model(CHUNK_ENCODING_MODEL)
+            except KeyError:
+                # Fallback a cl100k_base si text-embedding-3-small no está disponible
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            _encoding_failed_at = None
+        except Exception as e:
+            _encoding_failed_at = time.monotonic()
+            logger.warning(f"⚠️ Tokenizador no disponible, se estiman tokens por bytes "
+                           f"(reintento en {ENCODING_RETRY_SECONDS}s): {e}")
+        return _encoding
+
+
+@lru_cache(maxsize=1)
+def _token_byte_lengths(encoding) -> np.ndarray:
+    """Longitud en bytes de cada token del vocabulario (se calcula una sola vez)"""
+    lengths = np.zeros(encoding.n_vocab, dtype=np.int64)
+    for token in range(encoding.n_vocab):
+        try:
+            lengths[token] = len(encoding.decode_single_token_bytes(token))
+        except KeyError:
+            pass
+    return lengths
+
+
+def token_offsets(data: bytes) -> np.ndarray:
+    """
+    Codificar el documento una sola vez y devolver el offset (en bytes UTF-8) de cada token.
+    Args:
+        data (bytes): Texto completo del documento en UTF-8.
+    Returns:
+        np.ndarray: Offset de inicio de cada token, más len(data) como centinela final.
+    """
+    encoding = get_encoding()
+    if encoding is None:
+        return np.append(np.arange(0, len(data), APPROX_BYTES_PER_TOKEN), len(data))
+    tokens = np.asarray(encoding.encode_ordinary(data.decode("utf-8")), dtype=np.int64)
+    offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+    np.cumsum(_token_byte_lengths(encoding)[tokens], out=offsets[1:])
+    return offsets
+
+
+def _excess_tokens(chunk: str, max_tokens: int) -> int:
+    """Tokens de más al codificar el chunk suelto (los bordes pueden tokenizarse distinto que en el documento)"""
+    encoding = get_encoding()
+    if encoding is None:
+        return 0
+    return len(encoding.encode_ordinary(chunk)) - max_tokens
+
+
+def _boundary_tokens(cuts: List[int], offsets: np.ndarray) -> List[int]:
+    """Índices de token donde termina un párrafo o frase (primer token que empieza en el corte o después)"""
+    if not cuts:
+        return []
+    return np.unique(np.searchsorted(offsets, cuts)).tolist()
+
+
+def _last_before(boundaries: List[int], low: int, high: int) -> Optional[int]:
+    """Mayor frontera b con low < b <= high"""
+    position = bisect.bisect_right(boundaries, high) - 1
+    if position >= 0 and boundaries[position] > low:
+        return boundaries[position]
+    return None
+
+
+def _char_start(data: bytes, position: int) -> int:
+    """Retroceder un offset hasta el inicio de un carácter UTF-8 (los tokens pueden partir caracteres)"""
+    while 0 < position < len(data) and 0x80 <= data[position] < 0xC0:
+        position -= 1
+    return position
+
+
+def _chunk_window(data: bytes, max_tokens: int, overlap_tokens: int, final: bool) -> Tuple[List[str], int]:
+    """
+    Cortar en chunks el texto acumulado (en UTF-8).
+    Args:
+        data (bytes): Texto acumulado.
+        max_tokens (int): Máximo de tokens por chunk.
+        overlap_tokens (int): Tokens repetidos entre chunks consecutivos.
+        final (bool): Si es False, el último tramo (que aún puede crecer) no se emite.
+    Returns:
+        Tuple[List[str], int]: Chunks completos y offset en bytes desde donde continuar.
+    """
+    offsets = token_offsets(data)
+    total = len(offsets) - 1
+    paragraphs = _boundary_tokens([match.start() for match in PARAGRAPH_BREAK.finditer(data)], offsets)
+    sentences = _boundary_tokens([match.end() - 1 for match in SENTENCE_BREAK.finditer(data)], offsets)
+
+    chunks = []
+    start = 0
+    while start < total:
+        limit = start + max_tokens
+        if limit >= total - (0 if final else STREAM_TAIL_TOKENS):
+            if not final:
+                break
+            end = total
+        else:
+            # Preferir un corte de párrafo que llene al menos la mitad del chunk; si no, de frase
+            paragraph_end = _last_before(paragraphs, start, limit)
+            sentence_end = _last_before(sentences, start, limit)
+            if paragraph_end is not None and paragraph_end - start >= max_tokens // 2:
+                end = paragraph_end
+            elif sentence_end is not None:
+                end = max(sentence_end, paragraph_end or 0)
+            elif paragraph_end is not None:
+                end = paragraph_end
+            else:
+                end = limit
+
+        first = _char_start(data, int(offsets[start]))
+        last = _char_start(data, int(offsets[end]))
+        chunk = data[first:last].decode("utf-8").strip()
+        # Recortar el final hasta que el chunk quepa en max_tokens al volver a codificarlo
+        excess = _excess_tokens(chunk, max_tokens)
+        while excess > 0 and end - start > 1:
+            end = max(start + 1, end - excess)
+            last = _char_start(data, int(offsets[end]))
+            chunk = data[first:last].decode("utf-8").strip()
+            excess = _excess_tokens(chunk, max_tokens)
+        if chunk:
+            chunks.append(chunk)
+        if end >= total:
+            start = total
+            break
+
+        if overlap_tokens:
+            # Retroceder el solapamiento, alineado al inicio de una frase si hay una en el rango
+            next_start = max(start + 1, end - overlap_tokens)
+            position = bisect.bisect_left(sentences, next_start)
+            if position < len(sentences) and sentences[position] < end:
+                next_start = sentences[position]
+            start = next_start
+        else:
+            start = end
+
+    return chunks, _char_start(data, int(offsets[start]))
+
+
+def chunk_text_iter(segments: Iterable[str], max_tokens: int = 500,
+                    overlap_tokens: int = CHUNK_OVERLAP_TOKENS, separator: str = "\n\n") -> Iterator[str]:
+    """
+    Genera chunks a partir de un iterador de segmentos (páginas, hojas, diapositivas) conforme se llenan.
+    Solo se mantiene en memoria la ventana de texto aún no emitida, así que el embedding y el upsert
+    pueden empezar mientras la extracción continúa.
+    Args:
+        segments (Iterable[str]): Segmentos de texto en orden.
+        max_tokens (int): Número máximo de tokens por chunk (default: 500).
+        overlap_tokens (int): Tokens repetidos entre chunks consecutivos (default: CHUNK_OVERLAP_TOKENS).
+        separator (str): Texto que se inserta entre segmentos (default: línea en blanco).
+    Yields:
+        str: Chunks de texto.
+    """
+    max_tokens = max(1, max_tokens)
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+    window_bytes = max_tokens * APPROX_BYTES_PER_TOKEN * STREAM_WINDOW_CHUNKS
+    joiner = separator.encode("utf-8")
+
+    buffer = b""
+    for segment in segments:
+        if not segment or not segment.strip():
+            continue
+        buffer = buffer + joiner + segment.encode("utf-8") if buffer else segment.encode("utf-8")
+        if len(buffer) < window_bytes:
+            continue
+        chunks, resume = _chunk_window(buffer, max_tokens, overlap_tokens, final=False)
+        buffer = buffer[resume:]
+        yield from chunks
+
+    if buffer.strip():
+        chunks, _ = _chunk_window(buffer, max_tokens, overlap_tokens, final=True)
+        yield from chunks
+
+
+def chunk_text(text: str, max_tokens: int = 500, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
     """
     Divide un texto largo en bloques de hasta max_tokens, procurando no cortar frases o párrafos.
+    El documento se tokeniza una sola vez; las fronteras de párrafo y frase se convierten en
+    offsets de token y cada chunk es un rango de tokens del texto original.
     Args:
         text (str): Texto a dividir en chunks.
         max_tokens (int): Número máximo de tokens por chunk (default: 500).
+        overlap_tokens (int): Tokens del final de un chunk que se repiten al inicio del siguiente
+            (default: CHUNK_OVERLAP_TOKENS).
     Returns:
         List[str]: Lista con los chunks de texto.
     """
-    # Inicializar el tokenizador para el modelo text-embedding-3-small
-    try:
-        encoding = tiktoken.encoding_for_model("text-embedding-3-small")
-    except KeyError:
-        # Fallback a cl100k_base si text-embedding-3-small no está disponible
-        encoding = tiktoken.get_encoding("cl100k_base")
-    
-    # Dividir el texto en párrafos
-    paragraphs = text.split('\n\n')
-    chunks = []
-    current_chunk = ""
-    current_tokens = 0
-    
-    for paragraph in paragraphs:
-        # Limpiar el párrafo
-        paragraph = paragraph.strip()
-        if not paragraph:
-            continue
-        
-        # Contar tokens del párrafo
-        paragraph_tokens = len(encoding.encode(paragraph))
-        
-        # Si el párrafo completo cabe en el chunk actual
-        if current_tokens + paragraph_tokens <= max_tokens:
-            if current_chunk:
-                current_chunk += "\n\n" + paragraph
-            else:
-                current_chunk = paragraph
-            current_tokens += paragraph_tokens
-        else:
-            # Si el párrafo es muy largo, dividirlo en frases
-            if paragraph_tokens > max_tokens:
-                # Guardar el chunk actual si existe
-                if current_chunk:
-                    chunks.append(current_chunk)
-                    current_chunk = ""
-                    current_tokens = 0
-                
-                # Dividir el párrafo largo en frases
-                sentences = re.split(r'[.!?]+', paragraph)
-                temp_chunk = ""
-                temp_tokens = 0
-                
-                for sentence in sentences:
-                    sentence = sentence.strip()
-                    if not sentence:
-                        continue
-                    
-                    # Agregar puntuación de cierre si es necesario
-                    if not sentence.endswith(('.', '!', '?')):
-                        sentence += '.'
-                    
-                    sentence_tokens = len(encoding.encode(sentence))
-                    
-                    if temp_tokens + sentence_tokens <= max_tokens:
-                        if temp_chunk:
-                            temp_chunk += " " + sentence
-                        else:
-                            temp_chunk = sentence
-                        temp_tokens += sentence_tokens
-                    else:
-                        # Guardar el chunk temporal si existe
-                        if temp_chunk:
-                            chunks.append(temp_chunk)
-                        temp_chunk = sentence
-                        temp_tokens = sentence_tokens
-                
-                # Agregar el último chunk temporal si existe
-                if temp_chunk:
-                    chunks.append(temp_chunk)
-            else:
-                # Guardar el chunk actual y comenzar uno nuevo con el párrafo
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = paragraph
-                current_tokens = paragraph_tokens
-    
-    # Agregar el último chunk si existe
-    if current_chunk:
-        chunks.append(current_chunk)
-    
-    # Limpiar chunks vacíos y normalizar
-    chunks = [chunk.strip() for chunk in chunks if chunk.strip()]
-    
-    return chunks
+    if not text or not text.strip():
+        return []
+    return list(chunk_text_iter([text], max_tokens=max_tokens, overlap_tokens=overlap_tokens))
 
 # NUEVO: Función para obtener el embedding de un texto usando la nueva API de OpenAI
 def get_embedding(text, model="text-embedding-3-small", api_key=None):
@@ -119,20 +258,10 @@ def get_embedding(text, model="text-embedding-3-small", api_key=None):
         api_key (str, opcional): API key de OpenAI. Si no se pasa, se toma de la variable de entorno.
     Returns:
         list: Vector embedding del texto.
+    Raises:
+        EmbeddingError: Si la API falla tras los reintentos (no se devuelven vectores de ceros).
     """
-    from openai import OpenAI
-    import os
-    if api_key is None:
-        api_key = os.getenv("OPENAI_API_KEY")
+    from utils.embedding_service import get_embedding_service
     
-    try:
-        client = OpenAI(api_key=api_key)
-        response = client.embeddings.create(
-            model=model,
-            input=[text]
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"Error obteniendo embedding: {e}")
-        # Retornar un embedding vacío en caso de error
-        return [0.0] * 1536  # Dimensiones del modelo text-embedding-3-small 
\ No newline at end of file
+    # Consultas y textos sueltos no se guardan en el almacén por contenido de los chunks
+    return get_embedding_service(api_key).embed([text], model=model, use_store=False)[0]
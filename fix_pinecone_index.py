@@ -2,10 +2,12 @@ import os
 from dotenv import load_dotenv
 from pinecone import Pinecone
 
-# Cargar variables de entorno
+# Cargar variables de entorno antes de importar utils (EMBEDDING_DIMENSIONS se lee al importarse)
 dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
 load_dotenv(dotenv_path)
 
+from utils.embedding_config import EMBEDDING_DIMENSIONS
+
 # Inicializar Pinecone con la nueva sintaxis
 pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 index_name = "vizum-chieff"
@@ -22,10 +24,10 @@ try:
         print(f"✅ Índice '{index_name}' eliminado")
     
     # Crear nuevo índice con dimensión correcta
-    print(f"🏗️ Creando nuevo índice '{index_name}' con dimensión 1536...")
+    print(f"🏗️ Creando nuevo índice '{index_name}' con dimensión {EMBEDDING_DIMENSIONS}...")
     pc.create_index(
         name=index_name,
-        dimension=1536,  # text-embedding-3-small dimension
+        dimension=EMBEDDING_DIMENSIONS,  # EMBEDDING_DIMENSIONS del .env (1536 nativa de text-embedding-3-small)
         metric="cosine"
     )
     print(f"✅ Índice '{index_name}' creado exitosamente")
@@ -11,13 +11,22 @@ import hashlib
 from datetime import datetime, timedelta
 from typing import Dict, List, Set, Optional
 from dotenv import load_dotenv
-from google_drive_manager import get_google_drive_client
+
+# Cargar variables de entorno antes de importar utils (sus módulos leen la configuración al importarse)
+load_dotenv()
+
 from metadata_enricher import enrich_document_metadata, generate_document_summary
-from extractor.text_chunker import chunk_text, get_embedding
+from extractor.text_chunker import chunk_text_iter
 from extractor.extractor_ocr import needs_ocr, extract_text_with_ocr_if_needed
-from utils.text_extractor import extract_text_from_file
-from pinecone import Pinecone
-from uuid import uuid4
+from utils.text_extractor import iter_text_segments, read_head, segment_separator
+from utils.answer_cache import bump_index_version
+from utils.upsert_writer import UpsertWriter
+from utils.chunk_manifest import get_chunk_manifest, apply_delta
+from utils.document_store import get_document_store, vector_metadata
+from utils.embedding_config import EMBEDDING_DIMENSIONS
+from utils.vector_store import get_vector_store
+from utils.metrics import span, register_stats_gauge, start_metrics_server
+from utils.embedding_service import get_embedding_service, describe_reuse
 import json
 import tempfile
 
@@ -38,10 +47,9 @@ class InitialDocumentAnalyzer:
     def __init__(self):
         load_dotenv()
         
-        # Inicializar clientes
-        self.gdrive = get_google_drive_client()
-        self.pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-        self.index = self.pc.Index(os.getenv("PINECONE_INDEX_NAME"))
+        # Inicializar clientes (Google Drive se conecta en el primer uso)
+        self._gdrive = None
+        self.index = get_vector_store()
         
         # Configuración
         self.folder_id = "1_yXImvvJNbj_hlqR67RInd9hoCLVyRfC"  # ID de la carpeta de Google Drive
@@ -51,6 +59,14 @@ class InitialDocumentAnalyzer:
         # Cargar estado de análisis previo
         self.analysis_status = self.load_analysis_status()
     
+    @property
+    def gdrive(self):
+        """Cliente de Google Drive (se importa y autentica al primer acceso)"""
+        if self._gdrive is None:
+            from google_drive_manager import get_google_drive_client
+            self._gdrive = get_google_drive_client()
+        return self._gdrive
+    
     def load_analysis_status(self) -> Dict:
         """Cargar estado de análisis previo"""
         try:
@@ -163,20 +179,27 @@ class InitialDocumentAnalyzer:
         
         try:
             # Descargar archivo usando Google Drive
-            tmp_file_path = self.gdrive.download_file(file_id, file_name)
+            with span("ingesta", "descarga"):
+                tmp_file_path = self.gdrive.download_file(file_id, file_name)
             
             if not tmp_file_path:
                 logger.error(f"❌ No se pudo descargar: {file_name}")
                 return False
             
-            # Extraer texto
+            # Extraer texto: el inicio alimenta el resumen y los metadatos; el resto se extrae
+            # por segmentos mientras se generan los chunks
             if needs_ocr(tmp_file_path):
                 logger.info(f"🔍 Aplicando OCR a: {file_name}")
-                text = extract_text_with_ocr_if_needed(tmp_file_path)
+                with span("ingesta", "ocr"):
+                    text = extract_text_with_ocr_if_needed(tmp_file_path)
+                head, segments = text, iter([text])
+                separator = "\n\n"
             else:
-                text = extract_text_from_file(tmp_file_path)
+                with span("ingesta", "extraccion"):
+                    separator = segment_separator(tmp_file_path)
+                    head, segments = read_head(iter_text_segments(tmp_file_path), separator=separator)
             
-            if not text.strip():
+            if not head.strip():
                 logger.warning(f"⚠️ No se pudo extraer texto de: {file_name}")
                 self.analysis_status["failed_files"].append({
                     "id": file_id,
@@ -188,51 +211,74 @@ class InitialDocumentAnalyzer:
             
             # Generar resumen ejecutivo
             logger.info(f"📝 Generando resumen para: {file_name}")
-            resumen_ejecutivo = generate_document_summary(text, file_name)
+            with span("ingesta", "resumen"):
+                resumen_ejecutivo = generate_document_summary(head, file_name)
             
             # Enriquecer metadatos
             logger.info(f"🔍 Enriqueciendo metadatos para: {file_name}")
-            cliente = self.get_cliente_from_path(file_path)
-            enriched_metadata = enrich_document_metadata(text, file_name, file_path, cliente)
-            
-            # Dividir en chunks y subir a Pinecone
-            chunks = chunk_text(text)
-            logger.info(f"📊 Dividiendo en {len(chunks)} chunks: {file_name}")
-            
-            for i, chunk in enumerate(chunks):
-                try:
-                    embedding = get_embedding(chunk)
-                    
-                    # Combinar metadatos
-                    chunk_metadata = {
-                        "cliente": cliente,
-                        "nombre_archivo": file_name,
-                        "ruta": file_info["path"],
-                        "file_id": file_id,
-                        "chunk_index": i,
-                        "texto": chunk,
-                        "procesado_con_ocr": needs_ocr(tmp_file_path),
-                        "fecha_procesamiento": datetime.now().isoformat(),
-                        "tipo_actualizacion": "analisis_inicial",
-                        "resumen_ejecutivo_documento": resumen_ejecutivo,
-                        "total_chunks": len(chunks),
-                        "chunk_actual": i + 1,
-                        "hash_archivo": file_info["hash"],
-                        "fecha_modificacion": file_info["modified"]
-                    }
-                    
-                    # Agregar metadatos enriquecidos
-                    chunk_metadata.update(enriched_metadata)
+            cliente = self.get_cliente_from_path(file_info["path"])
+            with span("ingesta", "enriquecimiento"):
+                enriched_metadata = enrich_document_metadata(head, file_name, file_info["path"], cliente)
+            
+            # Metadatos del documento: se guardan una vez en el almacén local (el bot los une al
+            # responder) y cada vector lleva solo las llaves filtrables y el texto del chunk
+            document_metadata = {
+                **enriched_metadata,
+                "file_id": file_id,
+                "cliente": cliente,
+                "nombre_archivo": file_name,
+                "ruta": file_info["path"],
+                "procesado_con_ocr": needs_ocr(tmp_file_path),
+                "tipo_actualizacion": "analisis_inicial",
+                "resumen_ejecutivo_documento": resumen_ejecutivo,
+                "hash_archivo": file_info["hash"],
+                "fecha_modificacion": file_info["modified"]
+            }
+            get_document_store().put(file_id, document_metadata)
+            
+            # Dividir en chunks y subir a Pinecone conforme se generan; con IDs estables solo los
+            # chunks nuevos o cambiados respecto al manifiesto del documento se generan y suben
+            manifest = get_chunk_manifest()
+            delta = manifest.delta(file_id)
+            # Los embeddings se generan por lotes en paralelo; un lote fallido aborta el documento
+            embedded_chunks = get_embedding_service().embed_tagged(delta.changed(chunk_text_iter(segments, separator=separator)))
+            # Los vectores se suben por lotes en paralelo; el resto se envía al cerrar el documento
+            with UpsertWriter(self.index) as writer:
+                for (i, vector_id), chunk, embedding in embedded_chunks:
+                    try:
+                        chunk_metadata = vector_metadata({
+                            **document_metadata,
+                            "chunk_index": i,
+                            "texto": chunk,
+                            "fecha_procesamiento": datetime.now().isoformat(),
+                            "chunk_actual": i + 1
+                        })
                     
-                    # Subir a Pinecone
-                    self.index.upsert(vectors=[{
-                        'id': str(uuid4()),
-                        'values': embedding,
-                        'metadata': chunk_metadata
-                    }])
+                        # Encolar para subir a Pinecone
+                        vector = {
+                            'id': vector_id,
+                            'values': embedding,
+                            'metadata': chunk_metadata
+                        }
+                    except Exception as e:
+                        logger.error(f"Error procesando chunk {i} de {file_name}: {e}")
+                        delta.skip(vector_id)
+                        continue
                     
-                except Exception as e:
-                    logger.error(f"Error procesando chunk {i} de {file_name}: {e}")
+                    # Un lote que falla tras los reintentos aborta el documento
+                    writer.add(vector)
+            
+            logger.info(f"📤 {file_name}: {writer.describe()}")
+            
+            # Borrar los chunks que ya no existen y guardar el manifiesto (los vectores anteriores
+            # al manifiesto se localizan por file_id)
+            apply_delta(self.index, manifest, delta, legacy_filter={"file_id": file_id}, dimension=EMBEDDING_DIMENSIONS)
+            chunk_count = len(delta.current)
+            logger.info(f"🔁 Delta de {file_name}: {delta.describe()}")
+            
+            # Invalidar respuestas en caché generadas con el índice anterior
+            if delta.changed_count or delta.removed:
+                bump_index_version()
             
             # Actualizar estado de análisis
             self.analysis_status["analyzed_files"][file_id] = {
@@ -241,14 +287,14 @@ class InitialDocumentAnalyzer:
                 "size": file_info["size"],
                 "modified": file_info["modified"],
                 "analyzed_date": datetime.now().isoformat(),
-                "chunks_created": len(chunks),
+                "chunks_created": chunk_count,
                 "status": "success"
             }
             
             # Limpiar archivo temporal
             os.unlink(tmp_file_path)
             
-            logger.info(f"✅ Procesado exitosamente: {file_name} ({len(chunks)} chunks)")
+            logger.info(f"✅ Procesado exitosamente: {file_name} ({chunk_count} chunks)")
             return True
             
         except Exception as e:
@@ -276,6 +322,7 @@ class InitialDocumentAnalyzer:
         self.analysis_status["analysis_start"] = datetime.now().isoformat()
         self.analysis_status["total_files"] = 0
         self.analysis_status["processed_files"] = 0
+        embedding_stats = get_embedding_service().stats()
         
         try:
             # Escanear todos los documentos
@@ -310,6 +357,10 @@ class InitialDocumentAnalyzer:
                     self.save_analysis_status()
                     logger.info(f"💾 Estado guardado - Procesados: {i}/{len(files_to_analyze)}")
             
+            # Vectores reutilizados del almacén por contenido en esta ejecución
+            self.analysis_status["embedding_reuse"] = describe_reuse(embedding_stats, get_embedding_service().stats())
+            logger.info(f"♻️ {self.analysis_status['embedding_reuse']}")
+            
             # Finalizar análisis
             self.analysis_status["analysis_end"] = datetime.now().isoformat()
             self.analysis_status["last_analysis"] = datetime.now().isoformat()
@@ -346,6 +397,7 @@ Duración: {duration}
 📈 RESULTADOS:
 • Tasa de éxito: {(self.analysis_status['processed_files'] / max(self.analysis_status['total_files'], 1)) * 100:.1f}%
 • Tiempo promedio por archivo: {duration / max(self.analysis_status['processed_files'], 1)} si se procesaron archivos
+• Embeddings: {self.analysis_status.get('embedding_reuse', 'sin datos')}
 
 🔍 ARCHIVOS FALLIDOS:
 """
@@ -402,6 +454,9 @@ def main():
     print("=" * 50)
     
     analyzer = InitialDocumentAnalyzer()
+    register_stats_gauge("kawiil_embedding_service", "Peticiones, reintentos y fallos del servicio de embeddings",
+                         get_embedding_service().stats)
+    start_metrics_server()
     
     print("\n📋 Opciones disponibles:")
     print("1. Análisis inicial completo (todos los archivos)")
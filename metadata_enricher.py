@@ -10,8 +10,15 @@ import logging
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from dotenv import load_dotenv
-from openai import OpenAI
-from pinecone import Pinecone
+
+# Cargar variables de entorno antes de importar utils (sus módulos leen la configuración al importarse)
+load_dotenv()
+
+from utils.openai_client import get_openai_client
+from utils.index_counters import get_index_counters
+from utils.vector_store import get_vector_store
+from utils.document_store import get_document_store, vector_metadata
+from utils.index_scanner import IndexScanner, INDEX_SCAN_WORKERS
 import re
 
 # Configurar logging
@@ -32,9 +39,8 @@ class MetadataEnricher:
         load_dotenv()
         
         # Inicializar clientes
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-        self.index = self.pc.Index(os.getenv("PINECONE_INDEX_NAME"))
+        self.openai_client = get_openai_client()
+        self.index = get_vector_store()
         
         # Configuración
         self.max_chunk_size = 4000  # Tamaño máximo para análisis
@@ -131,81 +137,86 @@ class MetadataEnricher:
             "estado_vigencia": "Vigente"
         }
     
-    def enrich_existing_vectors(self, folder_path: str = None):
-        """Enriquecer metadatos de vectores existentes en Pinecone"""
+    def enrich_vector(self, vector: Dict[str, Any], namespace: str = "") -> bool:
+        """Enriquecer los metadatos de un vector; devuelve True si se actualizó"""
+        metadata = vector.get("metadata") or {}
+        
+        # Verificar si ya tiene metadatos enriquecidos (los vectores nuevos guardan
+        # el resumen en el almacén de documentos, no en el vector)
+        if metadata.get("metadata_enriquecido") or (
+                metadata.get("resumen_executivo") and metadata.get("categoria_regulatoria")):
+            return False
+        
+        # Obtener texto del vector
+        texto = metadata.get("texto", "")
+        if not texto or len(texto) < 50:
+            return False
+        
+        # Los metadatos enriquecidos son del documento: si otro chunk ya lo enriqueció, reutilizarlos
+        file_id = metadata.get("file_id")
+        document_store = get_document_store()
+        stored = document_store.get(file_id) if file_id else None
+        if stored and stored.get("metadata_enriquecido"):
+            enriched_metadata = stored
+        else:
+            enriched_metadata = self.analyze_document_content(
+                texto,
+                metadata.get("nombre_archivo", "desconocido"),
+                metadata.get("ruta", "")
+            )
+        
+        # Combinar metadatos existentes con enriquecidos
+        updated_metadata = {**metadata, **enriched_metadata}
+        updated_metadata["metadata_enriquecido"] = True
+        updated_metadata["fecha_enriquecimiento"] = datetime.now().isoformat()
+        
+        if file_id:
+            # Campos del documento al almacén local; el vector conserva solo las llaves filtrables
+            if enriched_metadata is not stored:
+                document_metadata = {key: value for key, value in updated_metadata.items()
+                                     if key not in ("texto", "chunk_index")}
+                document_store.put(file_id, {**(stored or {}), **document_metadata})
+            updated_metadata = vector_metadata(updated_metadata)
+        
+        # Actualizar vector en Pinecone
+        self.index.update(
+            id=vector["id"],
+            set_metadata=updated_metadata,
+            namespace=namespace
+        )
+        get_index_counters().record_metadata_update(vector["id"], updated_metadata, namespace=namespace)
+        
+        logger.info(f"✅ Vector {vector['id']} enriquecido")
+        return True
+    
+    def enrich_existing_vectors(self, folder_path: str = None, workers: Optional[int] = None, resume: bool = True):
+        """
+        Enriquecer metadatos de vectores existentes en Pinecone.
+        Recorre todo el índice por páginas de IDs con checkpoint en disco: si se interrumpe,
+        la siguiente ejecución continúa donde se quedó.
+        """
         logger.info("🚀 Iniciando enriquecimiento de metadatos existentes...")
         
         try:
-            # Obtener estadísticas del índice
-            stats = self.index.describe_index_stats()
-            total_vectors = stats.total_vector_count
-            
-            logger.info(f"📊 Total de vectores en Pinecone: {total_vectors}")
-            
-            # Obtener vectores en lotes
-            batch_size = 100
-            enriched_count = 0
-            
-            for offset in range(0, total_vectors, batch_size):
-                try:
-                    # Obtener vectores del índice
-                    query_response = self.index.query(
-                        vector=[0] * 1536,  # Vector dummy para obtener metadatos
-                        top_k=batch_size,
-                        include_metadata=True,
-                        filter={}  # Sin filtros para obtener todos
-                    )
-                    
-                    if not query_response.matches:
-                        break
-                    
-                    # Procesar cada vector
-                    for match in query_response.matches:
-                        metadata = match.metadata
-                        
-                        # Verificar si ya tiene metadatos enriquecidos
-                        if metadata.get("resumen_executivo") and metadata.get("categoria_regulatoria"):
-                            continue
-                        
-                        # Obtener texto del vector
-                        texto = metadata.get("texto", "")
-                        if not texto or len(texto) < 50:
-                            continue
-                        
-                        # Analizar y enriquecer
-                        enriched_metadata = self.analyze_document_content(
-                            texto,
-                            metadata.get("nombre_archivo", "desconocido"),
-                            metadata.get("ruta", "")
-                        )
-                        
-                        # Combinar metadatos existentes con enriquecidos
-                        updated_metadata = {**metadata, **enriched_metadata}
-                        updated_metadata["metadata_enriquecido"] = True
-                        updated_metadata["fecha_enriquecimiento"] = datetime.now().isoformat()
-                        
-                        # Actualizar vector en Pinecone
-                        self.index.update(
-                            id=match.id,
-                            set_metadata=updated_metadata
-                        )
-                        
-                        enriched_count += 1
-                        logger.info(f"✅ Vector {match.id} enriquecido ({enriched_count})")
-                        
-                        # Rate limiting
-                        if enriched_count % 10 == 0:
-                            import time
-                            time.sleep(1)
-                    
-                except Exception as e:
-                    logger.error(f"❌ Error procesando lote {offset}: {e}")
-                    continue
+            scanner = IndexScanner(
+                self.index,
+                name="enriquecimiento",
+                process=self.enrich_vector,
+                workers=workers or INDEX_SCAN_WORKERS
+            )
+            result = scanner.run(resume=resume)
+            enriched_count = result["updated"]
             
-            logger.info(f"🎉 Enriquecimiento completado: {enriched_count} vectores actualizados")
+            logger.info(f"🎉 Enriquecimiento completado: {enriched_count} vectores actualizados de "
+                        f"{result['processed']} revisados ({result['failed']} con error)")
+            
+            # Los metadatos forman parte del contexto de las respuestas en caché
+            if enriched_count:
+                from utils.answer_cache import bump_index_version
+                bump_index_version()
             
         except Exception as e:
-            logger.error(f"❌ Error en enriquecimiento masivo: {e}")
+            logger.error(f"❌ Error en enriquecimiento masivo (se puede reanudar desde el checkpoint): {e}")
     
     def enrich_new_document(self, text: str, filename: str, file_path: str, cliente: str) -> Dict[str, Any]:
         """Enriquecer metadatos de un documento nuevo antes de subirlo a Pinecone"""
@@ -345,21 +356,28 @@ class MetadataEnricher:
             logger.error(f"❌ Error generando reporte: {e}")
             return f"Error generando reporte: {e}"
 
-# Instancia global
-metadata_enricher = MetadataEnricher()
+# Instancia global (se crea en el primer uso, no al importar el módulo)
+_metadata_enricher: Optional[MetadataEnricher] = None
+
+def get_metadata_enricher() -> MetadataEnricher:
+    """Obtener la instancia compartida del enriquecedor"""
+    global _metadata_enricher
+    if _metadata_enricher is None:
+        _metadata_enricher = MetadataEnricher()
+    return _metadata_enricher
 
 def enrich_document_metadata(text: str, filename: str, file_path: str, cliente: str) -> Dict[str, Any]:
     """Función helper para enriquecer metadatos de un documento"""
-    return metadata_enricher.enrich_new_document(text, filename, file_path, cliente)
+    return get_metadata_enricher().enrich_new_document(text, filename, file_path, cliente)
 
 def generate_document_summary(text: str, filename: str) -> str:
     """Función helper para generar resumen de documento"""
-    return metadata_enricher.generate_document_summary(text, filename)
+    return get_metadata_enricher().generate_document_summary(text, filename)
 
-def enrich_existing_vectors():
-    """Función helper para enriquecer vectores existentes"""
-    metadata_enricher.enrich_existing_vectors()
+def enrich_existing_vectors(workers: Optional[int] = None):
+    """Función helper para enriquecer vectores existentes (reanuda desde el checkpoint si existe)"""
+    get_metadata_enricher().enrich_existing_vectors(workers=workers)
 
 def generate_folder_report(folder_path: str) -> str:
     """Función helper para generar reporte de carpeta"""
-    return metadata_enricher.generate_folder_report(folder_path) 
\ No newline at end of file
+    return get_metadata_enricher().generate_folder_report(folder_path) 
\ No newline at end of file
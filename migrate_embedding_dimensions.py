@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Migración del índice a embeddings de dimensión reducida (256/512/768)
+Lee todos los vectores del índice actual, vuelve a generar el embedding del texto de cada chunk
+con la dimensión indicada y los sube a un índice nuevo con los mismos IDs, namespaces y metadatos.
+Al final compara el espacio de los vectores y la latencia de consulta contra el índice original.
+
+El índice original no se modifica: para usar el nuevo hay que cambiar EMBEDDING_DIMENSIONS
+(y PINECONE_INDEX_NAME o LOCAL_VECTOR_STORE_DIR) en el .env.
+
+Uso:
+    python migrate_embedding_dimensions.py --dimensions 512
+    python migrate_embedding_dimensions.py --dimensions 256 --target-index cumplimiento-256
+    python migrate_embedding_dimensions.py --dimensions 768 --dry-run
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.embedding_config import EMBEDDING_MODEL, REDUCED_DIMENSIONS, native_dimensions, validate_dimensions
+from utils.embedding_service import get_embedding_service
+from utils.vector_store import (VectorStore, LocalVectorStore, PineconeVectorStore, get_vector_store,
+                                LOCAL_VECTOR_STORE_DIR)
+
+# Consultas típicas del bot para medir latencia y coincidencia de resultados
+SAMPLE_QUERIES = [
+    "¿Cuál es el plazo para conservar los expedientes de identificación de clientes?",
+    "¿Qué operaciones se consideran relevantes y cuándo se reportan?",
+    "Obligaciones del oficial de cumplimiento",
+    "¿Cómo se identifica al propietario real de una persona moral?",
+    "Criterios de la matriz de riesgo para transmisores de dinero",
+    "Reporte de operaciones inusuales: plazo y contenido",
+    "Medidas simplificadas de identificación para clientes de bajo riesgo",
+    "Capacitación anual en prevención de lavado de dinero",
+]
+
+
+def namespace_counts(store: VectorStore) -> Dict[str, int]:
+    stats = store.describe_index_stats()
+    return {name: ns.vector_count for name, ns in stats.namespaces.items()}
+
+
+def storage_bytes(store: VectorStore, count: int, dimensions: int) -> int:
+    """Espacio ocupado por los valores de los vectores (Pinecone guarda float32)"""
+    itemsize = store.dtype.itemsize if isinstance(store, LocalVectorStore) else 4
+    return count * dimensions * itemsize
+
+
+def target_store(source: VectorStore, dimensions: int, target_index: Optional[str]) -> VectorStore:
+    if isinstance(source, LocalVectorStore):
+        return LocalVectorStore(directory=target_index or f"{LOCAL_VECTOR_STORE_DIR}_{dimensions}",
+                                dtype=source.dtype.name)
+    return PineconeVectorStore(index_name=target_index or f"{source.index_name}-{dimensions}")
+
+
+def migrate_namespace(source: VectorStore, target: VectorStore, namespace: str, dimensions: int,
+                      batch: int) -> Dict[str, int]:
+    """Copiar un namespace re-generando los embeddings; devuelve vectores migrados y omitidos"""
+    service = get_embedding_service(os.getenv("OPENAI_API_KEY"))
+    migrated = skipped = 0
+    token = None
+    while True:
+        page = source.list_ids(namespace=namespace, limit=batch, pagination_token=token)
+        vectors = source.fetch(page.ids, namespace=namespace)
+
+        # Solo los vectores con el texto del chunk en metadatos se pueden re-generar
+        with_text = [vector for vector in vectors.values() if (vector["metadata"].get("texto") or "").strip()]
+        skipped += len(vectors) - len(with_text)
+        if with_text:
+            embeddings = service.embed([vector["metadata"]["texto"] for vector in with_text], dimensions=dimensions)
+            target.upsert(
+                [{"id": vector["id"], "values": embedding, "metadata": vector["metadata"]}
+                 for vector, embedding in zip(with_text, embeddings)],
+                namespace=namespace
+            )
+            migrated += len(with_text)
+
+        print(f"   ↳ {namespace or '(default)'}: {migrated} migrados, {skipped} sin texto")
+        token = page.pagination_token
+        if not token:
+            return {"migrated": migrated, "skipped": skipped}
+
+
+def measure_queries(store: VectorStore, namespace: str, embeddings: List[List[float]],
+                    repeats: int) -> Dict[str, object]:
+    """Latencia de consulta (top 5) y los IDs devueltos por cada consulta"""
+    samples, results = [], []
+    for embedding in embeddings:
+        for repeat in range(repeats):
+            start = time.perf_counter()
+            response = store.query(embedding, top_k=5, namespace=namespace, include_metadata=False)
+            samples.append(time.perf_counter() - start)
+        results.append([match.id for match in response.matches])
+    samples.sort()
+    return {
+        "median": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "ids": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrar el índice a embeddings de dimensión reducida")
+    parser.add_argument("--dimensions", type=int, required=True,
+                        help=f"Dimensión nueva ({'/'.join(str(d) for d in REDUCED_DIMENSIONS)})")
+    parser.add_argument("--target-index", help="Índice destino (default: <índice>-<dimensión> o "
+                                               "<LOCAL_VECTOR_STORE_DIR>_<dimensión> con el backend local)")
+    parser.add_argument("--batch", type=int, default=100, help="Vectores por página de lectura (default: 100)")
+    parser.add_argument("--repeats", type=int, default=5, help="Repeticiones por consulta de prueba (default: 5)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo estimar el espacio, sin re-generar")
+    args = parser.parse_args()
+
+    try:
+        dimensions = validate_dimensions(args.dimensions, EMBEDDING_MODEL)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    source = get_vector_store()
+    counts = namespace_counts(source)
+    total = sum(counts.values())
+    source_dimensions = source.describe_index_stats().dimension or native_dimensions(EMBEDDING_MODEL)
+
+    print(f"📐 Migración de embeddings {EMBEDDING_MODEL}: {source_dimensions} → {dimensions} dimensiones")
+    print("=" * 70)
+    print(f"📊 Índice actual: {total} vectores en {len(counts)} namespaces")
+    source_size = storage_bytes(source, total, source_dimensions)
+    estimated_size = storage_bytes(source, total, dimensions)
+    print(f"💾 Espacio de vectores: {source_size / 1e6:.1f} MB → {estimated_size / 1e6:.1f} MB "
+          f"({estimated_size / source_size if source_size else 0:.0%})")
+
+    if args.dry_run:
+        print("\n🔍 Dry run: no se generaron embeddings")
+        return
+
+    target = target_store(source, dimensions, args.target_index)
+    target_name = getattr(target, "index_name", None) or getattr(target, "directory", "")
+    print(f"🏗️ Índice destino: {target_name}")
+    target.ensure_index(dimension=dimensions)
+
+    start = time.perf_counter()
+    migrated = skipped = 0
+    for namespace in sorted(counts):
+        result = migrate_namespace(source, target, namespace, dimensions, args.batch)
+        migrated += result["migrated"]
+        skipped += result["skipped"]
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ {migrated} vectores migrados en {elapsed:.1f}s ({skipped} omitidos sin texto)")
+    print(f"   {get_embedding_service(os.getenv('OPENAI_API_KEY')).stats()}")
+
+    # Comparar latencia y resultados en el namespace más grande
+    if not counts:
+        return
+    namespace = max(counts, key=counts.get)
+    service = get_embedding_service(os.getenv("OPENAI_API_KEY"))
+    source_queries = service.embed(SAMPLE_QUERIES, use_store=False, dimensions=source_dimensions)
+    target_queries = service.embed(SAMPLE_QUERIES, use_store=False, dimensions=dimensions)
+    before = measure_queries(source, namespace, source_queries, args.repeats)
+    after = measure_queries(target, namespace, target_queries, args.repeats)
+    overlap = statistics.mean(
+        len(set(a) & set(b)) / len(a) if a else 1.0 for a, b in zip(before["ids"], after["ids"])
+    )
+
+    target_size = storage_bytes(target, migrated, dimensions)
+    print(f"\n📈 Comparación ({namespace or '(default)'}, {len(SAMPLE_QUERIES)} consultas, top 5)")
+    print(f"{'':<20}{'Espacio':>12}{'Mediana':>12}{'p95':>12}")
+    print(f"{f'{source_dimensions} dims':<20}{source_size / 1e6:10.1f} MB"
+          f"{before['median'] * 1000:9.1f} ms{before['p95'] * 1000:9.1f} ms")
+    print(f"{f'{dimensions} dims':<20}{target_size / 1e6:10.1f} MB"
+          f"{after['median'] * 1000:9.1f} ms{after['p95'] * 1000:9.1f} ms")
+    print(f"🎯 Coincidencia de resultados top 5: {overlap:.0%}")
+
+    print("\n👉 Para usar el índice nuevo, agrega al .env:")
+    print(f"   EMBEDDING_DIMENSIONS={dimensions}")
+    if isinstance(target, LocalVectorStore):
+        print(f"   LOCAL_VECTOR_STORE_DIR={target.directory}")
+    else:
+        print(f"   PINECONE_INDEX_NAME={target.index_name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -141,14 +141,14 @@ class AppOptimizer:
         logger.info("🔗 Probando conexión con OpenAI...")
         
         try:
-            from openai import OpenAI
+            from utils.openai_client import get_openai_client
             
             api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
                 logger.error("❌ API Key de OpenAI no configurada")
                 return False
             
-            client = OpenAI(api_key=api_key)
+            client = get_openai_client(api_key)
             
             # Probar con una consulta simple
             response = client.chat.completions.create(
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Precarga única de la caché de respuestas con conversaciones previas
+Toma los pares pregunta/respuesta de conversations.json, descarta los de poco valor (saludos,
+respuestas cortas, errores o sin información) y guarda cada consulta una sola vez: volver a
+ejecutarlo no duplica entradas ni reemplaza respuestas generadas por el bot.
+
+La caché se invalida con cada ingesta, así que conviene ejecutarlo justo después de una.
+
+Uso:
+    python seed_answer_cache.py
+    python seed_answer_cache.py --conversations conversations.json --limit 100
+"""
+
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.answer_cache import get_answer_cache
+from utils.embedding_cache import get_cached_embedding
+from slack_bot import search_documents, pack_answer_context
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precargar la caché de respuestas con conversaciones previas")
+    parser.add_argument("--conversations", default="conversations.json",
+                        help="Archivo de conversaciones del ConversationManager (default: conversations.json)")
+    parser.add_argument("--limit", type=int, default=200, help="Máximo de pares a precargar (default: 200)")
+    args = parser.parse_args()
+
+    cache = get_answer_cache()
+    seeded = cache.seed_from_conversations(search_documents, get_cached_embedding,
+                                           lambda matches: pack_answer_context(matches).chunk_ids,
+                                           storage_file=args.conversations, limit=args.limit)
+    print(f"🔥 {seeded} respuestas precargadas ({cache.stats()['entries']} en caché)")
+
+
+if __name__ == "__main__":
+    main()
@@ -66,8 +66,8 @@ def test_connections():
     
     # Test OpenAI
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        from utils.openai_client import get_openai_client
+        client = get_openai_client()
         response = client.chat.completions.create(
             model="gpt-4o",
             messages=[{"role": "user", "content": "test"}],
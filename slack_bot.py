@@ -6,14 +6,31 @@ Integrado con Pinecone y OpenAI para respuestas inteligentes
 
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional
 from dotenv import load_dotenv
+
+# Cargar variables de entorno antes de importar utils (sus módulos leen la configuración al importarse)
+load_dotenv()
+
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
-from pinecone import Pinecone
-from openai import OpenAI
-from extractor.text_chunker import get_embedding
+from utils.openai_client import get_openai_client
+from utils.embedding_cache import get_cached_embedding, get_embedding_cache
+from utils.answer_cache import get_answer_cache
+from utils.slack_streaming import SlackStreamUpdater
+from utils.index_counters import get_index_counters, start_backfill
+from utils.vector_store import get_vector_store
+from utils.single_flight import SingleFlight, make_flight_key
+from utils.namespace_search import NamespaceSearcher, NAMESPACE_FANOUT
+from utils.context_packer import pack_context, PackedContext
+from utils.document_store import attach_document_metadata
+from utils.mmr import mmr_select, SEARCH_DIVERSIFY, MMR_FETCH_K
+from utils.admission_control import (AdmissionController, AdmissionRejected, PRIORITY_COMMAND, PRIORITY_MESSAGE,
+                                     ADMISSION_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE)
+from utils.metrics import span, register_stats_gauge, start_metrics_server
+from utils.idempotency import get_event_deduplicator, idempotency_middleware
 
 # Configurar logging
 logging.basicConfig(
@@ -26,36 +43,100 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Cargar variables de entorno
-load_dotenv()
-
 # Configuración
 SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
 SLACK_APP_TOKEN = os.getenv("SLACK_APP_TOKEN")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+ANSWER_COMPLETION_PARAMS = {"model": "gpt-4o", "max_tokens": 1000, "temperature": 0.3}
+SLACK_STREAMING = os.getenv("SLACK_STREAMING", "0") == "1"
+STREAMING_PLACEHOLDER = "⏳ _Generando respuesta..._"
+# Hilos extra para seguidores de single-flight, /estado y los ack() de comandos mientras la cola está llena
+SLACK_LISTENER_HEADROOM = int(os.getenv("SLACK_LISTENER_HEADROOM", "16"))
+
+# Inicializar app de Slack (el token se verifica en main(), no al importar el módulo).
+# Las consultas en cola de admisión esperan dentro de un hilo de listener: el pool debe cubrir
+# las activas y toda la cola (el de Bolt por omisión tiene 5 hilos)
+app = App(
+    token=SLACK_BOT_TOKEN,
+    token_verification_enabled=False,
+    listener_executor=ThreadPoolExecutor(
+        max_workers=ADMISSION_MAX_CONCURRENCY + ADMISSION_MAX_QUEUE + SLACK_LISTENER_HEADROOM,
+        thread_name_prefix="slack-listener"
+    )
+)
+
+# Descartar eventos duplicados y reintentos de Slack antes de cualquier llamada externa
+app.use(idempotency_middleware)
+
+# Los clientes de OpenAI y del almacén vectorial se crean en el primer uso (get_openai_client / get_vector_store)
+_namespace_searcher: Optional[NamespaceSearcher] = None
+
+def get_namespace_searcher() -> NamespaceSearcher:
+    """Obtener el buscador de namespaces sobre el almacén vectorial compartido"""
+    global _namespace_searcher
+    if _namespace_searcher is None:
+        _namespace_searcher = NamespaceSearcher(get_vector_store())
+    return _namespace_searcher
+
+# Coalescencia de consultas idénticas concurrentes
+query_flight = SingleFlight()
+
+# Límite por usuario y global de pipelines concurrentes
+admission = AdmissionController()
+
+def register_bot_gauges(admission_stats, flight_stats):
+    """Exponer en /metrics las estadísticas de cachés, cola de admisión y coalescencia"""
+    register_stats_gauge("kawiil_embedding_cache", "Caché de embeddings de consultas", lambda: get_embedding_cache().stats())
+    register_stats_gauge("kawiil_answer_cache", "Caché semántica de respuestas", lambda: get_answer_cache().stats())
+    register_stats_gauge("kawiil_admission", "Cola de admisión de consultas", admission_stats)
+    register_stats_gauge("kawiil_single_flight", "Coalescencia de consultas idénticas", flight_stats)
+    register_stats_gauge("kawiil_slack_events", "Eventos de Slack recibidos y descartados", get_event_deduplicator().stats)
 
-# Inicializar clientes
-app = App(token=SLACK_BOT_TOKEN)
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX_NAME)
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+register_bot_gauges(admission.stats, query_flight.stats)
 
-def search_documents(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-    """Buscar documentos relevantes en Pinecone"""
+def search_documents(query: str, top_k: int = 5, cliente: Optional[str] = None,
+                     diversify: bool = SEARCH_DIVERSIFY) -> List[Dict[str, Any]]:
+    """
+    Buscar documentos relevantes en Pinecone.
+    Args:
+        query (str): Consulta del usuario.
+        top_k (int): Número de resultados.
+        cliente (str, opcional): Restringir la búsqueda a los namespaces del cliente.
+        diversify (bool): Reordenar candidatos con MMR para cubrir más documentos distintos.
+    Returns:
+        List: Matches ordenados por score (o por selección MMR).
+    """
     try:
-        # Generar embedding de la consulta
-        query_embedding = get_embedding(query)
-        
-        # Buscar en Pinecone
-        results = index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True
-        )
-        
-        return results.matches
+        # Generar embedding de la consulta (con caché LRU + SQLite)
+        with span("slack", "embedding"):
+            query_embedding = get_cached_embedding(query)
+        
+        # Con diversificación se piden más candidatos junto con sus vectores
+        fetch_k = max(MMR_FETCH_K, top_k) if diversify else top_k
+        
+        with span("slack", "busqueda"):
+            # Consultar todos los namespaces en paralelo y fusionar por score
+            if NAMESPACE_FANOUT or cliente:
+                matches = get_namespace_searcher().search(
+                    query_embedding, top_k=fetch_k, cliente=cliente, include_metadata=True, include_values=diversify
+                )
+            else:
+                # Buscar en Pinecone
+                matches = get_vector_store().query(
+                    vector=query_embedding,
+                    top_k=fetch_k,
+                    include_metadata=True,
+                    include_values=diversify
+                ).matches
+        
+        if diversify:
+            with span("slack", "diversificacion"):
+                matches = mmr_select(query_embedding, matches, top_k=top_k)
+        
+        # Unir los metadatos del documento (resumen, temas, riesgos...) desde el almacén local
+        return attach_document_metadata(matches)
     except Exception as e:
         logger.error(f"Error en búsqueda: {e}")
         return []
@@ -102,30 +183,15 @@ def format_metadata_summary(metadata: Dict[str, Any]) -> str:
     
     return "\n".join(summary)
 
-def generate_enhanced_response(query: str, search_results: List[Dict[str, Any]]) -> str:
-    """Generar respuesta mejorada usando OpenAI con metadatos enriquecidos"""
-    try:
-        # Preparar contexto con metadatos enriquecidos
-        context_parts = []
-        
-        for i, result in enumerate(search_results[:3], 1):  # Usar top 3 resultados
-            metadata = result.metadata
-            score = result.score
-            
-            # Crear resumen del documento con metadatos enriquecidos
-            doc_summary = f"""
-Documento {i} (Relevancia: {score:.2f}):
-{format_metadata_summary(metadata)}
+def pack_answer_context(search_results: List[Dict[str, Any]]) -> PackedContext:
+    """Preparar contexto con metadatos enriquecidos (una vez por documento, dentro del presupuesto de tokens)"""
+    return pack_context(search_results, format_metadata_summary)
 
-Contenido relevante:
-{metadata.get('texto', '')[:500]}...
-"""
-            context_parts.append(doc_summary)
-        
-        context = "\n\n".join(context_parts)
-        
-        # Generar respuesta con OpenAI
-        prompt = f"""
+def build_answer_messages(query: str, packed: PackedContext) -> List[Dict[str, str]]:
+    """Construir los mensajes del prompt de respuesta a partir del contexto empaquetado"""
+    context = packed.text
+    
+    prompt = f"""
 Eres un experto en cumplimiento regulatorio financiero. Responde la siguiente consulta basándote en los documentos proporcionados.
 
 Consulta del usuario: {query}
@@ -147,18 +213,35 @@ Formato de respuesta:
 - Referencias a documentos específicos
 - Recomendaciones o próximos pasos (si aplica)
 """
+    
+    return [
+        {"role": "system", "content": "Eres un consultor experto en cumplimiento regulatorio financiero con amplia experiencia en AML, KYC, y regulaciones bancarias."},
+        {"role": "user", "content": prompt}
+    ]
+
+def generate_enhanced_response(query: str, search_results: List[Dict[str, Any]]) -> str:
+    """Generar respuesta mejorada usando OpenAI con metadatos enriquecidos"""
+    try:
+        # Buscar respuesta previa para una consulta equivalente con el mismo contexto
+        answer_cache = get_answer_cache()
+        query_embedding = get_cached_embedding(query)
+        # La llave son los chunks que realmente entran al prompt
+        packed = pack_answer_context(search_results)
+        cached_answer = answer_cache.lookup(query_embedding, packed.chunk_ids)
+        if cached_answer:
+            return cached_answer
         
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "Eres un consultor experto en cumplimiento regulatorio financiero con amplia experiencia en AML, KYC, y regulaciones bancarias."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.3
-        )
+        # Generar respuesta con OpenAI
+        messages = build_answer_messages(query, packed)
+        with span("slack", "llm"):
+            response = get_openai_client(OPENAI_API_KEY).chat.completions.create(
+                messages=messages,
+                **ANSWER_COMPLETION_PARAMS
+            )
         
-        return response.choices[0].message.content.strip()
+        answer = response.choices[0].message.content.strip()
+        answer_cache.store(query, query_embedding, packed.chunk_ids, answer)
+        return answer
         
     except Exception as e:
         logger.error(f"Error generando respuesta: {e}")
@@ -170,6 +253,61 @@ def create_enhanced_slack_response(query: str, search_results: List[Dict[str, An
     # Generar respuesta principal
     main_response = generate_enhanced_response(query, search_results)
     
+    return build_slack_response(query, main_response, search_results)
+
+def stream_enhanced_response(client, channel: str, query: str, search_results: List[Dict[str, Any]]):
+    """Publicar un placeholder con los documentos encontrados y actualizarlo con la respuesta en streaming"""
+    
+    def render(text: str) -> List[Dict[str, Any]]:
+        return build_slack_response(query, text, search_results)["blocks"]
+    
+    # Placeholder inmediato con la lista de documentos consultados
+    with span("slack", "slack_post"):
+        posted = client.chat_postMessage(channel=channel, text=STREAMING_PLACEHOLDER, blocks=render(STREAMING_PLACEHOLDER))
+    updater = SlackStreamUpdater(client, channel, posted["ts"], render)
+    
+    try:
+        answer_cache = get_answer_cache()
+        query_embedding = get_cached_embedding(query)
+        # La llave son los chunks que realmente entran al prompt
+        packed = pack_answer_context(search_results)
+        cached_answer = answer_cache.lookup(query_embedding, packed.chunk_ids)
+        if cached_answer:
+            updater.finish(cached_answer)
+            return
+        
+        messages = build_answer_messages(query, packed)
+        with span("slack", "llm_streaming"):
+            stream = get_openai_client(OPENAI_API_KEY).chat.completions.create(
+                messages=messages,
+                stream=True,
+                **ANSWER_COMPLETION_PARAMS
+            )
+            
+            answer = ""
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    answer += chunk.choices[0].delta.content
+                    updater.update(answer)
+        
+        answer = answer.strip()
+        updater.finish(answer)
+        answer_cache.store(query, query_embedding, packed.chunk_ids, answer)
+        
+    except Exception as e:
+        logger.error(f"Error generando respuesta en streaming: {e}")
+        updater.finish(f"❌ Error generando respuesta: {e}")
+
+def answer_query(query: str) -> Optional[Dict[str, Any]]:
+    """Ejecutar el pipeline completo (búsqueda + respuesta); None si no hay documentos relevantes"""
+    search_results = search_documents(query)
+    if not search_results:
+        return None
+    return create_enhanced_slack_response(query, search_results)
+
+def build_slack_response(query: str, main_response: str, search_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Construir los bloques de Slack para una respuesta ya generada"""
+    
     # Crear bloques de Slack
     blocks = [
         {
@@ -244,8 +382,105 @@ def create_enhanced_slack_response(query: str, search_results: List[Dict[str, An
         "blocks": blocks
     }
 
+def build_no_results_response(query: str) -> Dict[str, Any]:
+    """Construir la respuesta de Slack cuando no hay documentos relevantes"""
+    return {
+        "response_type": "in_channel",
+        "blocks": [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"❌ No se encontraron documentos relevantes para: *{query}*\n\n💡 Intenta reformular tu consulta o usar palabras clave más específicas."
+                }
+            }
+        ]
+    }
+
+def build_flight_section(flight_stats: Dict[str, Any]) -> str:
+    """Construir la sección de /estado con las métricas de coalescencia de consultas"""
+    return f"""
+🔗 *Consultas idénticas en curso:*
+• Ejecuciones del pipeline: {flight_stats['executions']}
+• Consultas compartidas (sin nueva ejecución): {flight_stats['collapsed']} ({flight_stats['collapse_rate']:.0%})
+"""
+
+def build_admission_section(admission_stats: Dict[str, Any]) -> str:
+    """Construir la sección de /estado con la cola de admisión y los tiempos de espera"""
+    lanes = "\n".join(
+        f"• Espera {name}: prom. {lane['wait_avg']:.1f}s, p95 {lane['wait_p95']:.1f}s, "
+        f"máx. {lane['wait_max']:.1f}s (en cola: {lane['queue_depth']})"
+        for name, lane in admission_stats["lanes"].items()
+    )
+    return f"""
+⚙️ *Control de admisión:*
+• Consultas activas: {admission_stats['active']}/{admission_stats['limit']}
+• Consultas en cola: {admission_stats['queue_depth']} (máximo observado: {admission_stats['max_queue_depth']})
+• Admitidas: {admission_stats['admitted']} | Encoladas: {admission_stats['queued']} | Rechazadas: {admission_stats['rejected']}
+{lanes}
+"""
+
+def build_queued_text(position: int) -> str:
+    """Aviso inmediato para una consulta que queda en cola"""
+    return f"⏳ Tu consulta está en cola (posición {position}). Te responderé en cuanto sea tu turno."
+
+BUSY_TEXT = "⚠️ El bot está atendiendo demasiadas consultas en este momento. Intenta de nuevo en unos minutos."
+
+def build_status_text(counters: Dict[str, Any], extra_sections: str = "") -> str:
+    """Construir el texto del comando /estado a partir de los contadores locales del índice"""
+    por_cliente = "\n".join(
+        f"   - {cliente}: {count:,}" for cliente, count in list(counters["por_cliente"].items())[:5]
+    ) or "   - Sin datos"
+    por_tipo = "\n".join(
+        f"   - {tipo}: {count:,}" for tipo, count in list(counters["por_tipo_documento"].items())[:5]
+    ) or "   - Sin datos"
+    ultima_actualizacion = counters["ultima_actualizacion"] or "Nunca"
+    
+    # Estadísticas de las cachés
+    cache_stats = get_embedding_cache().stats()
+    answer_stats = get_answer_cache().stats()
+    
+    return f"""
+📊 *Estado del Sistema de Cumplimiento*
+
+🔍 *Base de Datos:*
+• Total de vectores: {counters['total']:,}
+• Vectores con metadatos enriquecidos: {counters['enriquecidos']:,}
+• Por cliente:
+{por_cliente}
+• Por tipo de documento:
+{por_tipo}
+• Última actualización del índice: {ultima_actualizacion}
+• Estado: ✅ Operativo
+
+🗄️ *Caché de embeddings:*
+• Aciertos: {cache_stats['memory_hits'] + cache_stats['disk_hits']} (memoria: {cache_stats['memory_hits']}, disco: {cache_stats['disk_hits']})
+• Fallos: {cache_stats['misses']}
+• Tasa de aciertos: {cache_stats['hit_rate']:.0%}
+
+💬 *Caché de respuestas:*
+• Respuestas en caché: {answer_stats['entries']} (versión del índice: {answer_stats['index_version']})
+• Tasa de aciertos: {answer_stats['hit_rate']:.0%}
+{extra_sections}
+🤖 *Servicios:*
+• Pinecone: ✅ Conectado
+• OpenAI: ✅ Conectado
+• Slack Bot: ✅ Activo
+
+⏰ *Última actualización:* {datetime.now().strftime('%d/%m/%Y %H:%M')}
+    """
+
+def run_admitted(user_id: str, priority: int, on_queued: Callable[[int], Any], fn: Callable[..., Any], *args) -> Any:
+    """
+    Ejecutar fn dentro del control de admisión.
+    Se llama dentro de query_flight.do: solo el líder de cada grupo de consultas idénticas
+    ocupa un lugar en la cola; los demás esperan su resultado sin consumir cupo.
+    """
+    with admission.admit(user_id, priority, on_queued=on_queued):
+        return fn(*args)
+
 @app.message("")
-def handle_message(message, say):
+def handle_message(message, say, client):
     """Manejar mensajes entrantes"""
     try:
         user_query = message.get('text', '').strip()
@@ -255,33 +490,44 @@ def handle_message(message, say):
         if message.get('bot_id'):
             return
         
+        # Cada mensaje de usuario ejecuta el pipeline una sola vez
+        if not get_event_deduplicator().claim_message(message):
+            return
+        
         logger.info(f"Consulta de usuario {user_id}: {user_query}")
         
-        # Buscar documentos relevantes
-        search_results = search_documents(user_query)
-        
-        if not search_results:
-            response = {
-                "response_type": "in_channel",
-                "blocks": [
-                    {
-                        "type": "section",
-                        "text": {
-                            "type": "mrkdwn",
-                            "text": f"❌ No se encontraron documentos relevantes para: *{user_query}*\n\n💡 Intenta reformular tu consulta o usar palabras clave más específicas."
-                        }
-                    }
-                ]
-            }
-        else:
-            # Generar respuesta mejorada
-            response = create_enhanced_slack_response(user_query, search_results)
+        on_queued = lambda position: say(build_queued_text(position))
+        with span("slack", "pipeline_mensaje"):
+            if SLACK_STREAMING:
+                # Modo streaming: cada solicitante genera su propia respuesta, así que se admite una
+                # sola vez para búsqueda + respuesta; solo la búsqueda se comparte
+                with admission.admit(user_id, PRIORITY_MESSAGE, on_queued=on_queued):
+                    search_results = query_flight.do(
+                        make_flight_key(user_query, stage="search"), search_documents, user_query
+                    )
+                    if search_results:
+                        stream_enhanced_response(client, message['channel'], user_query, search_results)
+                        logger.info(f"Respuesta transmitida para usuario {user_id}")
+                        return
+                response = build_no_results_response(user_query)
+            else:
+                # Buscar documentos y generar respuesta (compartido entre consultas idénticas en curso)
+                response = query_flight.do(
+                    make_flight_key(user_query),
+                    run_admitted, user_id, PRIORITY_MESSAGE, on_queued, answer_query, user_query
+                )
+                if response is None:
+                    response = build_no_results_response(user_query)
         
         # Enviar respuesta
-        say(**response)
+        with span("slack", "slack_post"):
+            say(**response)
         
         logger.info(f"Respuesta enviada para usuario {user_id}")
         
+    except AdmissionRejected as e:
+        logger.warning(f"Consulta rechazada para usuario {message.get('user', '')}: {e}")
+        say(BUSY_TEXT)
     except Exception as e:
         logger.error(f"Error manejando mensaje: {e}")
         say(f"❌ Error procesando tu consulta: {e}")
@@ -300,19 +546,26 @@ def handle_cumplimiento_command(ack, command, respond):
         user_id = command.get('user_id', '')
         logger.info(f"Comando /cumplimiento de usuario {user_id}: {query}")
         
-        # Buscar documentos
-        search_results = search_documents(query)
+        # Buscar documentos y generar respuesta (compartido entre consultas idénticas en curso)
+        with span("slack", "pipeline_comando"):
+            response = query_flight.do(
+                make_flight_key(query),
+                run_admitted, user_id, PRIORITY_COMMAND, lambda position: respond(build_queued_text(position)),
+                answer_query, query
+            )
         
-        if not search_results:
+        if response is None:
             respond(f"❌ No se encontraron documentos relevantes para: *{query}*")
             return
         
-        # Generar respuesta mejorada
-        response = create_enhanced_slack_response(query, search_results)
-        respond(**response)
+        with span("slack", "slack_post"):
+            respond(**response)
         
         logger.info(f"Respuesta de comando enviada para usuario {user_id}")
         
+    except AdmissionRejected as e:
+        logger.warning(f"Comando rechazado para usuario {command.get('user_id', '')}: {e}")
+        respond(BUSY_TEXT)
     except Exception as e:
         logger.error(f"Error manejando comando: {e}")
         respond(f"❌ Error procesando comando: {e}")
@@ -323,39 +576,11 @@ def handle_status_command(ack, command, respond):
     try:
         ack()
         
-        # Obtener estadísticas del índice
-        stats = index.describe_index_stats()
-        total_vectors = stats.total_vector_count
-        
-        # Contar vectores con metadatos enriquecidos
-        enriched_count = 0
-        try:
-            # Buscar vectores con metadatos enriquecidos
-            query_response = index.query(
-                vector=[0] * 1536,
-                top_k=1000,
-                include_metadata=True,
-                filter={"metadata_enriquecido": {"$eq": True}}
-            )
-            enriched_count = len(query_response.matches)
-        except:
-            enriched_count = "N/A"
-        
-        status_text = f"""
-📊 *Estado del Sistema de Cumplimiento*
-
-🔍 *Base de Datos:*
-• Total de vectores: {total_vectors:,}
-• Vectores con metadatos enriquecidos: {enriched_count}
-• Estado: ✅ Operativo
-
-🤖 *Servicios:*
-• Pinecone: ✅ Conectado
-• OpenAI: ✅ Conectado
-• Slack Bot: ✅ Activo
-
-⏰ *Última actualización:* {datetime.now().strftime('%d/%m/%Y %H:%M')}
-        """
+        # Contadores locales mantenidos por la ingesta (sin consultar el índice)
+        status_text = build_status_text(
+            get_index_counters().summary(),
+            build_admission_section(admission.stats()) + build_flight_section(query_flight.stats())
+        )
         
         respond({
             "response_type": "in_channel",
@@ -415,14 +640,25 @@ def main():
     logger.info("🔍 Metadatos enriquecidos: ✅ Activado")
     
     # Verificar configuración
-    if not all([SLACK_BOT_TOKEN, SLACK_APP_TOKEN, PINECONE_API_KEY, OPENAI_API_KEY]):
+    index = get_vector_store()
+    if not all([SLACK_BOT_TOKEN, SLACK_APP_TOKEN, OPENAI_API_KEY]) or (index.backend == "pinecone" and not PINECONE_API_KEY):
         logger.error("❌ Variables de entorno faltantes")
         return
     
     try:
-        # Verificar conexión con Pinecone
+        # Verificar token de Slack
+        auth = app.client.auth_test()
+        logger.info(f"✅ Conectado a Slack como {auth.get('user')}")
+        
+        # Verificar conexión con el almacén vectorial
         stats = index.describe_index_stats()
-        logger.info(f"✅ Conectado a Pinecone: {stats.total_vector_count} vectores")
+        logger.info(f"✅ Conectado al almacén vectorial ({index.backend}): {stats.total_vector_count} vectores")
+        
+        # /estado lee los contadores locales: registrar los vectores anteriores a ellos
+        start_backfill(index)
+        
+        # Endpoint /metrics (si METRICS_PORT está definido)
+        start_metrics_server()
         
         # Iniciar bot
         handler = SocketModeHandler(app, SLACK_APP_TOKEN)
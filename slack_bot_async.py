@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Bot de Slack asíncrono para consultas de cumplimiento regulatorio
+Modo asyncio (AsyncApp + clientes asíncronos de OpenAI y Pinecone) con control de admisión
+
+Uso: python slack_bot_async.py
+"""
+
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Dict, Any, Optional
+from dotenv import load_dotenv
+
+# Cargar variables de entorno antes de importar utils (sus módulos leen la configuración al importarse)
+load_dotenv()
+
+from slack_bolt.async_app import AsyncApp
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+from utils.openai_client import get_async_openai_client
+from utils.embedding_cache import get_embedding_cache, DEFAULT_EMBEDDING_MODEL
+from utils.embedding_config import dimension_params
+from utils.answer_cache import get_answer_cache
+from utils.slack_streaming import AsyncSlackStreamUpdater
+from utils.index_counters import get_index_counters, start_backfill
+from utils.vector_store import get_vector_store, VECTOR_STORE_BACKEND
+from utils.single_flight import AsyncSingleFlight, make_flight_key
+from utils.namespace_search import NamespaceCatalog, async_fanout_query, NAMESPACE_FANOUT
+from utils.mmr import mmr_select, SEARCH_DIVERSIFY, MMR_FETCH_K
+from utils.document_store import attach_document_metadata
+from utils.metrics import span, start_metrics_server
+from utils.idempotency import get_event_deduplicator, async_idempotency_middleware
+from utils.admission_control import AsyncAdmissionController, AdmissionRejected, PRIORITY_COMMAND, PRIORITY_MESSAGE
+from slack_bot import (
+    SLACK_BOT_TOKEN,
+    SLACK_APP_TOKEN,
+    PINECONE_API_KEY,
+    PINECONE_INDEX_NAME,
+    OPENAI_API_KEY,
+    ANSWER_COMPLETION_PARAMS,
+    SLACK_STREAMING,
+    STREAMING_PLACEHOLDER,
+    pack_answer_context,
+    build_answer_messages,
+    build_slack_response,
+    build_no_results_response,
+    build_status_text,
+    build_flight_section,
+    build_admission_section,
+    build_queued_text,
+    BUSY_TEXT,
+    register_bot_gauges
+)
+
+logger = logging.getLogger(__name__)
+
+# Configuración de concurrencia
+SLACK_MAX_CONCURRENCY = int(os.getenv("SLACK_MAX_CONCURRENCY", "8"))
+
+# Inicializar app de Slack (el cliente de OpenAI se crea en el primer uso)
+async_app = AsyncApp(token=SLACK_BOT_TOKEN)
+async_app.use(async_idempotency_middleware)
+
+# El cliente de Pinecone se conecta en main() (requiere el event loop activo)
+pinecone_client = None
+async_index = None
+
+# Con el backend local las consultas se ejecutan en un hilo (NumPy libera el GIL)
+local_store = get_vector_store() if VECTOR_STORE_BACKEND == "local" else None
+namespace_catalog = NamespaceCatalog()
+
+
+# Límite por usuario y global de pipelines concurrentes (con carril prioritario para comandos)
+admission = AsyncAdmissionController(max_concurrency=SLACK_MAX_CONCURRENCY)
+query_flight = AsyncSingleFlight()
+register_bot_gauges(admission.stats, query_flight.stats)
+
+
+async def get_query_embedding(query: str) -> List[float]:
+    """Embedding de la consulta pasando por la caché compartida (SQLite en un hilo)"""
+    cache = get_embedding_cache()
+    embedding = await asyncio.to_thread(cache.get, query)
+    if embedding is not None:
+        return embedding
+
+    response = await get_async_openai_client(OPENAI_API_KEY).embeddings.create(
+        model=DEFAULT_EMBEDDING_MODEL,
+        input=[query],
+        **dimension_params(DEFAULT_EMBEDDING_MODEL)
+    )
+    embedding = response.data[0].embedding
+    await asyncio.to_thread(cache.put, query, embedding)
+    return embedding
+
+
+async def query_index(**query_kwargs):
+    """Consulta al índice sin bloquear el event loop (local en un hilo, Pinecone asíncrono)"""
+    if local_store is not None:
+        return await asyncio.to_thread(local_store.query, **query_kwargs)
+    return await async_index.query(**query_kwargs)
+
+
+async def search_namespaces(query_embedding: List[float], top_k: int, cliente: Optional[str],
+                            include_values: bool = False) -> List[Any]:
+    """Consultar los namespaces del índice en paralelo y fusionar por score"""
+    if namespace_catalog.needs_refresh():
+        if local_store is not None:
+            stats = await asyncio.to_thread(local_store.describe_index_stats)
+        else:
+            stats = await async_index.describe_index_stats()
+        namespace_catalog.update(stats)
+
+    return await async_fanout_query(
+        query_index,
+        namespace_catalog.select(cliente),
+        top_k=top_k,
+        cliente=cliente,
+        vector=query_embedding,
+        include_metadata=True,
+        include_values=include_values
+    )
+
+
+async def search_documents(query: str, top_k: int = 5, cliente: Optional[str] = None,
+                           diversify: bool = SEARCH_DIVERSIFY) -> List[Dict[str, Any]]:
+    """Buscar documentos relevantes en Pinecone (asíncrono)"""
+    try:
+        with span("slack", "embedding"):
+            query_embedding = await get_query_embedding(query)
+        fetch_k = max(MMR_FETCH_K, top_k) if diversify else top_k
+
+        with span("slack", "busqueda"):
+            if NAMESPACE_FANOUT or cliente:
+                matches = await search_namespaces(query_embedding, fetch_k, cliente, include_values=diversify)
+            else:
+                results = await query_index(
+                    vector=query_embedding,
+                    top_k=fetch_k,
+                    include_metadata=True,
+                    include_values=diversify
+                )
+                matches = results.matches
+
+        if diversify:
+            # Selección MMR vectorizada (NumPy) fuera del event loop
+            with span("slack", "diversificacion"):
+                matches = await asyncio.to_thread(mmr_select, query_embedding, matches, top_k)
+
+        # Unir los metadatos del documento desde el almacén local (SQLite, fuera del event loop)
+        return await asyncio.to_thread(attach_document_metadata, matches)
+    except Exception as e:
+        logger.error(f"Error en búsqueda: {e}")
+        return []
+
+
+async def generate_enhanced_response(query: str, search_results: List[Dict[str, Any]]) -> str:
+    """Generar respuesta mejorada usando el cliente asíncrono de OpenAI"""
+    try:
+        answer_cache = get_answer_cache()
+        query_embedding = await get_query_embedding(query)
+        # La llave son los chunks que realmente entran al prompt (tokenizado y búsqueda en caché fuera del event loop)
+        packed = await asyncio.to_thread(pack_answer_context, search_results)
+        cached_answer = await asyncio.to_thread(answer_cache.lookup, query_embedding, packed.chunk_ids)
+        if cached_answer:
+            return cached_answer
+
+        messages = build_answer_messages(query, packed)
+        with span("slack", "llm"):
+            response = await get_async_openai_client(OPENAI_API_KEY).chat.completions.create(
+                messages=messages,
+                **ANSWER_COMPLETION_PARAMS
+            )
+
+        answer = response.choices[0].message.content.strip()
+        await asyncio.to_thread(answer_cache.store, query, query_embedding, packed.chunk_ids, answer)
+        return answer
+
+    except Exception as e:
+        logger.error(f"Error generando respuesta: {e}")
+        return f"❌ Error generando respuesta: {e}"
+
+
+async def stream_enhanced_response(client, channel: str, query: str, search_results: List[Dict[str, Any]]):
+    """Publicar un placeholder y actualizarlo con la respuesta en streaming (asíncrono)"""
+
+    def render(text: str) -> List[Dict[str, Any]]:
+        return build_slack_response(query, text, search_results)["blocks"]
+
+    with span("slack", "slack_post"):
+        posted = await client.chat_postMessage(channel=channel, text=STREAMING_PLACEHOLDER, blocks=render(STREAMING_PLACEHOLDER))
+    updater = AsyncSlackStreamUpdater(client, channel, posted["ts"], render)
+
+    try:
+        answer_cache = get_answer_cache()
+        query_embedding = await get_query_embedding(query)
+        # La llave son los chunks que realmente entran al prompt (tokenizado y búsqueda en caché fuera del event loop)
+        packed = await asyncio.to_thread(pack_answer_context, search_results)
+        cached_answer = await asyncio.to_thread(answer_cache.lookup, query_embedding, packed.chunk_ids)
+        if cached_answer:
+            await updater.finish(cached_answer)
+            return
+
+        messages = build_answer_messages(query, packed)
+        with span("slack", "llm_streaming"):
+            stream = await get_async_openai_client(OPENAI_API_KEY).chat.completions.create(
+                messages=messages,
+                stream=True,
+                **ANSWER_COMPLETION_PARAMS
+            )
+
+            answer = ""
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    answer += chunk.choices[0].delta.content
+                    await updater.update(answer)
+
+        answer = answer.strip()
+        await updater.finish(answer)
+        await asyncio.to_thread(answer_cache.store, query, query_embedding, packed.chunk_ids, answer)
+
+    except Exception as e:
+        logger.error(f"Error generando respuesta en streaming: {e}")
+        await updater.finish(f"❌ Error generando respuesta: {e}")
+
+
+async def answer_query(query: str) -> Optional[Dict[str, Any]]:
+    """Ejecutar el pipeline completo (búsqueda + respuesta)"""
+    search_results = await search_documents(query)
+    if not search_results:
+        return None
+
+    main_response = await generate_enhanced_response(query, search_results)
+    return build_slack_response(query, main_response, search_results)
+
+
+async def run_admitted(user_id: str, priority: int, on_queued: Callable[[int], Any],
+                       fn: Callable[..., Awaitable[Any]], *args) -> Any:
+    """Ejecutar fn dentro del control de admisión (solo el líder de query_flight ocupa un lugar)"""
+    async with admission.admit(user_id, priority, on_queued=on_queued):
+        return await fn(*args)
+
+
+@async_app.message("")
+async def handle_message(message, say, client):
+    """Manejar mensajes entrantes"""
+    try:
+        user_query = message.get('text', '').strip()
+        user_id = message.get('user', '')
+
+        # Ignorar mensajes del bot
+        if message.get('bot_id'):
+            return
+
+        # Cada mensaje de usuario ejecuta el pipeline una sola vez
+        if not get_event_deduplicator().claim_message(message):
+            return
+
+        logger.info(f"Consulta de usuario {user_id}: {user_query}")
+
+        on_queued = lambda position: say(build_queued_text(position))
+        with span("slack", "pipeline_mensaje"):
+            if SLACK_STREAMING:
+                # Una sola admisión para búsqueda + respuesta propia; solo la búsqueda se comparte
+                async with admission.admit(user_id, PRIORITY_MESSAGE, on_queued=on_queued):
+                    search_results = await query_flight.do(
+                        make_flight_key(user_query, stage="search"), search_documents, user_query
+                    )
+                    if search_results:
+                        await stream_enhanced_response(client, message['channel'], user_query, search_results)
+                        logger.info(f"Respuesta transmitida para usuario {user_id}")
+                        return
+                response = None
+            else:
+                response = await query_flight.do(
+                    make_flight_key(user_query),
+                    run_admitted, user_id, PRIORITY_MESSAGE, on_queued, answer_query, user_query
+                )
+
+        if response is None:
+            response = build_no_results_response(user_query)
+
+        with span("slack", "slack_post"):
+            await say(**response)
+
+        logger.info(f"Respuesta enviada para usuario {user_id}")
+
+    except AdmissionRejected as e:
+        logger.warning(f"Consulta rechazada para usuario {message.get('user', '')}: {e}")
+        await say(BUSY_TEXT)
+    except Exception as e:
+        logger.error(f"Error manejando mensaje: {e}")
+        await say(f"❌ Error procesando tu consulta: {e}")
+
+
+@async_app.command("/cumplimiento")
+async def handle_cumplimiento_command(ack, command, respond):
+    """Manejar comando /cumplimiento"""
+    try:
+        await ack()
+
+        query = command.get('text', '').strip()
+        if not query:
+            await respond("❌ Por favor proporciona una consulta. Ejemplo: `/cumplimiento requisitos KYC`")
+            return
+
+        user_id = command.get('user_id', '')
+        logger.info(f"Comando /cumplimiento de usuario {user_id}: {query}")
+
+        with span("slack", "pipeline_comando"):
+            response = await query_flight.do(
+                make_flight_key(query),
+                run_admitted, user_id, PRIORITY_COMMAND, lambda position: respond(build_queued_text(position)),
+                answer_query, query
+            )
+        if response is None:
+            await respond(f"❌ No se encontraron documentos relevantes para: *{query}*")
+            return
+
+        with span("slack", "slack_post"):
+            await respond(**response)
+
+        logger.info(f"Respuesta de comando enviada para usuario {user_id}")
+
+    except AdmissionRejected as e:
+        logger.warning(f"Comando rechazado para usuario {command.get('user_id', '')}: {e}")
+        await respond(BUSY_TEXT)
+    except Exception as e:
+        logger.error(f"Error manejando comando: {e}")
+        await respond(f"❌ Error procesando comando: {e}")
+
+
+@async_app.command("/estado")
+async def handle_status_command(ack, command, respond):
+    """Manejar comando /estado incluyendo el estado de la cola de consultas"""
+    try:
+        await ack()
+
+        await respond({
+            "response_type": "in_channel",
+            "blocks": [
+                {
+                    "type": "section",
+                    "text": {
+                        "type": "mrkdwn",
+                        "text": build_status_text(
+                            get_index_counters().summary(),
+                            build_admission_section(admission.stats()) + build_flight_section(query_flight.stats())
+                        )
+                    }
+                }
+            ]
+        })
+
+    except Exception as e:
+        logger.error(f"Error en comando /estado: {e}")
+        await respond(f"❌ Error verificando estado: {e}")
+
+
+async def main():
+    """Función principal del modo asíncrono"""
+    global pinecone_client, async_index
+
+    logger.info("🤖 Iniciando Bot de Slack (modo asíncrono)")
+    logger.info(f"⚙️ Concurrencia máxima: {SLACK_MAX_CONCURRENCY} consultas")
+
+    if not all([SLACK_BOT_TOKEN, SLACK_APP_TOKEN, OPENAI_API_KEY]) or (local_store is None and not PINECONE_API_KEY):
+        logger.error("❌ Variables de entorno faltantes")
+        return
+
+    try:
+        if local_store is not None:
+            stats = local_store.describe_index_stats()
+            logger.info(f"✅ Almacén vectorial local: {stats.total_vector_count} vectores")
+        else:
+            # Conectar cliente asíncrono de Pinecone
+            from pinecone import PineconeAsyncio
+            pinecone_client = PineconeAsyncio(api_key=PINECONE_API_KEY)
+            index_description = await pinecone_client.describe_index(PINECONE_INDEX_NAME)
+            async_index = pinecone_client.IndexAsyncio(host=index_description.host)
+
+            stats = await async_index.describe_index_stats()
+            logger.info(f"✅ Conectado a Pinecone: {stats.total_vector_count} vectores")
+
+        # /estado lee los contadores locales: registrar los vectores anteriores a ellos
+        start_backfill(get_vector_store())
+        start_metrics_server()
+
+        handler = AsyncSocketModeHandler(async_app, SLACK_APP_TOKEN)
+        logger.info("🚀 Bot asíncrono iniciado exitosamente")
+        await handler.start_async()
+
+    except Exception as e:
+        logger.error(f"❌ Error iniciando bot asíncrono: {e}")
+    finally:
+        if async_index is not None:
+            await async_index.close()
+        if pinecone_client is not None:
+            await pinecone_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,20 +1,21 @@
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+
+# Cargar variables de entorno antes de importar utils y extractor (leen la configuración al importarse)
+load_dotenv()
+
+from utils.openai_client import get_openai_client
 import pinecone
 from extractor.text_chunker import get_embedding
 from extractor.pinecone_uploader import query_pinecone
 
-# Cargar variables de entorno
-load_dotenv()
-
 def test_bot_functionality():
     print("🧪 Probando funcionalidad del bot...")
     
     try:
         # Inicializar clientes
         print("1. Inicializando OpenAI...")
-        openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        openai_client = get_openai_client()
         print("✅ OpenAI inicializado")
         
         print("2. Inicializando Pinecone...")
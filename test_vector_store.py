@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para verificar el almacén vectorial local (sin red)
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+
+# Agregar el directorio actual al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.vector_store import LocalVectorStore, matches_filter
+
+
+def _random_vectors(count, dimension=64, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(count, dimension)).astype(np.float32)
+
+
+def test_local_vector_store():
+    """Prueba upsert, consulta, filtros, actualización y borrado"""
+
+    print("🧪 Probando almacén vectorial local...")
+
+    for dtype in ("float16", "int8"):
+        with tempfile.TemporaryDirectory() as directory:
+            store = LocalVectorStore(directory=directory, dtype=dtype)
+            data = _random_vectors(200)
+            store.upsert([
+                {
+                    "id": f"doc-{i}",
+                    "values": data[i].tolist(),
+                    "metadata": {"cliente": "A" if i % 2 else "B", "chunk_index": i, "texto": f"chunk {i}"}
+                }
+                for i in range(200)
+            ])
+
+            # El vector más cercano a sí mismo debe ser el primero
+            result = store.query(data[7].tolist(), top_k=3)
+            assert result.matches[0].id == "doc-7"
+            assert result.matches[0].score > 0.98
+            print(f"   ✅ [{dtype}] Consulta exacta: {result.matches[0].id} ({result.matches[0].score:.3f})")
+
+            # Filtros de metadatos
+            result = store.query(data[7].tolist(), top_k=5, filter={"cliente": {"$eq": "B"}})
+            assert all(match.metadata["cliente"] == "B" for match in result.matches)
+            result = store.query(data[7].tolist(), top_k=5, filter={"chunk_index": {"$lt": 10}})
+            assert all(match.metadata["chunk_index"] < 10 for match in result.matches)
+            print(f"   ✅ [{dtype}] Filtros de metadatos")
+
+            # Actualización y borrado
+            store.update("doc-7", {"metadata_enriquecido": True})
+            store.delete(["doc-8"])
+            result = store.query(data[8].tolist(), top_k=1)
+            assert result.matches[0].id != "doc-8"
+            assert store.describe_index_stats().total_vector_count == 199
+
+            # Persistencia: reabrir desde disco
+            reopened = LocalVectorStore(directory=directory, dtype=dtype)
+            result = reopened.query(data[7].tolist(), top_k=1)
+            assert result.matches[0].id == "doc-7"
+            assert result.matches[0].metadata["metadata_enriquecido"] is True
+            assert reopened.describe_index_stats().total_vector_count == 199
+            print(f"   ✅ [{dtype}] Persistencia, actualización y borrado")
+
+
+def test_local_vector_store_ivf():
+    """Prueba la búsqueda aproximada con índice IVF"""
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(directory=directory, ivf_nlist=4, ivf_nprobe=4)
+        data = _random_vectors(400, seed=1)
+        store.upsert([{"id": str(i), "values": data[i].tolist()} for i in range(400)])
+
+        result = store.query(data[42].tolist(), top_k=1)
+        assert result.matches[0].id == "42"
+        print("   ✅ Búsqueda con IVF")
+
+
+def test_matches_filter():
+    """Prueba la sintaxis de filtros estilo Pinecone"""
+
+    metadata = {"cliente": "Vizum", "palabras_clave": ["kyc", "aml"], "chunk_index": 3}
+    assert matches_filter(metadata, {"cliente": "Vizum"})
+    assert matches_filter(metadata, {"palabras_clave": {"$in": ["kyc"]}})
+    assert matches_filter(metadata, {"$or": [{"cliente": "Otro"}, {"chunk_index": {"$gte": 3}}]})
+    assert not matches_filter(metadata, {"$and": [{"cliente": "Vizum"}, {"chunk_index": {"$gt": 3}}]})
+    print("   ✅ Filtros de metadatos ($eq, $in, $or, $and)")
+
+
+if __name__ == "__main__":
+    test_local_vector_store()
+    test_local_vector_store_ivf()
+    test_matches_filter()
+    print("\n✅ Todas las pruebas del almacén vectorial local completadas!")
@@ -0,0 +1,285 @@
+"""
+Control de admisión de consultas del bot de Slack
+Token bucket por usuario, límite global de pipelines concurrentes y cola con prioridad
+(los comandos slash pasan antes que los mensajes de canal). Las consultas que superan el
+límite esperan en la cola y el llamador puede avisar al usuario de su posición.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import logging
+import threading
+import itertools
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "4"))
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "6"))  # consultas por minuto por usuario
+ADMISSION_USER_BURST = int(os.getenv("ADMISSION_USER_BURST", "3"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "50"))
+
+# Carriles de prioridad (menor valor = mayor prioridad)
+PRIORITY_COMMAND = 0
+PRIORITY_MESSAGE = 1
+LANE_NAMES = {PRIORITY_COMMAND: "comandos", PRIORITY_MESSAGE: "mensajes"}
+
+# Tiempo máximo entre revisiones de la cola mientras se espera la recarga de un bucket
+MAX_POLL_INTERVAL = 1.0
+WAIT_SAMPLES = 500
+
+
+class AdmissionRejected(Exception):
+    """La cola de admisión está llena"""
+
+
+class TokenBucket:
+    """Bucket de consultas de un usuario"""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def available(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= 1.0
+
+    def take(self):
+        self.tokens -= 1.0
+
+    def wait_time(self, now: float) -> float:
+        """Segundos hasta disponer de una consulta"""
+        self._refill(now)
+        if self.tokens >= 1.0 or not self.rate:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+@dataclass(order=True)
+class _Ticket:
+    priority: int
+    sequence: int
+    user_id: str = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class _AdmissionState:
+    """Estado compartido por las variantes síncrona y asíncrona (sin sincronización propia)"""
+
+    def __init__(self, max_concurrency: int, user_rate: float, user_burst: int, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_queue = max_queue
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.queue: List[_Ticket] = []
+        self.active = 0
+        self._sequence = itertools.count()
+
+        # Métricas
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self.waits: Dict[int, deque] = {priority: deque(maxlen=WAIT_SAMPLES) for priority in LANE_NAMES}
+
+    def _bucket(self, user_id: str) -> TokenBucket:
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            if len(self.buckets) > 1000:
+                now = time.monotonic()
+                self.buckets = {user: b for user, b in self.buckets.items() if not b.is_full(now)}
+            bucket = self.buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        return bucket
+
+    def enqueue(self, user_id: str, priority: int) -> _Ticket:
+        if len(self.queue) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(f"Cola de admisión llena ({self.max_queue} consultas)")
+        ticket = _Ticket(priority, next(self._sequence), user_id or "desconocido", time.monotonic())
+        heapq.heappush(self.queue, ticket)
+        return ticket
+
+    def try_admit(self, ticket: _Ticket) -> bool:
+        """Admitir el ticket si hay capacidad y es el primero de la cola con consultas disponibles"""
+        if self.active >= self.max_concurrency:
+            return False
+        now = time.monotonic()
+        for candidate in sorted(self.queue):
+            if self._bucket(candidate.user_id).available(now):
+                if candidate is not ticket:
+                    return False
+                self.queue.remove(ticket)
+                heapq.heapify(self.queue)
+                self._bucket(ticket.user_id).take()
+                self.active += 1
+                self.admitted += 1
+                self.waits[ticket.priority].append(now - ticket.enqueued_at)
+                return True
+        return False
+
+    def mark_queued(self, ticket: _Ticket) -> int:
+        """Registrar una espera y devolver la posición del ticket en la cola (desde 1)"""
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self.queue))
+        return sorted(self.queue).index(ticket) + 1
+
+    def abandon(self, ticket: _Ticket):
+        if ticket in self.queue:
+            self.queue.remove(ticket)
+            heapq.heapify(self.queue)
+
+    def release(self):
+        self.active -= 1
+
+    def poll_interval(self, ticket: _Ticket) -> float:
+        wait = self._bucket(ticket.user_id).wait_time(time.monotonic())
+        return min(MAX_POLL_INTERVAL, wait) if wait else MAX_POLL_INTERVAL
+
+    def stats(self) -> Dict[str, Any]:
+        lanes = {}
+        for priority, name in LANE_NAMES.items():
+            waits = sorted(self.waits[priority])
+            lanes[name] = {
+                "queue_depth": sum(1 for ticket in self.queue if ticket.priority == priority),
+                "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+                "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+                "wait_max": waits[-1] if waits else 0.0
+            }
+        return {
+            "limit": self.max_concurrency,
+            "active": self.active,
+            "queue_depth": len(self.queue),
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "lanes": lanes
+        }
+
+
+class AdmissionController:
+    """Control de admisión para el bot síncrono (listeners en hilos de Bolt)"""
+
+    def __init__(self, max_concurrency: int = ADMISSION_MAX_CONCURRENCY, user_rate: float = ADMISSION_USER_RATE,
+                 user_burst: int = ADMISSION_USER_BURST, max_queue: int = ADMISSION_MAX_QUEUE):
+        self._state = _AdmissionState(max_concurrency, user_rate, user_burst, max_queue)
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def admit(self, user_id: str, priority: int = PRIORITY_MESSAGE,
+              on_queued: Optional[Callable[[int], Any]] = None):
+        """
+        Esperar turno para ejecutar el pipeline.
+        Args:
+            user_id (str): Usuario de Slack (bucket de consultas).
+            priority (int): PRIORITY_COMMAND o PRIORITY_MESSAGE.
+            on_queued: Se llama con la posición en la cola si la consulta no entra de inmediato.
+        Raises:
+            AdmissionRejected: Si la cola está llena.
+        """
+        with self._cond:
+            ticket = self._state.enqueue(user_id, priority)
+            admitted = self._state.try_admit(ticket)
+            position = None if admitted else self._state.mark_queued(ticket)
+
+        if not admitted:
+            logger.info(f"⏳ Consulta de {user_id} en cola ({LANE_NAMES[priority]}, posición {position})")
+            try:
+                if on_queued:
+                    on_queued(position)
+                with self._cond:
+                    while not self._state.try_admit(ticket):
+                        self._cond.wait(timeout=self._state.poll_interval(ticket))
+                    # Puede haber más capacidad libre para los siguientes de la cola
+                    self._cond.notify_all()
+            except BaseException:
+                with self._cond:
+                    self._state.abandon(ticket)
+                    self._cond.notify_all()
+                raise
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._state.release()
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Obtener métricas de la cola y tiempos de espera por carril"""
+        with self._cond:
+            return self._state.stats()
+
+
+class AsyncAdmissionController:
+    """Control de admisión para el modo asyncio del bot"""
+
+    def __init__(self, max_concurrency: int = ADMISSION_MAX_CONCURRENCY, user_rate: float = ADMISSION_USER_RATE,
+                 user_burst: int = ADMISSION_USER_BURST, max_queue: int = ADMISSION_MAX_QUEUE):
+        self._state = _AdmissionState(max_concurrency, user_rate, user_burst, max_queue)
+        self._cond: Optional[asyncio.Condition] = None
+
+    def _condition(self) -> asyncio.Condition:
+        # Se crea dentro del event loop activo
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, priority: int = PRIORITY_MESSAGE,
+                    on_queued: Optional[Callable[[int], Any]] = None):
+        """Versión asíncrona de AdmissionController.admit (on_queued puede ser una corrutina)"""
+        cond = self._condition()
+        async with cond:
+            ticket = self._state.enqueue(user_id, priority)
+            admitted = self._state.try_admit(ticket)
+            position = None if admitted else self._state.mark_queued(ticket)
+
+        if not admitted:
+            logger.info(f"⏳ Consulta de {user_id} en cola ({LANE_NAMES[priority]}, posición {position})")
+            try:
+                if on_queued:
+                    result = on_queued(position)
+                    if asyncio.iscoroutine(result):
+                        await result
+                async with cond:
+                    while not self._state.try_admit(ticket):
+                        try:
+                            await asyncio.wait_for(cond.wait(), timeout=self._state.poll_interval(ticket))
+                        except asyncio.TimeoutError:
+                            pass
+                    cond.notify_all()
+            except BaseException:
+                async with cond:
+                    self._state.abandon(ticket)
+                    cond.notify_all()
+                raise
+
+        try:
+            yield
+        finally:
+            async with cond:
+                self._state.release()
+                cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Obtener métricas de la cola y tiempos de espera por carril"""
+        return self._state.stats()
@@ -0,0 +1,333 @@
+"""
+Caché semántica de respuestas generadas
+Las respuestas se indexan por los IDs de los vectores usados como contexto y por el
+embedding de la consulta; se invalidan cuando la ingesta modifica el índice.
+"""
+
+import os
+import json
+import math
+import time
+import sqlite3
+import logging
+import threading
+from array import array
+from typing import Callable, Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+ANSWER_CACHE_DB = os.getenv("ANSWER_CACHE_DB", "answer_cache.db")
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+ANSWER_CACHE_TTL_HOURS = float(os.getenv("ANSWER_CACHE_TTL_HOURS", "24"))
+
+# Pares de conversations.json que no vale la pena precargar (saludos, respuestas cortas o sin información)
+SEED_MIN_QUERY_WORDS = 3
+SEED_MIN_ANSWER_CHARS = 200
+SEED_SKIP_ANSWER_PHRASES = (
+    "no se encontraron documentos",
+    "no encontré información",
+    "no encontre informacion",
+    "no está disponible en los documentos",
+    "no esta disponible en los documentos",
+    "no tengo información",
+)
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """Abrir la base de datos de la caché creando las tablas si no existen"""
+    conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS index_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS answers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            match_key TEXT NOT NULL,
+            query TEXT NOT NULL,
+            query_embedding BLOB NOT NULL,
+            answer TEXT NOT NULL,
+            index_version INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_match_key ON answers (match_key)")
+    # Una respuesta por consulta y contexto (las bases anteriores podían tener duplicados)
+    conn.execute(
+        "DELETE FROM answers WHERE id NOT IN "
+        "(SELECT MAX(id) FROM answers GROUP BY match_key, query, index_version)"
+    )
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_answers_query ON answers (match_key, query, index_version)"
+    )
+    conn.execute("INSERT OR IGNORE INTO index_version (id, version, updated_at) VALUES (1, 0, ?)", (time.time(),))
+    conn.commit()
+    return conn
+
+
+def get_index_version(db_path: str = ANSWER_CACHE_DB) -> int:
+    """Obtener la versión actual del índice vectorial"""
+    conn = _connect(db_path)
+    try:
+        return conn.execute("SELECT version FROM index_version WHERE id = 1").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def bump_index_version(db_path: str = ANSWER_CACHE_DB) -> int:
+    """
+    Incrementar la versión del índice. Lo llaman los procesos de ingesta después de
+    hacer upsert, lo que invalida todas las respuestas en caché.
+    Returns:
+        int: Nueva versión del índice.
+    """
+    try:
+        conn = _connect(db_path)
+        try:
+            conn.execute("UPDATE index_version SET version = version + 1, updated_at = ? WHERE id = 1", (time.time(),))
+            conn.commit()
+            version = conn.execute("SELECT version FROM index_version WHERE id = 1").fetchone()[0]
+        finally:
+            conn.close()
+        logger.info(f"🔄 Versión del índice actualizada: {version} (caché de respuestas invalidada)")
+        return version
+    except Exception as e:
+        logger.error(f"Error actualizando versión del índice: {e}")
+        return -1
+
+
+def _match_key(match_ids: List[str]) -> str:
+    """Llave estable para el conjunto de vectores usados como contexto"""
+    return "|".join(sorted(str(match_id) for match_id in match_ids))
+
+
+def _norm(vector: List[float]) -> float:
+    return math.sqrt(sum(value * value for value in vector))
+
+
+def _cosine(a: List[float], norm_a: float, b: List[float], norm_b: float) -> float:
+    if not norm_a or not norm_b:
+        return 0.0
+    return sum(x * y for x, y in zip(a, b)) / (norm_a * norm_b)
+
+
+def _worth_seeding(query: str, answer: str) -> bool:
+    """Descartar saludos, respuestas cortas, errores y respuestas sin información"""
+    if len(query.split()) < SEED_MIN_QUERY_WORDS or len(answer) < SEED_MIN_ANSWER_CHARS:
+        return False
+    if answer.startswith("❌"):
+        return False
+    lowered = answer.lower()
+    return not any(phrase in lowered for phrase in SEED_SKIP_ANSWER_PHRASES)
+
+
+class AnswerCache:
+    """Caché de respuestas con búsqueda por similitud coseno e invalidación por versión del índice"""
+
+    def __init__(self, db_path: str = ANSWER_CACHE_DB, similarity_threshold: float = ANSWER_CACHE_SIMILARITY,
+                 ttl_hours: float = ANSWER_CACHE_TTL_HOURS):
+        self.db_path = db_path
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_hours * 3600
+        self._conn = _connect(db_path)
+        self._lock = threading.Lock()
+
+        # Entradas en memoria agrupadas por llave de vectores: (consulta, embedding, norma, respuesta, creado)
+        self._entries: Dict[str, List[Tuple[str, List[float], float, str, float]]] = {}
+        self._loaded_version: Optional[int] = None
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _current_version(self) -> int:
+        return self._conn.execute("SELECT version FROM index_version WHERE id = 1").fetchone()[0]
+
+    def _sync_version(self):
+        """Recargar las entradas si la versión del índice cambió desde la última consulta"""
+        version = self._current_version()
+        if version == self._loaded_version:
+            return
+
+        if self._loaded_version is not None:
+            self.invalidations += 1
+            logger.info(f"♻️ Índice modificado (v{self._loaded_version} → v{version}), caché de respuestas invalidada")
+
+        # Eliminar respuestas de versiones anteriores y cargar las vigentes
+        self._conn.execute("DELETE FROM answers WHERE index_version != ?", (version,))
+        self._conn.commit()
+
+        self._entries = {}
+        rows = self._conn.execute(
+            "SELECT match_key, query, query_embedding, answer, created_at FROM answers WHERE index_version = ?",
+            (version,)
+        ).fetchall()
+        for match_key, query, blob, answer, created_at in rows:
+            embedding = array("f", blob).tolist()
+            self._entries.setdefault(match_key, []).append((query, embedding, _norm(embedding), answer, created_at))
+
+        self._loaded_version = version
+
+    def lookup(self, query_embedding: List[float], match_ids: List[str]) -> Optional[str]:
+        """
+        Buscar una respuesta para una consulta equivalente con el mismo contexto.
+        Args:
+            query_embedding (List[float]): Embedding de la consulta actual.
+            match_ids (List[str]): IDs de los vectores usados como contexto.
+        Returns:
+            Optional[str]: Respuesta en caché o None.
+        """
+        with self._lock:
+            self._sync_version()
+
+            now = time.time()
+            query_norm = _norm(query_embedding)
+            best_answer, best_score = None, 0.0
+
+            for _, embedding, norm, answer, created_at in self._entries.get(_match_key(match_ids), []):
+                if now - created_at > self.ttl_seconds:
+                    continue
+                score = _cosine(query_embedding, query_norm, embedding, norm)
+                if score >= self.similarity_threshold and score > best_score:
+                    best_answer, best_score = answer, score
+
+            if best_answer is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            logger.info(f"⚡ Respuesta servida desde caché (similitud: {best_score:.3f})")
+            return best_answer
+
+    def store(self, query: str, query_embedding: List[float], match_ids: List[str], answer: str,
+              replace: bool = True) -> bool:
+        """
+        Guardar una respuesta asociada a la versión actual del índice.
+        Args:
+            replace (bool): Reemplazar la respuesta previa de la misma consulta y contexto;
+                con False se conserva la existente (precarga).
+        Returns:
+            bool: True si se guardó.
+        """
+        if not answer or not query_embedding or not any(query_embedding):
+            return False
+
+        with self._lock:
+            self._sync_version()
+
+            match_key = _match_key(match_ids)
+            created_at = time.time()
+            values = (match_key, query, array("f", query_embedding).tobytes(), answer, self._loaded_version, created_at)
+            if replace:
+                self._conn.execute(
+                    "INSERT INTO answers (match_key, query, query_embedding, answer, index_version, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(match_key, query, index_version) DO UPDATE SET "
+                    "query_embedding = excluded.query_embedding, answer = excluded.answer, "
+                    "created_at = excluded.created_at",
+                    values
+                )
+            else:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO answers (match_key, query, query_embedding, answer, index_version, "
+                    "created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    values
+                )
+                if not cursor.rowcount:
+                    self._conn.commit()
+                    return False
+            self._conn.commit()
+            entries = [entry for entry in self._entries.get(match_key, []) if entry[0] != query]
+            entries.append((query, list(query_embedding), _norm(query_embedding), answer, created_at))
+            self._entries[match_key] = entries
+            return True
+
+    def seed_from_conversations(self, search_fn: Callable[[str], List[Any]],
+                                embed_fn: Callable[[str], List[float]],
+                                context_ids_fn: Callable[[List[Any]], List[str]],
+                                storage_file: str = "conversations.json", limit: int = 200) -> int:
+        """
+        Precargar la caché con los pares pregunta/respuesta de conversations.json (una sola vez,
+        con seed_answer_cache.py). Se omiten los pares de poco valor y las consultas que ya
+        tienen respuesta en la caché.
+        Args:
+            search_fn: Función que devuelve los matches de una consulta (como search_documents).
+            embed_fn: Función que devuelve el embedding de una consulta.
+            context_ids_fn: IDs de los chunks que entran al prompt para esos matches (la llave de la caché).
+            storage_file (str): Archivo de conversaciones del ConversationManager.
+            limit (int): Número máximo de pares a precargar.
+        Returns:
+            int: Número de respuestas precargadas.
+        """
+        if not os.path.exists(storage_file):
+            return 0
+
+        try:
+            with open(storage_file, 'r', encoding='utf-8') as f:
+                conversations = json.load(f)
+        except Exception as e:
+            logger.error(f"Error leyendo {storage_file} para precargar caché: {e}")
+            return 0
+
+        # Extraer pares consecutivos usuario → asistente (la respuesta más reciente de cada consulta)
+        pairs: Dict[str, str] = {}
+        for conversation in conversations.values():
+            messages = conversation.get("messages", [])
+            for question, answer in zip(messages, messages[1:]):
+                if question.get("role") != "user" or answer.get("role") != "assistant":
+                    continue
+                query = question.get("content", "").strip()
+                content = answer.get("content", "").strip()
+                if _worth_seeding(query, content):
+                    pairs.pop(query, None)
+                    pairs[query] = content
+
+        seeded = 0
+        for query, answer in list(pairs.items())[-limit:]:
+            try:
+                matches = search_fn(query)
+                if not matches:
+                    continue
+                if self.store(query, embed_fn(query), context_ids_fn(matches), answer, replace=False):
+                    seeded += 1
+            except Exception as e:
+                logger.error(f"Error precargando respuesta para '{query[:50]}': {e}")
+
+        logger.info(f"🔥 Caché de respuestas precargada con {seeded} pares de {storage_file}")
+        return seeded
+
+    def stats(self) -> Dict[str, Any]:
+        """Obtener estadísticas de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "invalidations": self.invalidations,
+                "entries": sum(len(entries) for entries in self._entries.values()),
+                "index_version": self._loaded_version
+            }
+
+
+# Instancia global (se crea en el primer uso)
+_answer_cache: Optional[AnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Obtener la instancia compartida de la caché de respuestas"""
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = AnswerCache()
+    return _answer_cache
@@ -0,0 +1,188 @@
+"""
+IDs estables de chunks y manifiesto por documento para re-indexar solo el delta
+El ID de cada chunk se deriva del documento, su posición y el hash de su texto. El manifiesto
+guarda los IDs que tiene cada documento en el índice: al modificarse un archivo solo se
+generan y suben los chunks nuevos o cambiados, y se borran los que ya no existen.
+"""
+
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+CHUNK_MANIFEST_DB = os.getenv("CHUNK_MANIFEST_DB", "chunk_manifest.db")
+
+# Pinecone acepta hasta 1,000 IDs por delete
+DELETE_BATCH = 1000
+
+
+def document_key(file_id: str) -> str:
+    """Prefijo corto y estable de los IDs de un documento"""
+    return hashlib.sha256(file_id.encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_id(file_id: str, position: int, text: str) -> str:
+    """ID de un chunk: documento, posición y hash del contenido (documento#posición#hash)"""
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    return f"{document_key(file_id)}#{position}#{content_hash}"
+
+
+class DocumentDelta:
+    """Comparación entre los chunks actuales de un documento y su manifiesto"""
+
+    def __init__(self, file_id: str, namespace: str, previous: Set[str]):
+        self.file_id = file_id
+        self.namespace = namespace
+        self.previous = previous
+        self.current: Dict[str, int] = {}
+        self.changed_count = 0
+        self.removed: Optional[int] = None
+
+    def changed(self, chunks: Iterable[str]) -> Iterator[Tuple[Tuple[int, str], str]]:
+        """
+        Filtrar los chunks que hay que generar y subir.
+        Yields:
+            Tuple[Tuple[int, str], str]: ((posición, ID), texto) de cada chunk nuevo o cambiado.
+        """
+        for position, text in enumerate(chunks):
+            vector_id = chunk_id(self.file_id, position, text)
+            self.current[vector_id] = position
+            if vector_id not in self.previous:
+                self.changed_count += 1
+                yield (position, vector_id), text
+
+    def skip(self, vector_id: str):
+        """Sacar del manifiesto un chunk que no se pudo subir (se reintenta en la próxima ingesta)"""
+        if self.current.pop(vector_id, None) is not None:
+            self.changed_count -= 1
+
+    @property
+    def unchanged(self) -> int:
+        return len(self.current) - self.changed_count
+
+    @property
+    def deleted(self) -> List[str]:
+        """IDs del manifiesto que ya no existen en el documento"""
+        return sorted(self.previous - set(self.current))
+
+    def describe(self) -> str:
+        removed = self.removed if self.removed is not None else len(self.deleted)
+        return f"{self.changed_count} chunks nuevos o cambiados, {self.unchanged} sin cambios, {removed} eliminados"
+
+
+class ChunkManifest:
+    """Manifiesto persistente documento -> IDs de sus vectores"""
+
+    def __init__(self, db_path: str = CHUNK_MANIFEST_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS document_chunks (
+                file_id TEXT NOT NULL,
+                vector_id TEXT NOT NULL,
+                namespace TEXT NOT NULL DEFAULT '',
+                position INTEGER NOT NULL,
+                PRIMARY KEY (file_id, vector_id)
+            );
+            CREATE TABLE IF NOT EXISTS documents (
+                file_id TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL DEFAULT '',
+                chunks INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def vector_ids(self, file_id: str) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT vector_id FROM document_chunks WHERE file_id = ?", (file_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def delta(self, file_id: str, namespace: str = "") -> DocumentDelta:
+        """Iniciar la comparación de un documento contra su manifiesto"""
+        return DocumentDelta(file_id, namespace, self.vector_ids(file_id))
+
+    def commit(self, delta: DocumentDelta):
+        """Reemplazar el manifiesto del documento (solo después de subir y borrar en el índice)"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM document_chunks WHERE file_id = ?", (delta.file_id,))
+                self._conn.executemany(
+                    "INSERT INTO document_chunks (file_id, vector_id, namespace, position) VALUES (?, ?, ?, ?)",
+                    [(delta.file_id, vector_id, delta.namespace, position) for vector_id, position in delta.current.items()]
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (file_id, namespace, chunks, updated_at) VALUES (?, ?, ?, ?)",
+                    (delta.file_id, delta.namespace, len(delta.current), now)
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def remove(self, file_id: str):
+        """Olvidar un documento (p. ej. si se eliminó de la carpeta)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM document_chunks WHERE file_id = ?", (file_id,))
+            self._conn.execute("DELETE FROM documents WHERE file_id = ?", (file_id,))
+            self._conn.commit()
+
+
+def legacy_vector_ids(index, filter: Dict[str, str], dimension: int, namespace: str = "",
+                      limit: int = 10000) -> List[str]:
+    """
+    IDs de los vectores de un documento subidos antes del manifiesto (IDs aleatorios).
+    Se buscan con un filtro de metadatos y un vector dummy, como en metadata_enricher.
+    """
+    results = index.query(vector=[0] * dimension, top_k=limit, filter=filter, namespace=namespace,
+                          include_metadata=False)
+    return [match.id for match in results.matches]
+
+
+def apply_delta(index, manifest: ChunkManifest, delta: DocumentDelta, legacy_filter: Optional[Dict[str, str]] = None,
+                dimension: Optional[int] = None) -> List[str]:
+    """
+    Borrar del índice los chunks que desaparecieron y guardar el manifiesto nuevo.
+    Si el documento no tenía manifiesto, legacy_filter localiza sus vectores anteriores.
+    Returns:
+        List[str]: IDs borrados.
+    """
+    from utils.index_counters import get_index_counters
+
+    stale = delta.deleted
+    if not delta.previous and legacy_filter and dimension:
+        # Primera ingesta con manifiesto: los vectores previos tienen IDs aleatorios
+        stale = [vector_id for vector_id in legacy_vector_ids(index, legacy_filter, dimension, delta.namespace)
+                 if vector_id not in delta.current]
+    for start in range(0, len(stale), DELETE_BATCH):
+        batch = stale[start:start + DELETE_BATCH]
+        index.delete(ids=batch, namespace=delta.namespace)
+        get_index_counters().record_delete(batch, namespace=delta.namespace)
+    delta.removed = len(stale)
+    manifest.commit(delta)
+    return stale
+
+
+# Instancia global (se crea en el primer uso)
+_chunk_manifest: Optional[ChunkManifest] = None
+_chunk_manifest_lock = threading.Lock()
+
+
+def get_chunk_manifest() -> ChunkManifest:
+    """Obtener el manifiesto compartido"""
+    global _chunk_manifest
+    if _chunk_manifest is None:
+        with _chunk_manifest_lock:
+            if _chunk_manifest is None:
+                _chunk_manifest = ChunkManifest()
+    return _chunk_manifest
@@ -0,0 +1,196 @@
+"""
+Empaquetado del contexto del prompt de respuesta por presupuesto de tokens
+Agrupa los chunks por documento, une chunks adyacentes o solapados, emite los metadatos de
+cada documento una sola vez y llena el presupuesto en orden de relevancia.
+"""
+
+import os
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_MIN_SCORE = float(os.getenv("CONTEXT_MIN_SCORE", "0.3"))
+CONTEXT_ENCODING = "cl100k_base"
+
+# Longitud mínima (en caracteres) para considerar que dos chunks se solapan
+MIN_OVERLAP_CHARS = 30
+CHUNK_SEPARATOR = "\n[...]\n"
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken  # type: ignore
+        return tiktoken.get_encoding(CONTEXT_ENCODING)
+    except Exception as e:
+        logger.warning(f"⚠️ Tokenizador no disponible, se estiman tokens por caracteres: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Contar tokens de un texto (estimación de 4 caracteres por token si no hay tokenizador)"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Recortar un texto a max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def document_key(match: Any) -> str:
+    """Identificador del documento al que pertenece un chunk"""
+    metadata = match.metadata or {}
+    for key in ("file_id", "ruta", "nombre_archivo", "archivo"):
+        if metadata.get(key):
+            return str(metadata[key])
+    return match.id
+
+
+def merge_overlapping(previous: str, following: str) -> Optional[str]:
+    """
+    Unir dos textos si el final del primero coincide con el inicio del segundo.
+    Returns:
+        str: Texto unido, o None si no hay solapamiento.
+    """
+    probe = following[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return None
+    if probe in previous and following in previous:
+        return previous
+    position = previous.rfind(probe)
+    while position >= 0:
+        if following.startswith(previous[position:]):
+            return previous + following[len(previous) - position:]
+        position = previous.rfind(probe, 0, position)
+    return None
+
+
+@dataclass
+class _Document:
+    key: str
+    metadata: Dict[str, Any]
+    score: float
+    chunks: Dict[int, str] = field(default_factory=dict)
+
+
+@dataclass
+class PackedContext:
+    """Contexto listo para el prompt"""
+    text: str
+    tokens: int
+    chunk_ids: List[str]
+    documents: int
+    dropped: int
+
+
+def _render_chunks(chunks: Dict[int, str]) -> str:
+    """Concatenar los chunks de un documento en orden, uniendo adyacentes y solapados"""
+    parts: List[str] = []
+    last_index = None
+    for index in sorted(chunks):
+        text = chunks[index]
+        merged = merge_overlapping(parts[-1], text) if parts else None
+        if merged is not None:
+            parts[-1] = merged
+        elif parts and index == last_index + 1:
+            parts[-1] = f"{parts[-1]}\n{text}"
+        else:
+            parts.append(text)
+        last_index = index
+    return CHUNK_SEPARATOR.join(parts)
+
+
+def _render_document(number: int, document: _Document, format_metadata: Callable[[Dict[str, Any]], str]) -> str:
+    return f"""
+Documento {number} (Relevancia: {document.score:.2f}):
+{format_metadata(document.metadata)}
+
+Contenido relevante:
+{_render_chunks(document.chunks)}
+"""
+
+
+def pack_context(search_results: List[Any], format_metadata: Callable[[Dict[str, Any]], str],
+                 budget: int = CONTEXT_TOKEN_BUDGET, min_score: float = CONTEXT_MIN_SCORE) -> PackedContext:
+    """
+    Construir el contexto del prompt dentro de un presupuesto de tokens.
+    Args:
+        search_results: Matches del índice (con id, score y metadata['texto']).
+        format_metadata: Función que resume los metadatos de un documento.
+        budget (int): Máximo de tokens del contexto.
+        min_score (float): Score mínimo para incluir un chunk (el mejor se incluye siempre).
+    Returns:
+        PackedContext: Texto del contexto y estadísticas del empaquetado.
+    """
+    ranked = sorted(search_results, key=lambda match: match.score, reverse=True)
+    documents: Dict[str, _Document] = {}
+    seen_texts = set()
+    chunk_ids: List[str] = []
+    used = 0
+    dropped = 0
+
+    for position, match in enumerate(ranked):
+        metadata = match.metadata or {}
+        text = (metadata.get("texto") or "").strip()
+        if not text or text in seen_texts:
+            continue
+        if position > 0 and match.score < min_score:
+            dropped += 1
+            continue
+
+        key = document_key(match)
+        document = documents.get(key)
+        cost = count_tokens(text)
+        if document is None:
+            cost += count_tokens(_render_document(len(documents) + 1, _Document(key, metadata, match.score), format_metadata))
+
+        if used + cost > budget:
+            if chunk_ids:
+                dropped += 1
+                continue
+            # El chunk más relevante siempre entra, recortado al presupuesto
+            text = truncate_to_tokens(text, budget - (cost - count_tokens(text)))
+            cost = budget
+
+        if document is None:
+            document = documents[key] = _Document(key, metadata, match.score)
+        chunk_index = metadata.get("chunk_index")
+        if not isinstance(chunk_index, (int, float)):
+            chunk_index = len(document.chunks) + 10_000
+        document.chunks[int(chunk_index)] = text
+        seen_texts.add(text)
+        chunk_ids.append(match.id)
+        used += cost
+
+    context = "\n\n".join(
+        _render_document(number, document, format_metadata)
+        for number, document in enumerate(documents.values(), 1)
+    )
+    packed = PackedContext(
+        text=context,
+        tokens=count_tokens(context),
+        chunk_ids=chunk_ids,
+        documents=len(documents),
+        dropped=dropped
+    )
+    logger.info(
+        f"📦 Contexto: {len(chunk_ids)} chunks de {packed.documents} documentos, "
+        f"{packed.tokens}/{budget} tokens ({dropped} descartados)"
+    )
+    return packed
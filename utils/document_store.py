@@ -0,0 +1,146 @@
+"""
+Almacén local de metadatos a nivel de documento
+El resumen ejecutivo y los metadatos enriquecidos (riesgos, obligaciones, sanciones,
+referencias...) son iguales para todos los chunks de un documento. Se guardan una sola vez
+en SQLite por file_id; los vectores conservan solo las llaves filtrables y el texto del chunk,
+y el bot une los metadatos del documento al responder.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+DOCUMENT_STORE_DB = os.getenv("DOCUMENT_STORE_DB", "document_store.db")
+# 0 = seguir copiando los metadatos del documento en cada vector (p. ej. si el bot corre en otra máquina)
+SLIM_VECTOR_METADATA = os.getenv("SLIM_VECTOR_METADATA", "1") == "1"
+
+# Llaves que se quedan en cada vector: filtros, contadores, agrupación por documento y el texto
+VECTOR_METADATA_KEYS = (
+    "file_id",
+    "cliente",
+    "nombre_archivo",
+    "ruta",
+    "chunk_index",
+    "texto",
+    "tipo_documento",
+    "categoria_regulatoria",
+    "entidad_regulatoria",
+    "nivel_importancia",
+    "metadata_enriquecido",
+    "tipo_actualizacion",
+    "fecha_procesamiento",
+)
+
+# Límite de parámetros por consulta SQLite
+LOOKUP_BATCH = 500
+
+
+def vector_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Reducir los metadatos de un chunk a las llaves que viajan con el vector"""
+    if not SLIM_VECTOR_METADATA:
+        return metadata
+    return {key: metadata[key] for key in VECTOR_METADATA_KEYS if key in metadata}
+
+
+class DocumentStore:
+    """Mapa persistente file_id -> metadatos del documento"""
+
+    def __init__(self, db_path: str = DOCUMENT_STORE_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                file_id TEXT PRIMARY KEY,
+                metadata TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        # Versiones anteriores guardaban aquí la caché de extracciones (ahora utils.extraction_cache)
+        self._conn.execute("DELETE FROM documents WHERE file_id LIKE 'contenido:%'")
+        self._conn.commit()
+
+    def put(self, file_id: str, metadata: Dict[str, Any]):
+        """Guardar (o reemplazar) los metadatos de un documento"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (file_id, metadata, updated_at) VALUES (?, ?, ?)",
+                (file_id, json.dumps(metadata, ensure_ascii=False, default=str), datetime.now().isoformat())
+            )
+            self._conn.commit()
+
+    def get_many(self, file_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Buscar varios documentos (solo devuelve los encontrados)"""
+        unique = list(dict.fromkeys(file_ids))
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for start in range(0, len(unique), LOOKUP_BATCH):
+                part = unique[start:start + LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT file_id, metadata FROM documents WHERE file_id IN ({','.join('?' * len(part))})",
+                    part
+                ).fetchall()
+                for file_id, metadata in rows:
+                    found[file_id] = json.loads(metadata)
+        return found
+
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        return self.get_many([file_id]).get(file_id)
+
+    def remove(self, file_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE file_id = ?", (file_id,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(metadata)), 0) FROM documents"
+            ).fetchone()
+        return {"documents": count, "bytes": size}
+
+
+def attach_document_metadata(matches: List[Any]) -> List[Any]:
+    """
+    Unir a cada match los metadatos de su documento (los del chunk tienen prioridad).
+    Los vectores anteriores al almacén ya traen todo en sus metadatos y no cambian.
+    """
+    file_ids = [match.metadata["file_id"] for match in matches if match.metadata and match.metadata.get("file_id")]
+    if not file_ids:
+        return matches
+    try:
+        documents = get_document_store().get_many(file_ids)
+    except Exception as e:
+        logger.error(f"Error leyendo metadatos de documentos: {e}")
+        return matches
+    for match in matches:
+        document = documents.get((match.metadata or {}).get("file_id"))
+        if document:
+            for key, value in document.items():
+                match.metadata.setdefault(key, value)
+    return matches
+
+
+# Instancia global (se crea en el primer uso)
+_document_store: Optional[DocumentStore] = None
+_document_store_lock = threading.Lock()
+
+
+def get_document_store() -> DocumentStore:
+    """Obtener el almacén de documentos compartido"""
+    global _document_store
+    if _document_store is None:
+        with _document_store_lock:
+            if _document_store is None:
+                _document_store = DocumentStore()
+    return _document_store
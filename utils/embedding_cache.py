@@ -0,0 +1,179 @@
+"""
+Caché de embeddings para consultas
+Nivel LRU en memoria + nivel persistente en SQLite que sobrevive reinicios
+"""
+
+import os
+import re
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any
+from utils.embedding_config import EMBEDDING_MODEL, model_tag
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+EMBEDDING_CACHE_DB = os.getenv("EMBEDDING_CACHE_DB", "embedding_cache.db")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+DEFAULT_EMBEDDING_MODEL = EMBEDDING_MODEL
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normaliza una consulta para que variantes triviales compartan entrada de caché.
+    Args:
+        text (str): Consulta original del usuario.
+    Returns:
+        str: Consulta en minúsculas, sin espacios repetidos ni signos de interrogación/exclamación.
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = re.sub(r"[¿?¡!]", " ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(".;:, ")
+
+
+class EmbeddingCache:
+    """Caché de dos niveles (memoria LRU + SQLite) para embeddings de consultas"""
+
+    def __init__(self, db_path: str = EMBEDDING_CACHE_DB, max_memory_items: int = EMBEDDING_CACHE_SIZE):
+        self.db_path = db_path
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Contadores de aciertos y fallos
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS query_embeddings (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                query TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text: str, model: str = DEFAULT_EMBEDDING_MODEL) -> str:
+        """Generar la llave de caché a partir de la consulta normalizada y el modelo"""
+        # La dimensión configurada forma parte de la llave (vectores de 256 y 1536 no se mezclan)
+        raw = f"{model_tag(model)}\x00{normalize_query(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, embedding: List[float]):
+        """Guardar en el nivel de memoria respetando el límite LRU"""
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str, model: str = DEFAULT_EMBEDDING_MODEL) -> Optional[List[float]]:
+        """Buscar un embedding en memoria y después en disco"""
+        key = self.make_key(text, model)
+
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return embedding
+
+            row = self._conn.execute(
+                "SELECT embedding FROM query_embeddings WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                embedding = array("f", row[0]).tolist()
+                self._remember(key, embedding)
+                self.disk_hits += 1
+                return embedding
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, embedding: List[float], model: str = DEFAULT_EMBEDDING_MODEL):
+        """Guardar un embedding en ambos niveles"""
+        # No guardar vectores nulos (fallback de error de la API)
+        if not embedding or not any(embedding):
+            return
+
+        key = self.make_key(text, model)
+        with self._lock:
+            self._remember(key, list(embedding))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (cache_key, model, query, embedding, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, normalize_query(text), array("f", embedding).tobytes(), datetime.now().isoformat())
+            )
+            self._conn.commit()
+
+    def get_or_compute(self, text: str, compute: Callable[[str], List[float]],
+                       model: str = DEFAULT_EMBEDDING_MODEL) -> List[float]:
+        """Obtener el embedding desde la caché o calcularlo y guardarlo"""
+        embedding = self.get(text, model)
+        if embedding is not None:
+            return embedding
+
+        embedding = compute(text)
+        self.put(text, embedding, model)
+        return embedding
+
+    def clear(self):
+        """Vaciar ambos niveles de la caché"""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM query_embeddings")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Obtener estadísticas de aciertos y fallos"""
+        with self._lock:
+            total = self.memory_hits + self.disk_hits + self.misses
+            disk_items = self._conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / total if total else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": disk_items
+            }
+
+
+# Instancia global (se crea en el primer uso)
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Obtener la instancia compartida de la caché de embeddings"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache()
+                logger.info(f"🗄️ Caché de embeddings inicializada: {_embedding_cache.db_path}")
+    return _embedding_cache
+
+
+def get_cached_embedding(text: str, model: str = DEFAULT_EMBEDDING_MODEL) -> List[float]:
+    """Función helper: embedding de una consulta pasando por la caché"""
+    from extractor.text_chunker import get_embedding
+
+    return get_embedding_cache().get_or_compute(
+        text,
+        lambda query: get_embedding(query, model=model),
+        model=model
+    )
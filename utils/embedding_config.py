@@ -0,0 +1,58 @@
+"""
+Configuración única del modelo y la dimensión de los embeddings
+text-embedding-3-* acepta el parámetro `dimensions` para generar vectores reducidos
+(p. ej. 256/512/768) que ocupan menos espacio en el índice y se consultan más rápido.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+# Dimensión nativa de cada modelo
+NATIVE_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+REDUCED_DIMENSIONS = (256, 512, 768, 1024)
+
+# Configuración
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", str(NATIVE_DIMENSIONS.get(EMBEDDING_MODEL, 1536))))
+
+
+def native_dimensions(model: str = EMBEDDING_MODEL) -> int:
+    return NATIVE_DIMENSIONS.get(model, 1536)
+
+
+def validate_dimensions(dimensions: int, model: str = EMBEDDING_MODEL) -> int:
+    """Verificar que el modelo pueda generar vectores de esa dimensión"""
+    native = native_dimensions(model)
+    if dimensions == native:
+        return dimensions
+    if model == "text-embedding-ada-002":
+        raise ValueError("text-embedding-ada-002 no admite dimensiones reducidas")
+    if not 0 < dimensions < native:
+        raise ValueError(f"Dimensión {dimensions} no válida para {model} (máximo {native})")
+    return dimensions
+
+
+def model_tag(model: str = EMBEDDING_MODEL, dimensions: Optional[int] = None) -> str:
+    """
+    Identificador de modelo + dimensión para llaves de caché.
+    Con la dimensión nativa es solo el nombre del modelo (las llaves existentes siguen siendo válidas).
+    """
+    dimensions = dimensions or EMBEDDING_DIMENSIONS
+    if dimensions == native_dimensions(model):
+        return model
+    return f"{model}@{dimensions}"
+
+
+def dimension_params(model: str = EMBEDDING_MODEL, dimensions: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Argumentos extra para embeddings.create.
+    Se envían en extra_body para no depender de la versión del SDK que expone `dimensions`.
+    """
+    dimensions = dimensions or EMBEDDING_DIMENSIONS
+    if dimensions == native_dimensions(model):
+        return {}
+    return {"extra_body": {"dimensions": validate_dimensions(dimensions, model)}}
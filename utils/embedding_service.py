@@ -0,0 +1,258 @@
+"""
+Servicio de embeddings por lotes para la ingesta
+Agrupa los textos en lotes bajo los límites de entradas y tokens por petición de la API,
+ejecuta varios lotes en paralelo y reintenta 429/5xx con backoff exponencial con jitter
+respetando Retry-After. Si un lote no se puede generar se lanza EmbeddingError: nunca se
+devuelven vectores de ceros.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.context_packer import count_tokens
+from utils.openai_client import get_openai_client
+from utils.metrics import span
+from utils.embedding_store import EmbeddingStore, content_key, get_embedding_store
+from utils.embedding_config import (EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, dimension_params, model_tag,
+                                    validate_dimensions)
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "128"))  # la API acepta hasta 2048 entradas
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "100000"))  # la API acepta hasta 300k
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+EMBEDDING_BACKOFF_BASE = float(os.getenv("EMBEDDING_BACKOFF_BASE", "1"))
+EMBEDDING_BACKOFF_MAX = float(os.getenv("EMBEDDING_BACKOFF_MAX", "60"))
+
+
+class EmbeddingError(Exception):
+    """No se pudo generar el embedding de uno o más textos"""
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Leer retry-after-ms / retry-after de la respuesta de error, si existe"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        # Retry-After con formato de fecha HTTP: usar el backoff normal
+        pass
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """429, 5xx, timeouts y errores de conexión se reintentan; el resto (400, 401...) no"""
+    import openai
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class EmbeddingService:
+    """Cliente de embeddings con lotes por tokens, concurrencia acotada y reintentos propios"""
+
+    def __init__(self, api_key: Optional[str] = None, model: str = EMBEDDING_MODEL,
+                 batch_size: int = EMBEDDING_BATCH_SIZE, batch_tokens: int = EMBEDDING_BATCH_TOKENS,
+                 concurrency: int = EMBEDDING_CONCURRENCY, max_retries: int = EMBEDDING_MAX_RETRIES,
+                 store: Optional[EmbeddingStore] = None, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.api_key = api_key
+        self.store = store
+        self.model = model
+        self.dimensions = validate_dimensions(dimensions, model)
+        self.batch_size = max(1, batch_size)
+        self.batch_tokens = max(1, batch_tokens)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embedding")
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.requests = 0
+        self.inputs = 0
+        self.reused = 0
+        self.tokens = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    def _client(self):
+        # Los reintentos los maneja el servicio (backoff con jitter), no el SDK
+        return get_openai_client(self.api_key).with_options(max_retries=0)
+
+    def _count(self, **amounts: int):
+        with self._lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            # Retry-After es el mínimo; el jitter evita que todos los lotes reintenten a la vez
+            return retry_after + random.uniform(0, EMBEDDING_BACKOFF_BASE)
+        return random.uniform(0, min(EMBEDDING_BACKOFF_MAX, EMBEDDING_BACKOFF_BASE * 2 ** attempt))
+
+    def _embed_batch(self, texts: List[str], model: str, dimensions: int) -> List[List[float]]:
+        """Generar los embeddings de un lote con reintentos"""
+        attempt = 0
+        while True:
+            try:
+                with span("embeddings", "lote"):
+                    response = self._client().embeddings.create(
+                        model=model, input=texts, **dimension_params(model, dimensions)
+                    )
+                usage = getattr(response, "usage", None)
+                self._count(requests=1, inputs=len(texts), tokens=getattr(usage, "total_tokens", 0) or 0)
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self._count(failures=1)
+                    raise EmbeddingError(f"Embeddings de {len(texts)} textos fallaron tras {attempt + 1} intentos: {e}") from e
+                delay = self._backoff(attempt, e)
+                if getattr(e, "status_code", None) == 429:
+                    self._count(rate_limited=1)
+                self._count(retries=1)
+                logger.warning(f"⏳ Reintentando lote de {len(texts)} embeddings en {delay:.1f}s "
+                               f"(intento {attempt + 1}/{self.max_retries}): {e}")
+                time.sleep(delay)
+                attempt += 1
+
+    def _embed_group(self, texts: List[str], model: str, dimensions: int, use_store: bool) -> List[List[float]]:
+        """Resolver un lote: primero el almacén por contenido, después la API para los faltantes"""
+        if not use_store or self.store is None:
+            return self._embed_batch(texts, model, dimensions)
+
+        tag = model_tag(model, dimensions)
+        keys = [content_key(text, tag) for text in texts]
+        found = self.store.get_many(keys)
+        missing = [position for position, key in enumerate(keys) if key not in found]
+        if missing:
+            vectors = self._embed_batch([texts[position] for position in missing], model, dimensions)
+            new = {keys[position]: vector for position, vector in zip(missing, vectors)}
+            self.store.put_many(new, tag)
+            found.update(new)
+        self._count(reused=len(texts) - len(missing))
+        return [found[key] for key in keys]
+
+    def embed_iter(self, texts: Iterable[str], model: Optional[str] = None, use_store: bool = True,
+                   dimensions: Optional[int] = None) -> Iterator[Tuple[str, List[float]]]:
+        """
+        Generar embeddings de un flujo de textos, en orden, conforme se completan los lotes.
+        Args:
+            texts (Iterable[str]): Textos a vectorizar (p. ej. chunk_text_iter(...)).
+            model (str, opcional): Modelo de embeddings (default: EMBEDDING_MODEL).
+            use_store (bool): Reutilizar y guardar vectores en el almacén por contenido.
+            dimensions (int, opcional): Dimensión de los vectores (default: EMBEDDING_DIMENSIONS).
+        Yields:
+            Tuple[str, List[float]]: Texto y su embedding.
+        Raises:
+            EmbeddingError: Si un lote falla tras los reintentos o un texto está vacío.
+        """
+        model = model or self.model
+        dimensions = validate_dimensions(dimensions or self.dimensions, model)
+        pending: Deque[Tuple[List[str], Future]] = deque()
+
+        def drain(batch: List[str], future: Future) -> Iterator[Tuple[str, List[float]]]:
+            yield from zip(batch, future.result())
+
+        def submit(batch: List[str]):
+            pending.append((batch, self._executor.submit(self._embed_group, batch, model, dimensions, use_store)))
+
+        batch: List[str] = []
+        batch_tokens = 0
+        try:
+            for text in texts:
+                if not text or not text.strip():
+                    raise EmbeddingError("No se puede generar el embedding de un texto vacío")
+                tokens = count_tokens(text)
+                if batch and (len(batch) >= self.batch_size or batch_tokens + tokens > self.batch_tokens):
+                    submit(batch)
+                    batch, batch_tokens = [], 0
+                    # Contrapresión: no más de `concurrency` lotes en vuelo
+                    while len(pending) >= self.concurrency or (pending and pending[0][1].done()):
+                        yield from drain(*pending.popleft())
+                batch.append(text)
+                batch_tokens += tokens
+            if batch:
+                submit(batch)
+            while pending:
+                yield from drain(*pending.popleft())
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def embed_tagged(self, items: Iterable[Tuple[Any, str]], **kwargs) -> Iterator[Tuple[Any, str, List[float]]]:
+        """
+        Igual que embed_iter, pero cada texto viaja con una etiqueta (p. ej. su ID de chunk).
+        Yields:
+            Tuple[Any, str, List[float]]: Etiqueta, texto y embedding.
+        """
+        tags: Deque[Any] = deque()
+
+        def texts() -> Iterator[str]:
+            for tag, text in items:
+                tags.append(tag)
+                yield text
+
+        # embed_iter conserva el orden: las etiquetas salen en el mismo orden en que entraron
+        for text, embedding in self.embed_iter(texts(), **kwargs):
+            yield tags.popleft(), text, embedding
+
+    def embed(self, texts: List[str], model: Optional[str] = None, use_store: bool = True,
+              dimensions: Optional[int] = None) -> List[List[float]]:
+        """Generar los embeddings de una lista de textos (mismo orden)"""
+        return [embedding for _, embedding in self.embed_iter(texts, model=model, use_store=use_store,
+                                                              dimensions=dimensions)]
+
+    def stats(self) -> Dict[str, Any]:
+        """Obtener contadores de peticiones, reintentos y fallos"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "inputs": self.inputs,
+                "reused": self.reused,
+                "tokens": self.tokens,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failures": self.failures,
+                "avg_batch_size": self.inputs / self.requests if self.requests else 0.0
+            }
+
+
+# Instancias globales por API key (se crean en el primer uso)
+_services: Dict[Optional[str], EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(api_key: Optional[str] = None) -> EmbeddingService:
+    """Obtener el servicio de embeddings compartido"""
+    service = _services.get(api_key)
+    if service is None:
+        with _services_lock:
+            service = _services.get(api_key)
+            if service is None:
+                service = _services[api_key] = EmbeddingService(api_key=api_key, store=get_embedding_store())
+    return service
+
+
+def describe_reuse(before: Dict[str, Any], after: Dict[str, Any]) -> str:
+    """Resumen de vectores reutilizados del almacén entre dos lecturas de stats()"""
+    reused = after["reused"] - before["reused"]
+    generated = after["inputs"] - before["inputs"]
+    total = reused + generated
+    ratio = reused / total if total else 0.0
+    return f"{reused}/{total} embeddings reutilizados ({ratio:.0%}), {generated} generados con OpenAI"
+
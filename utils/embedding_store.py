@@ -0,0 +1,120 @@
+"""
+Almacén de embeddings direccionado por contenido para la ingesta
+La llave es sha256(modelo + texto del chunk): un chunk que no cambió nunca se vuelve a enviar
+a OpenAI, aunque el documento se reprocese o cambie en otras partes. Los vectores se guardan
+en SQLite como blobs float32 (o float16 para la mitad del espacio).
+"""
+
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+import numpy as np
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+EMBEDDING_STORE_ENABLED = os.getenv("EMBEDDING_STORE_ENABLED", "1") == "1"
+EMBEDDING_STORE_DB = os.getenv("EMBEDDING_STORE_DB", "chunk_embeddings.db")
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float32")  # float32 o float16
+
+# Límite de parámetros por consulta SQLite
+LOOKUP_BATCH = 500
+
+
+def content_key(text: str, model: str) -> str:
+    """Llave de contenido de un chunk para un modelo"""
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Mapa persistente llave de contenido -> embedding"""
+
+    def __init__(self, db_path: str = EMBEDDING_STORE_DB, dtype: str = EMBEDDING_STORE_DTYPE):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"EMBEDDING_STORE_DTYPE no soportado: {dtype}")
+        self.db_path = db_path
+        self.dtype = dtype
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunk_embeddings (
+                content_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dtype TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                embedding BLOB NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Buscar varios embeddings por llave.
+        Returns:
+            Dict[str, List[float]]: Solo las llaves encontradas.
+        """
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), LOOKUP_BATCH):
+                part = unique[start:start + LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT content_key, dtype, embedding FROM chunk_embeddings "
+                    f"WHERE content_key IN ({','.join('?' * len(part))})",
+                    part
+                ).fetchall()
+                for key, dtype, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=dtype).astype(np.float32).tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]], model: str):
+        """Guardar embeddings nuevos (las llaves existentes se conservan)"""
+        if not items:
+            return
+        now = datetime.now().isoformat()
+        rows = [
+            (key, model, self.dtype, len(embedding), np.asarray(embedding, dtype=self.dtype).tobytes(), now)
+            for key, embedding in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunk_embeddings "
+                "(content_key, model, dtype, dimensions, embedding, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Obtener el tamaño del almacén"""
+        with self._lock:
+            items, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(embedding)), 0) FROM chunk_embeddings"
+            ).fetchone()
+        return {"items": items, "bytes": size, "dtype": self.dtype}
+
+
+# Instancia global (se crea en el primer uso)
+_embedding_store: Optional[EmbeddingStore] = None
+_embedding_store_lock = threading.Lock()
+
+
+def get_embedding_store() -> Optional[EmbeddingStore]:
+    """Obtener el almacén compartido (None si EMBEDDING_STORE_ENABLED=0)"""
+    global _embedding_store
+    if not EMBEDDING_STORE_ENABLED:
+        return None
+    if _embedding_store is None:
+        with _embedding_store_lock:
+            if _embedding_store is None:
+                _embedding_store = EmbeddingStore()
+                logger.info(f"🗄️ Almacén de embeddings de chunks: {_embedding_store.db_path} ({_embedding_store.dtype})")
+    return _embedding_store
@@ -0,0 +1,90 @@
+"""
+Caché de metadatos extraídos con OpenAI, direccionada por contenido
+La llave es sha256 del texto completo del documento: volver a subir el mismo contenido
+(aunque cambie el nombre o la ruta) no repite la llamada. Las entradas que no se usan en
+EXTRACTION_CACHE_MAX_AGE_DAYS se eliminan al abrir la caché.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+EXTRACTION_CACHE_DB = os.getenv("EXTRACTION_CACHE_DB", "extraction_cache.db")
+EXTRACTION_CACHE_MAX_AGE_DAYS = int(os.getenv("EXTRACTION_CACHE_MAX_AGE_DAYS", "180"))
+
+
+def content_hash(chunks: List[str]) -> str:
+    """Llave de contenido de un documento a partir de sus chunks"""
+    return hashlib.sha256("\x00".join(chunks).encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """Mapa persistente hash de contenido -> metadatos extraídos"""
+
+    def __init__(self, db_path: str = EXTRACTION_CACHE_DB, max_age_days: int = EXTRACTION_CACHE_MAX_AGE_DAYS):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extraction_cache (
+                content_hash TEXT PRIMARY KEY,
+                metadata TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                used_at TEXT NOT NULL
+            )
+            """
+        )
+        if max_age_days > 0:
+            cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+            removed = self._conn.execute("DELETE FROM extraction_cache WHERE used_at < ?", (cutoff,)).rowcount
+            if removed:
+                logger.info(f"🧹 {removed} extracciones sin uso en {max_age_days} días eliminadas de la caché")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT metadata FROM extraction_cache WHERE content_hash = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE extraction_cache SET used_at = ? WHERE content_hash = ?", (datetime.now().isoformat(), key)
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, metadata: Dict[str, Any]):
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache (content_hash, metadata, created_at, used_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(metadata, ensure_ascii=False, default=str), now, now)
+            )
+            self._conn.commit()
+
+
+# Instancia global (se crea en el primer uso)
+_extraction_cache: Optional[ExtractionCache] = None
+_extraction_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """Obtener la caché de extracciones compartida"""
+    global _extraction_cache
+    if _extraction_cache is None:
+        with _extraction_cache_lock:
+            if _extraction_cache is None:
+                _extraction_cache = ExtractionCache()
+    return _extraction_cache
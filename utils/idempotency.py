@@ -0,0 +1,164 @@
+"""
+Idempotencia de eventos de Slack
+Descarta eventos duplicados y reintentos de entrega (x-slack-retry-num / retry_attempt) antes de
+ejecutar el pipeline, usando un almacén con TTL de event_id y client_msg_id.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from slack_bolt.response import BoltResponse
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+EVENT_DEDUP_TTL_SECONDS = float(os.getenv("EVENT_DEDUP_TTL_SECONDS", "900"))
+
+
+class TTLKeyStore:
+    """Conjunto de llaves que expiran tras ttl segundos"""
+
+    def __init__(self, ttl: float = EVENT_DEDUP_TTL_SECONDS):
+        self.ttl = ttl
+        self._keys: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        while self._keys:
+            key, seen_at = next(iter(self._keys.items()))
+            if now - seen_at < self.ttl:
+                break
+            self._keys.popitem(last=False)
+
+    def add(self, key: str) -> bool:
+        """Registrar la llave; devuelve False si ya existía (duplicado)"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            if key in self._keys:
+                return False
+            self._keys[key] = now
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._prune(time.monotonic())
+            return len(self._keys)
+
+
+def get_retry_num(body: Dict[str, Any], request=None) -> int:
+    """Número de reintento de Slack (cabecera HTTP o campo retry_attempt de Socket Mode)"""
+    if request is not None:
+        values = request.headers.get("x-slack-retry-num") or []
+        if values and str(values[0]).isdigit():
+            return int(values[0])
+    return int(body.get("retry_attempt") or 0)
+
+
+def message_key(event: Dict[str, Any]) -> Optional[str]:
+    """Llave estable de un mensaje de usuario (client_msg_id, o canal + ts)"""
+    if event.get("client_msg_id"):
+        return f"msg:{event['client_msg_id']}"
+    if event.get("channel") and event.get("ts"):
+        return f"msg:{event['channel']}:{event['ts']}"
+    return None
+
+
+class EventDeduplicator:
+    """Filtro de eventos ya procesados con contadores de descartes"""
+
+    def __init__(self, ttl: float = EVENT_DEDUP_TTL_SECONDS):
+        self._events = TTLKeyStore(ttl)
+        self._messages = TTLKeyStore(ttl)
+        self._lock = threading.Lock()
+        self.received = 0
+        self.duplicates_dropped = 0
+        self.retries_received = 0
+        self.retries_dropped = 0
+        self.messages_dropped = 0
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def accept_event(self, body: Dict[str, Any], request=None) -> bool:
+        """
+        Decidir si un evento debe despacharse a los listeners.
+        Args:
+            body (Dict): Cuerpo de la petición de Slack.
+            request: BoltRequest (para leer cabeceras de reintento en modo HTTP).
+        Returns:
+            bool: False si el evento ya se recibió (duplicado o reintento).
+        """
+        if body.get("type") != "event_callback":
+            return True
+
+        self._count("received")
+        retry_num = get_retry_num(body, request)
+        if retry_num:
+            self._count("retries_received")
+
+        event_id = body.get("event_id")
+        if not event_id or self._events.add(f"event:{event_id}"):
+            return True
+
+        if retry_num:
+            self._count("retries_dropped")
+            logger.info(f"🔁 Reintento #{retry_num} de {event_id} descartado (ya recibido)")
+        else:
+            self._count("duplicates_dropped")
+            logger.info(f"🔁 Evento duplicado descartado: {event_id}")
+        return False
+
+    def claim_message(self, message: Dict[str, Any]) -> bool:
+        """Reservar un mensaje de usuario para el pipeline; False si otro listener ya lo tomó"""
+        key = message_key(message)
+        if key is None or self._messages.add(key):
+            return True
+        self._count("messages_dropped")
+        logger.info(f"🔁 Mensaje ya procesado, se omite: {key}")
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Obtener contadores de eventos recibidos y descartados"""
+        with self._lock:
+            return {
+                "received": self.received,
+                "duplicates_dropped": self.duplicates_dropped,
+                "retries_received": self.retries_received,
+                "retries_dropped": self.retries_dropped,
+                "messages_dropped": self.messages_dropped,
+                "tracked_events": len(self._events)
+            }
+
+
+# Instancia global (se crea en el primer uso)
+_event_deduplicator: Optional[EventDeduplicator] = None
+_event_deduplicator_lock = threading.Lock()
+
+
+def get_event_deduplicator() -> EventDeduplicator:
+    """Obtener el filtro de eventos compartido"""
+    global _event_deduplicator
+    if _event_deduplicator is None:
+        with _event_deduplicator_lock:
+            if _event_deduplicator is None:
+                _event_deduplicator = EventDeduplicator()
+    return _event_deduplicator
+
+
+def idempotency_middleware(body, request, next):
+    """Middleware global de Bolt: responde 200 a duplicados sin ejecutar listeners"""
+    if not get_event_deduplicator().accept_event(body, request):
+        return BoltResponse(status=200, body="")
+    return next()
+
+
+async def async_idempotency_middleware(body, request, next):
+    """Versión para AsyncApp"""
+    if not get_event_deduplicator().accept_event(body, request):
+        return BoltResponse(status=200, body="")
+    return await next()
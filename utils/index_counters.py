@@ -0,0 +1,256 @@
+"""
+Contadores locales del índice vectorial
+Los procesos de ingesta y enriquecimiento los actualizan en cada upsert/update para que
+/estado y el reporte semanal respondan sin consultar Pinecone. Los vectores que ya estaban
+en el índice antes de los contadores se registran una sola vez con backfill().
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+INDEX_COUNTERS_DB = os.getenv("INDEX_COUNTERS_DB", "index_counters.db")
+
+# IDs por página al registrar los vectores existentes
+BACKFILL_PAGE_SIZE = 100
+
+# Dimensiones agregadas
+DIMENSIONS = ("total", "cliente", "enriquecido", "tipo_documento")
+
+
+class IndexCounters:
+    """Contadores por cliente, estado de enriquecimiento y tipo de documento"""
+
+    def __init__(self, db_path: str = INDEX_COUNTERS_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS vectors (
+                id TEXT NOT NULL,
+                namespace TEXT NOT NULL DEFAULT '',
+                cliente TEXT,
+                tipo_documento TEXT,
+                enriquecido INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (id, namespace)
+            );
+            CREATE TABLE IF NOT EXISTS counters (
+                dimension TEXT NOT NULL,
+                value TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dimension, value)
+            );
+            CREATE TABLE IF NOT EXISTS counters_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _buckets(cliente: Optional[str], tipo_documento: Optional[str], enriquecido: int) -> List[tuple]:
+        return [
+            ("total", "total"),
+            ("cliente", cliente or "desconocido"),
+            ("enriquecido", "si" if enriquecido else "no"),
+            ("tipo_documento", tipo_documento or "Sin tipo")
+        ]
+
+    def _increment(self, buckets: List[tuple], delta: int):
+        for dimension, value in buckets:
+            self._conn.execute(
+                "INSERT INTO counters (dimension, value, count) VALUES (?, ?, ?) "
+                "ON CONFLICT(dimension, value) DO UPDATE SET count = count + excluded.count",
+                (dimension, value, delta)
+            )
+
+    def _remove_existing(self, vector_id: str, namespace: str) -> Optional[Dict[str, Any]]:
+        """Descontar un vector ya registrado y devolver sus datos previos"""
+        row = self._conn.execute(
+            "SELECT cliente, tipo_documento, enriquecido FROM vectors WHERE id = ? AND namespace = ?",
+            (vector_id, namespace)
+        ).fetchone()
+        if row is None:
+            return None
+        self._increment(self._buckets(*row), -1)
+        self._conn.execute("DELETE FROM vectors WHERE id = ? AND namespace = ?", (vector_id, namespace))
+        return {"cliente": row[0], "tipo_documento": row[1], "enriquecido": row[2]}
+
+    def _insert(self, vector_id: str, namespace: str, cliente: Optional[str], tipo_documento: Optional[str],
+                enriquecido: int, now: str):
+        self._conn.execute(
+            "INSERT INTO vectors (id, namespace, cliente, tipo_documento, enriquecido, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (vector_id, namespace, cliente, tipo_documento, enriquecido, now)
+        )
+        self._increment(self._buckets(cliente, tipo_documento, enriquecido), 1)
+
+    def _touch(self, now: str):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO counters_meta (key, value) VALUES ('last_update', ?)", (now,)
+        )
+
+    def record_upsert(self, vectors: Iterable[Dict[str, Any]], namespace: str = ""):
+        """
+        Registrar vectores subidos al índice (idempotente por ID).
+        Args:
+            vectors: Vectores con las llaves 'id' y 'metadata', como se envían a index.upsert.
+            namespace (str): Namespace de Pinecone.
+        """
+        now = datetime.now().isoformat()
+        with self._lock:
+            try:
+                for vector in vectors:
+                    metadata = vector.get("metadata") or {}
+                    self._remove_existing(vector["id"], namespace)
+                    self._insert(
+                        vector["id"],
+                        namespace,
+                        metadata.get("cliente"),
+                        metadata.get("tipo_documento"),
+                        1 if metadata.get("metadata_enriquecido") else 0,
+                        now
+                    )
+                self._touch(now)
+                self._conn.commit()
+            except Exception as e:
+                self._conn.rollback()
+                logger.error(f"Error actualizando contadores del índice: {e}")
+
+    def record_metadata_update(self, vector_id: str, metadata: Dict[str, Any], namespace: str = ""):
+        """Registrar una actualización de metadatos (p. ej. enriquecimiento de un vector existente)"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            try:
+                previous = self._remove_existing(vector_id, namespace) or {}
+                self._insert(
+                    vector_id,
+                    namespace,
+                    metadata.get("cliente", previous.get("cliente")),
+                    metadata.get("tipo_documento", previous.get("tipo_documento")),
+                    1 if metadata.get("metadata_enriquecido", previous.get("enriquecido")) else 0,
+                    now
+                )
+                self._touch(now)
+                self._conn.commit()
+            except Exception as e:
+                self._conn.rollback()
+                logger.error(f"Error actualizando contadores del índice: {e}")
+
+    def record_delete(self, vector_ids: Iterable[str], namespace: str = ""):
+        """Registrar vectores eliminados del índice"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            try:
+                for vector_id in vector_ids:
+                    self._remove_existing(vector_id, namespace)
+                self._touch(now)
+                self._conn.commit()
+            except Exception as e:
+                self._conn.rollback()
+                logger.error(f"Error actualizando contadores del índice: {e}")
+
+    def needs_backfill(self) -> bool:
+        """
+        El backfill nunca terminó. No depende de que la tabla esté vacía: la ingesta pudo registrar
+        vectores nuevos (o un backfill interrumpido algunas páginas) antes del primer backfill completo.
+        """
+        with self._lock:
+            done = self._conn.execute("SELECT value FROM counters_meta WHERE key = 'backfill'").fetchone()
+        return done is None
+
+    def backfill(self, store, page_size: int = BACKFILL_PAGE_SIZE) -> int:
+        """
+        Registrar una sola vez (hasta completarlo) los vectores que ya estaban en el índice.
+        Recorre los IDs de cada namespace por páginas (list_ids + fetch); record_upsert es
+        idempotente, así que no importa si la ingesta sube vectores al mismo tiempo.
+        Args:
+            store: Almacén vectorial (utils.vector_store).
+            page_size (int): IDs por página.
+        Returns:
+            int: Vectores registrados.
+        """
+        if not self.needs_backfill():
+            return 0
+        total = 0
+        try:
+            stats = store.describe_index_stats()
+            logger.info(f"📊 Inicializando contadores del índice con {stats.total_vector_count} vectores existentes")
+            for namespace in sorted(stats.namespaces):
+                token = None
+                while True:
+                    page = store.list_ids(namespace=namespace, limit=page_size, pagination_token=token)
+                    if page.ids:
+                        vectors = store.fetch(page.ids, namespace=namespace)
+                        self.record_upsert(vectors.values(), namespace=namespace)
+                        total += len(vectors)
+                    token = page.pagination_token
+                    if not token:
+                        break
+        except Exception as e:
+            # Sin marcar como hecho: se reintenta en el próximo arranque
+            logger.error(f"❌ Error inicializando contadores del índice: {e}")
+            return total
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO counters_meta (key, value) VALUES ('backfill', ?)",
+                (datetime.now().isoformat(),)
+            )
+            self._conn.commit()
+        logger.info(f"✅ Contadores del índice inicializados: {total} vectores")
+        return total
+
+    def summary(self) -> Dict[str, Any]:
+        """Obtener totales agregados sin tocar el índice"""
+        with self._lock:
+            rows = self._conn.execute("SELECT dimension, value, count FROM counters WHERE count > 0").fetchall()
+            last_update = self._conn.execute(
+                "SELECT value FROM counters_meta WHERE key = 'last_update'"
+            ).fetchone()
+
+        grouped: Dict[str, Dict[str, int]] = {dimension: {} for dimension in DIMENSIONS}
+        for dimension, value, count in rows:
+            grouped.setdefault(dimension, {})[value] = count
+
+        return {
+            "total": grouped["total"].get("total", 0),
+            "enriquecidos": grouped["enriquecido"].get("si", 0),
+            "no_enriquecidos": grouped["enriquecido"].get("no", 0),
+            "por_cliente": dict(sorted(grouped["cliente"].items(), key=lambda item: -item[1])),
+            "por_tipo_documento": dict(sorted(grouped["tipo_documento"].items(), key=lambda item: -item[1])),
+            "ultima_actualizacion": last_update[0] if last_update else None
+        }
+
+
+# Instancia global (se crea en el primer uso)
+_index_counters: Optional[IndexCounters] = None
+_index_counters_lock = threading.Lock()
+
+
+def get_index_counters() -> IndexCounters:
+    """Obtener la instancia compartida de los contadores del índice"""
+    global _index_counters
+    if _index_counters is None:
+        with _index_counters_lock:
+            if _index_counters is None:
+                _index_counters = IndexCounters()
+    return _index_counters
+
+
+def start_backfill(store) -> Optional[threading.Thread]:
+    """Registrar los vectores existentes en un hilo de fondo si los contadores nunca se inicializaron"""
+    counters = get_index_counters()
+    if not counters.needs_backfill():
+        return None
+    thread = threading.Thread(target=counters.backfill, args=(store,), name="index-counters-backfill", daemon=True)
+    thread.start()
+    return thread
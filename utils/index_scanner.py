@@ -0,0 +1,151 @@
+"""
+Recorrido completo y reanudable del índice vectorial
+Lista los IDs de cada namespace por páginas (pagination token), lee cada página con fetch y
+aplica una función a cada vector desde un pool de hilos. Tras cada página se guarda un
+checkpoint en disco: si el proceso se interrumpe, la siguiente ejecución continúa desde la
+última página completada en lugar de empezar de cero.
+"""
+
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+INDEX_SCAN_PAGE_SIZE = int(os.getenv("INDEX_SCAN_PAGE_SIZE", "100"))  # list_paginated devuelve hasta 100
+INDEX_SCAN_WORKERS = int(os.getenv("INDEX_SCAN_WORKERS", "4"))
+INDEX_SCAN_PROGRESS_SECONDS = float(os.getenv("INDEX_SCAN_PROGRESS_SECONDS", "30"))
+
+# Función aplicada a cada vector: (vector {"id", "values", "metadata"}, namespace) -> True si lo actualizó
+VectorProcessor = Callable[[Dict[str, Any], str], bool]
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {seconds:02d}s"
+
+
+class IndexScanner:
+    """Recorre todos los vectores del índice con checkpoint, workers y reporte de progreso/ETA"""
+
+    def __init__(self, store, name: str, process: VectorProcessor, namespaces: Optional[List[str]] = None,
+                 page_size: int = INDEX_SCAN_PAGE_SIZE, workers: int = INDEX_SCAN_WORKERS,
+                 checkpoint_path: Optional[str] = None):
+        self.store = store
+        self.name = name
+        self.process = process
+        self.namespaces = namespaces
+        self.page_size = max(1, page_size)
+        self.workers = max(1, workers)
+        self.checkpoint_path = checkpoint_path or f"index_scan_{name}.json"
+
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error leyendo checkpoint {self.checkpoint_path}: {e}")
+            return None
+
+    def _save_checkpoint(self, state: Dict[str, Any]):
+        # Escritura atómica: un corte a mitad de escritura no corrompe el checkpoint
+        state["updated_at"] = datetime.now().isoformat()
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _run_one(self, vector: Dict[str, Any], namespace: str) -> Optional[bool]:
+        try:
+            return bool(self.process(vector, namespace))
+        except Exception as e:
+            logger.error(f"❌ Error procesando vector {vector['id']}: {e}")
+            return None
+
+    def run(self, resume: bool = True) -> Dict[str, Any]:
+        """
+        Recorrer el índice completo.
+        Args:
+            resume (bool): Continuar desde el checkpoint si existe.
+        Returns:
+            Dict[str, Any]: Vectores revisados, actualizados, fallidos y duración.
+        """
+        stats = self.store.describe_index_stats()
+        counts = {name: namespace.vector_count for name, namespace in stats.namespaces.items()}
+        namespaces = self.namespaces if self.namespaces is not None else sorted(counts)
+        total = sum(counts.get(namespace, 0) for namespace in namespaces)
+
+        state = self._load_checkpoint() if resume else None
+        if state and state.get("name") == self.name:
+            logger.info(f"↩️ Reanudando recorrido '{self.name}' desde checkpoint: {state['processed']} vectores "
+                        f"revisados, namespace '{state.get('namespace') or '(default)'}'")
+        else:
+            state = {"name": self.name, "completed_namespaces": [], "namespace": None, "pagination_token": None,
+                     "processed": 0, "updated": 0, "failed": 0, "started_at": datetime.now().isoformat()}
+
+        logger.info(f"🔎 Recorrido '{self.name}': {total} vectores en {len(namespaces)} namespaces "
+                    f"({self.workers} workers, páginas de {self.page_size})")
+
+        start = time.perf_counter()
+        processed_at_start = state["processed"]
+        last_report = start
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="index-scan") as executor:
+            for namespace in namespaces:
+                if namespace in state["completed_namespaces"]:
+                    continue
+                token = state["pagination_token"] if state["namespace"] == namespace else None
+                state["namespace"] = namespace
+
+                while True:
+                    page = self.store.list_ids(namespace=namespace, limit=self.page_size, pagination_token=token)
+                    if page.ids:
+                        vectors = self.store.fetch(page.ids, namespace=namespace)
+                        results = list(executor.map(lambda vector: self._run_one(vector, namespace), vectors.values()))
+                        state["processed"] += len(page.ids)
+                        state["updated"] += sum(1 for result in results if result)
+                        state["failed"] += sum(1 for result in results if result is None)
+
+                    # Checkpoint tras cada página completa
+                    token = page.pagination_token
+                    state["pagination_token"] = token
+                    if not token:
+                        state["completed_namespaces"].append(namespace)
+                    self._save_checkpoint(state)
+
+                    now = time.perf_counter()
+                    if now - last_report >= INDEX_SCAN_PROGRESS_SECONDS:
+                        self._report(state, total, processed_at_start, now - start)
+                        last_report = now
+                    if not token:
+                        break
+
+        elapsed = time.perf_counter() - start
+        self._report(state, total, processed_at_start, elapsed)
+        # Recorrido completo: el siguiente empieza de cero (con el índice vacío no se guardó checkpoint)
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return {
+            "processed": state["processed"],
+            "updated": state["updated"],
+            "failed": state["failed"],
+            "seconds": elapsed
+        }
+
+    def _report(self, state: Dict[str, Any], total: int, processed_at_start: int, elapsed: float):
+        done = state["processed"]
+        rate = (done - processed_at_start) / elapsed if elapsed > 0 else 0.0
+        remaining = max(total - done, 0)
+        eta = format_duration(remaining / rate) if rate > 0 and remaining else "-"
+        percent = done / total if total else 1.0
+        logger.info(f"📈 {self.name}: {done}/{total} ({percent:.0%}), {state['updated']} actualizados, "
+                    f"{state['failed']} fallidos, {rate:.1f} vectores/s, ETA {eta}")
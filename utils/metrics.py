@@ -0,0 +1,226 @@
+"""
+Métricas de latencia por etapa en formato Prometheus
+Spans de tiempo (embedding, búsqueda, LLM, publicación en Slack, etapas de ingesta) que
+alimentan histogramas y contadores, servidos en un endpoint HTTP local /metrics.
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuración: METRICS_PORT (0 = endpoint desactivado) y METRICS_HOST se leen al iniciar el endpoint
+DEFAULT_METRICS_HOST = "127.0.0.1"
+
+# Límites de los buckets de latencia (segundos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Contador monótono con etiquetas"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas (buckets fijos)"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            # [conteo por bucket..., suma, total]
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[position] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{le} {count:.0f}")
+                le = _format_labels(self.labelnames, labels, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {series[-1]:.0f}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]:.0f}")
+        return lines
+
+
+class GaugeCallback:
+    """Gauges calculados al momento de la lectura a partir de una función de estadísticas"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...],
+                 callback: Callable[[], Dict[LabelValues, float]]):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.error(f"Error calculando métrica {self.name}: {e}")
+            return lines
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {float(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro de métricas del proceso"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "kawiil_stage_duration_seconds",
+    "Duración de cada etapa del pipeline en segundos",
+    ("component", "stage")
+))
+STAGE_TOTAL = registry.register(Counter(
+    "kawiil_stage_total",
+    "Ejecuciones de cada etapa del pipeline por resultado",
+    ("component", "stage", "status")
+))
+
+
+@contextmanager
+def span(component: str, stage: str):
+    """
+    Medir la duración de una etapa.
+    Args:
+        component (str): 'slack' o 'ingesta'.
+        stage (str): Nombre de la etapa (p. ej. 'embedding', 'busqueda', 'llm').
+    """
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, component, stage)
+        STAGE_TOTAL.inc(component, stage, status)
+
+
+def register_stats_gauge(name: str, help_text: str, stats_fn: Callable[[], Dict[str, Any]],
+                         keys: Optional[List[str]] = None):
+    """
+    Exponer como gauges los valores numéricos de una función stats() existente.
+    Args:
+        name (str): Nombre de la métrica (p. ej. 'kawiil_embedding_cache').
+        help_text (str): Descripción.
+        stats_fn: Función que devuelve un diccionario de estadísticas.
+        keys (List[str], opcional): Llaves a exponer; por defecto todas las numéricas.
+    """
+    def collect() -> Dict[LabelValues, float]:
+        stats = stats_fn()
+        return {
+            (key,): value for key, value in stats.items()
+            if (keys is None or key in keys) and isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+
+    registry.register(GaugeCallback(name, help_text, ("stat",), collect))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Evitar una línea de log por cada scrape
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None) -> Optional[ThreadingHTTPServer]:
+    """Iniciar el endpoint /metrics en un hilo de fondo (no hace nada si port es 0)"""
+    global _server
+    if port is None:
+        port = int(os.getenv("METRICS_PORT", "0"))
+    host = host or os.getenv("METRICS_HOST", DEFAULT_METRICS_HOST)
+    if not port or _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.error(f"❌ No se pudo iniciar el endpoint de métricas en {host}:{port}: {e}")
+        return None
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"📈 Métricas disponibles en http://{host}:{port}/metrics")
+    return _server
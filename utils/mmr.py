@@ -0,0 +1,61 @@
+"""
+Diversificación de resultados con Maximal Marginal Relevance (MMR)
+Reordena los candidatos de la búsqueda usando los vectores devueltos por el índice para que el
+contexto cubra más fuentes distintas en lugar de chunks consecutivos del mismo documento.
+"""
+
+import os
+import logging
+from typing import Any, List
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+SEARCH_DIVERSIFY = os.getenv("SEARCH_DIVERSIFY", "0") == "1"
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", "20"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))  # 1.0 = solo relevancia, 0.0 = solo diversidad
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def mmr_select(query_vector: List[float], candidates: List[Any], top_k: int = 5,
+               lambda_mult: float = MMR_LAMBDA) -> List[Any]:
+    """
+    Seleccionar top_k candidatos maximizando relevancia y diversidad.
+    Args:
+        query_vector (List[float]): Embedding de la consulta.
+        candidates: Matches del índice consultados con include_values=True.
+        top_k (int): Número de resultados a devolver.
+        lambda_mult (float): Peso de la relevancia frente a la redundancia.
+    Returns:
+        List: Candidatos seleccionados en orden de selección.
+    """
+    candidates = [match for match in candidates if len(getattr(match, "values", None) or [])]
+    if len(candidates) <= 1:
+        return candidates[:top_k]
+
+    vectors = _normalize(np.asarray([match.values for match in candidates], dtype=np.float32))
+    query = _normalize(np.asarray(query_vector, dtype=np.float32))
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+
+    selected = [int(np.argmax(relevance))]
+    # Máxima similitud de cada candidato con los ya seleccionados
+    max_similarity = similarity[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < min(top_k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+
+    return [candidates[position] for position in selected]
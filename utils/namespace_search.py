@@ -0,0 +1,199 @@
+"""
+Búsqueda en paralelo sobre los namespaces del índice
+upload_chunks_to_pinecone escribe en namespaces f"{cliente}_{tipo}"; este módulo los descubre a
+partir de describe_index_stats, los consulta concurrentemente con un tiempo límite y fusiona los
+resultados por score en un único top-k. Los vectores subidos antes de los namespaces siguen en
+el namespace por defecto: al buscar por cliente se consultan con un filtro de metadatos.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+NAMESPACE_FANOUT = os.getenv("NAMESPACE_FANOUT", "0") == "1"
+NAMESPACE_SEARCH_TIMEOUT = float(os.getenv("NAMESPACE_SEARCH_TIMEOUT", "3"))
+NAMESPACE_FANOUT_WORKERS = int(os.getenv("NAMESPACE_FANOUT_WORKERS", "8"))
+NAMESPACE_CACHE_TTL = float(os.getenv("NAMESPACE_CACHE_TTL", "300"))
+
+# Nombre con el que algunas versiones de Pinecone reportan el namespace por defecto
+DEFAULT_NAMESPACE_ALIASES = ("", "__default__")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Pool compartido para las consultas por namespace"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=NAMESPACE_FANOUT_WORKERS, thread_name_prefix="namespace-search"
+                )
+    return _executor
+
+
+def namespace_query_kwargs(namespace: str, cliente: Optional[str], query_kwargs: dict) -> dict:
+    """Argumentos de la consulta de un namespace: en el namespace por defecto se filtra por cliente"""
+    if not cliente or namespace != "":
+        return query_kwargs
+    return {**query_kwargs, "filter": {**(query_kwargs.get("filter") or {}), "cliente": cliente}}
+
+
+def merge_matches(results: List[List[Any]], top_k: int) -> List[Any]:
+    """
+    Fusionar los resultados de varios namespaces en un único top-k ordenado por score.
+    Args:
+        results: Lista de listas de matches (uno por namespace).
+        top_k (int): Número de resultados a devolver.
+    Returns:
+        List: Matches con mayor score, sin IDs repetidos.
+    """
+    merged = heapq.nlargest(top_k * 2, (match for matches in results for match in matches),
+                            key=lambda match: match.score)
+    unique, seen = [], set()
+    for match in merged:
+        if match.id in seen:
+            continue
+        seen.add(match.id)
+        unique.append(match)
+        if len(unique) == top_k:
+            break
+    return unique
+
+
+class NamespaceCatalog:
+    """Lista de namespaces del índice con refresco periódico"""
+
+    def __init__(self, ttl: float = NAMESPACE_CACHE_TTL):
+        self.ttl = ttl
+        self.namespaces: List[str] = []
+        self._loaded_at = 0.0
+
+    def needs_refresh(self) -> bool:
+        return not self._loaded_at or time.monotonic() - self._loaded_at > self.ttl
+
+    def update(self, stats: Any):
+        """Actualizar a partir del resultado de describe_index_stats()"""
+        namespaces = []
+        for name, summary in (stats.namespaces or {}).items():
+            if getattr(summary, "vector_count", 1):
+                namespaces.append("" if name in DEFAULT_NAMESPACE_ALIASES else name)
+        self.namespaces = sorted(set(namespaces)) or [""]
+        self._loaded_at = time.monotonic()
+        logger.info(f"🗂️ Namespaces del índice: {len(self.namespaces)}")
+
+    def select(self, cliente: Optional[str] = None) -> List[str]:
+        """
+        Namespaces a consultar.
+        Args:
+            cliente (str, opcional): Restringir a los namespaces f"{cliente}_*" más el namespace por
+                defecto (vectores anteriores a los namespaces, filtrados por cliente con
+                namespace_query_kwargs).
+        Returns:
+            List[str]: Namespaces seleccionados.
+        """
+        if not cliente:
+            return list(self.namespaces)
+        prefix = f"{cliente}_"
+        return [name for name in self.namespaces if name == "" or name.startswith(prefix)]
+
+
+class NamespaceSearcher:
+    """Consulta concurrente de namespaces sobre un VectorStore síncrono"""
+
+    def __init__(self, store, timeout: float = NAMESPACE_SEARCH_TIMEOUT):
+        self.store = store
+        self.timeout = timeout
+        self.catalog = NamespaceCatalog()
+        self._lock = threading.Lock()
+
+    def namespaces(self, cliente: Optional[str] = None) -> List[str]:
+        if self.catalog.needs_refresh():
+            with self._lock:
+                if self.catalog.needs_refresh():
+                    self.catalog.update(self.store.describe_index_stats())
+        return self.catalog.select(cliente)
+
+    def search(self, vector: List[float], top_k: int = 5, cliente: Optional[str] = None,
+               **query_kwargs) -> List[Any]:
+        """
+        Consultar todos los namespaces (o los de un cliente) y fusionar por score.
+        Los namespaces que no responden antes del tiempo límite se omiten.
+        """
+        namespaces = self.namespaces(cliente)
+        if not namespaces:
+            logger.warning(f"⚠️ Sin namespaces para el cliente: {cliente}")
+            return []
+
+        executor = _get_executor()
+        futures = {
+            executor.submit(self.store.query, vector=vector, top_k=top_k, namespace=namespace,
+                            **namespace_query_kwargs(namespace, cliente, query_kwargs)): namespace
+            for namespace in namespaces
+        }
+        done, pending = wait(futures, timeout=self.timeout)
+
+        results = []
+        for future in done:
+            try:
+                results.append(future.result().matches)
+            except Exception as e:
+                logger.error(f"Error consultando namespace '{futures[future]}': {e}")
+        if pending:
+            for future in pending:
+                future.cancel()
+            logger.warning(
+                f"⏱️ {len(pending)} namespaces sin respuesta en {self.timeout}s: "
+                f"{', '.join(futures[future] or '(default)' for future in pending)}"
+            )
+
+        return merge_matches(results, top_k)
+
+
+async def async_fanout_query(query_fn: Callable[..., Awaitable[Any]], namespaces: List[str],
+                             timeout: float = NAMESPACE_SEARCH_TIMEOUT, top_k: int = 5,
+                             cliente: Optional[str] = None, **query_kwargs) -> List[Any]:
+    """
+    Versión asíncrona: consultar los namespaces en paralelo dentro del event loop.
+    Args:
+        query_fn: Corrutina de consulta (p. ej. IndexAsyncio.query).
+        namespaces (List[str]): Namespaces a consultar.
+        timeout (float): Tiempo límite total en segundos.
+        top_k (int): Número de resultados a devolver.
+        cliente (str, opcional): Cliente de la búsqueda (filtro en el namespace por defecto).
+    Returns:
+        List: Matches fusionados por score.
+    """
+    if not namespaces:
+        return []
+
+    tasks = {
+        asyncio.ensure_future(
+            query_fn(top_k=top_k, namespace=namespace, **namespace_query_kwargs(namespace, cliente, query_kwargs))
+        ): namespace
+        for namespace in namespaces
+    }
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+
+    results = []
+    for task in done:
+        try:
+            results.append(task.result().matches)
+        except Exception as e:
+            logger.error(f"Error consultando namespace '{tasks[task]}': {e}")
+    if pending:
+        for task in pending:
+            task.cancel()
+        logger.warning(f"⏱️ {len(pending)} namespaces sin respuesta en {timeout}s")
+
+    return merge_matches(results, top_k)
@@ -0,0 +1,98 @@
+"""
+Proveedor compartido de clientes de OpenAI
+Un único cliente por proceso con pool de conexiones HTTP keep-alive, timeouts y
+política de reintentos comunes para todos los módulos.
+"""
+
+import os
+import logging
+import threading
+from typing import TYPE_CHECKING, Dict, Optional
+
+# El SDK de OpenAI (y httpx) se importan al crear el primer cliente
+if TYPE_CHECKING:
+    import httpx
+    from openai import OpenAI, AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Configuración del pool de conexiones
+OPENAI_POOL_SIZE = int(os.getenv("OPENAI_POOL_SIZE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+
+# Reintentos con backoff exponencial del SDK (429, 408, 409 y 5xx; respeta Retry-After)
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+
+_clients: Dict[str, "OpenAI"] = {}
+_async_clients: Dict[str, "AsyncOpenAI"] = {}
+_lock = threading.Lock()
+
+
+def _limits() -> "httpx.Limits":
+    import httpx
+    return httpx.Limits(
+        max_connections=OPENAI_POOL_SIZE,
+        max_keepalive_connections=OPENAI_POOL_SIZE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+    )
+
+
+def _timeout() -> "httpx.Timeout":
+    import httpx
+    return httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+
+def get_openai_client(api_key: Optional[str] = None) -> "OpenAI":
+    """
+    Obtener el cliente síncrono compartido de OpenAI.
+    Args:
+        api_key (str, opcional): API key de OpenAI. Si no se pasa, se toma de la variable de entorno.
+    Returns:
+        OpenAI: Cliente reutilizable entre llamadas e hilos.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    client = _clients.get(api_key)
+    if client is None:
+        with _lock:
+            client = _clients.get(api_key)
+            if client is None:
+                import httpx
+                from openai import OpenAI
+                client = OpenAI(
+                    api_key=api_key,
+                    max_retries=OPENAI_MAX_RETRIES,
+                    timeout=_timeout(),
+                    http_client=httpx.Client(limits=_limits(), timeout=_timeout())
+                )
+                _clients[api_key] = client
+                logger.info(f"🔌 Cliente de OpenAI inicializado (pool: {OPENAI_POOL_SIZE} conexiones)")
+    return client
+
+
+def get_async_openai_client(api_key: Optional[str] = None) -> "AsyncOpenAI":
+    """
+    Obtener el cliente asíncrono compartido de OpenAI (modo asyncio del bot).
+    Args:
+        api_key (str, opcional): API key de OpenAI. Si no se pasa, se toma de la variable de entorno.
+    Returns:
+        AsyncOpenAI: Cliente reutilizable dentro del event loop.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    client = _async_clients.get(api_key)
+    if client is None:
+        with _lock:
+            client = _async_clients.get(api_key)
+            if client is None:
+                import httpx
+                from openai import AsyncOpenAI
+                client = AsyncOpenAI(
+                    api_key=api_key,
+                    max_retries=OPENAI_MAX_RETRIES,
+                    timeout=_timeout(),
+                    http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+                )
+                _async_clients[api_key] = client
+                logger.info(f"🔌 Cliente asíncrono de OpenAI inicializado (pool: {OPENAI_POOL_SIZE} conexiones)")
+    return client
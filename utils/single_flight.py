@@ -0,0 +1,133 @@
+"""
+Coalescencia de consultas idénticas en curso (single-flight)
+Las peticiones concurrentes con la misma llave esperan una única ejecución del pipeline
+y reciben el mismo resultado.
+"""
+
+import json
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+from utils.embedding_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+def make_flight_key(query: str, filters: Optional[Dict[str, Any]] = None, stage: str = "pipeline") -> str:
+    """Llave de coalescencia: etapa + consulta normalizada + filtros"""
+    return f"{stage}:{normalize_query(query)}:{json.dumps(filters or {}, sort_keys=True, ensure_ascii=False)}"
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Single-flight para código síncrono (hilos del App de Bolt)"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.collapsed = 0
+
+    def do(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Ejecutar fn una sola vez por llave mientras haya una ejecución en curso.
+        Args:
+            key (str): Llave de coalescencia (ver make_flight_key).
+            fn: Función a ejecutar.
+        Returns:
+            Any: Resultado compartido de la ejecución.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.collapsed += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            logger.info(f"🔗 Consulta idéntica en curso, esperando resultado compartido ({key[:60]})")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logger.info(f"📣 Resultado compartido con {call.waiters} peticiones idénticas")
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Obtener métricas de coalescencia"""
+        with self._lock:
+            total = self.executions + self.collapsed
+            return {
+                "executions": self.executions,
+                "collapsed": self.collapsed,
+                "in_flight": len(self._calls),
+                "collapse_rate": self.collapsed / total if total else 0.0
+            }
+
+
+class AsyncSingleFlight:
+    """Single-flight para el modo asyncio del bot"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.executions = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            self.collapsed += 1
+            logger.info(f"🔗 Consulta idéntica en curso, esperando resultado compartido ({key[:60]})")
+            # shield: si un solicitante se cancela, la ejecución compartida continúa
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.executions += 1
+        try:
+            result = await fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Evitar el aviso de excepción no recuperada si nadie más esperaba
+            future.exception()
+            raise
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.executions + self.collapsed
+        return {
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._calls),
+            "collapse_rate": self.collapsed / total if total else 0.0
+        }
@@ -0,0 +1,159 @@
+"""
+Actualización incremental de mensajes de Slack para respuestas en streaming
+Agrupa los fragmentos del modelo y respeta los límites de chat.update por canal
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+SLACK_STREAM_UPDATE_INTERVAL = float(os.getenv("SLACK_STREAM_UPDATE_INTERVAL", "1.2"))
+SLACK_STREAM_MIN_CHARS = int(os.getenv("SLACK_STREAM_MIN_CHARS", "40"))
+STREAM_CURSOR = " ▌"
+
+# Último chat.update por canal, compartido por todas las respuestas en curso
+_channel_last_update: Dict[str, float] = {}
+_channel_blocked_until: Dict[str, float] = {}
+_channel_lock = threading.Lock()
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Extraer Retry-After de un SlackApiError con error 'ratelimited'"""
+    response = getattr(error, "response", None)
+    if response is None or response.get("error") != "ratelimited":
+        return None
+    headers = getattr(response, "headers", {}) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after") or 1
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class StreamThrottle:
+    """Decide cuándo enviar una actualización sin exceder el ritmo permitido por canal"""
+
+    def __init__(self, channel: str, interval: float = SLACK_STREAM_UPDATE_INTERVAL,
+                 min_chars: int = SLACK_STREAM_MIN_CHARS):
+        self.channel = channel
+        self.interval = interval
+        self.min_chars = min_chars
+        self.sent_length = 0
+        self.updates_sent = 0
+        self.updates_skipped = 0
+
+    def wait_time(self) -> float:
+        """Segundos que faltan para poder actualizar el canal"""
+        now = time.monotonic()
+        with _channel_lock:
+            next_allowed = max(
+                _channel_last_update.get(self.channel, 0.0) + self.interval,
+                _channel_blocked_until.get(self.channel, 0.0)
+            )
+        return max(0.0, next_allowed - now)
+
+    def should_send(self, text: str) -> bool:
+        """True si hay suficiente texto nuevo y el canal admite otra actualización"""
+        if len(text) - self.sent_length < self.min_chars:
+            return False
+        if self.wait_time() > 0:
+            self.updates_skipped += 1
+            return False
+        return True
+
+    def mark_sent(self, text: str):
+        with _channel_lock:
+            _channel_last_update[self.channel] = time.monotonic()
+        self.sent_length = len(text)
+        self.updates_sent += 1
+
+    def mark_rate_limited(self, retry_after: float):
+        logger.warning(f"⚠️ Slack limitó chat.update en {self.channel}, reintento en {retry_after:.1f}s")
+        with _channel_lock:
+            _channel_blocked_until[self.channel] = time.monotonic() + retry_after
+
+
+class SlackStreamUpdater:
+    """Actualiza un mensaje publicado a medida que llega el texto del modelo (cliente síncrono)"""
+
+    def __init__(self, client, channel: str, ts: str, render: Callable[[str], List[Dict[str, Any]]]):
+        self.client = client
+        self.ts = ts
+        self.render = render
+        self.throttle = StreamThrottle(channel)
+
+    def _send(self, text: str) -> bool:
+        try:
+            self.client.chat_update(
+                channel=self.throttle.channel,
+                ts=self.ts,
+                text=text[:3000],
+                blocks=self.render(text)
+            )
+            self.throttle.mark_sent(text)
+            return True
+        except Exception as e:
+            retry_after = _retry_after(e)
+            if retry_after is None:
+                raise
+            self.throttle.mark_rate_limited(retry_after)
+            return False
+
+    def update(self, text: str):
+        """Enviar una actualización intermedia si el throttle lo permite"""
+        if self.throttle.should_send(text):
+            self._send(text + STREAM_CURSOR)
+
+    def finish(self, text: str, max_attempts: int = 5):
+        """Enviar el texto final, esperando lo necesario para no exceder el límite"""
+        for _ in range(max_attempts):
+            time.sleep(self.throttle.wait_time())
+            if self._send(text):
+                logger.info(
+                    f"📡 Respuesta transmitida en {self.throttle.updates_sent} actualizaciones "
+                    f"({self.throttle.updates_skipped} agrupadas)"
+                )
+                return
+        logger.error(f"❌ No se pudo publicar la respuesta final en {self.throttle.channel}")
+
+
+class AsyncSlackStreamUpdater(SlackStreamUpdater):
+    """Variante para AsyncApp (cliente asíncrono de Slack)"""
+
+    async def _send(self, text: str) -> bool:
+        try:
+            await self.client.chat_update(
+                channel=self.throttle.channel,
+                ts=self.ts,
+                text=text[:3000],
+                blocks=self.render(text)
+            )
+            self.throttle.mark_sent(text)
+            return True
+        except Exception as e:
+            retry_after = _retry_after(e)
+            if retry_after is None:
+                raise
+            self.throttle.mark_rate_limited(retry_after)
+            return False
+
+    async def update(self, text: str):
+        if self.throttle.should_send(text):
+            await self._send(text + STREAM_CURSOR)
+
+    async def finish(self, text: str, max_attempts: int = 5):
+        for _ in range(max_attempts):
+            await asyncio.sleep(self.throttle.wait_time())
+            if await self._send(text):
+                logger.info(
+                    f"📡 Respuesta transmitida en {self.throttle.updates_sent} actualizaciones "
+                    f"({self.throttle.updates_skipped} agrupadas)"
+                )
+                return
+        logger.error(f"❌ No se pudo publicar la respuesta final en {self.throttle.channel}")
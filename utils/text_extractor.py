@@ -1,9 +1,9 @@
 import os
-from extractor.extractor_pdf import extract_text_from_pdf
-from extractor.extractor_word import extract_text_from_word
-from extractor.extractor_excel import extract_text_from_excel
-from extractor.extractor_csv import extract_text_from_csv
-from extractor.extractor_pptx import extract_text_from_pptx
+import itertools
+from typing import Iterable, Iterator, Tuple
+
+# Caracteres del inicio del documento que usan el resumen y el enriquecimiento de metadatos
+DOCUMENT_HEAD_CHARS = 4000
 
 def extract_text_from_file(file_path):
     """
@@ -19,15 +19,21 @@ def extract_text_from_file(file_path):
     file_extension = os.path.splitext(file_path)[1].lower()
     
     try:
+        # Cada extractor (y su dependencia pesada) se importa solo para su tipo de archivo
         if file_extension == '.pdf':
+            from extractor.extractor_pdf import extract_text_from_pdf
             return extract_text_from_pdf(file_path)
         elif file_extension == '.docx':
+            from extractor.extractor_word import extract_text_from_word
             return extract_text_from_word(file_path)
         elif file_extension == '.xlsx':
+            from extractor.extractor_excel import extract_text_from_excel
             return extract_text_from_excel(file_path)
         elif file_extension == '.csv':
+            from extractor.extractor_csv import extract_text_from_csv
             return extract_text_from_csv(file_path)
         elif file_extension == '.pptx':
+            from extractor.extractor_pptx import extract_text_from_pptx
             return extract_text_from_pptx(file_path)
         elif file_extension == '.txt':
             with open(file_path, 'r', encoding='utf-8') as f:
@@ -35,4 +41,84 @@ def extract_text_from_file(file_path):
         else:
             raise ValueError(f"Tipo de archivo no soportado: {file_extension}")
     except Exception as e:
-        raise Exception(f"Error al extraer texto de {file_path}: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Error al extraer texto de {file_path}: {str(e)}")
+
+def _iter_txt_paragraphs(file_path: str) -> Iterator[str]:
+    """Párrafos de un .txt (separados por líneas en blanco) leídos línea por línea"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        paragraph = []
+        for line in f:
+            if line.strip():
+                paragraph.append(line.rstrip('\n'))
+            elif paragraph:
+                yield "\n".join(paragraph)
+                paragraph = []
+        if paragraph:
+            yield "\n".join(paragraph)
+
+def iter_text_segments(file_path: str) -> Iterator[str]:
+    """
+    Genera el texto de un archivo por segmentos (páginas, párrafos, hojas o diapositivas)
+    para poder hacer chunking mientras la extracción continúa.
+    Args:
+        file_path (str): Ruta al archivo.
+    Yields:
+        str: Segmentos de texto en orden.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"El archivo {file_path} no existe")
+    
+    file_extension = os.path.splitext(file_path)[1].lower()
+    
+    try:
+        if file_extension == '.pdf':
+            from extractor.extractor_pdf import iter_pdf_pages
+            yield from iter_pdf_pages(file_path)
+        elif file_extension == '.docx':
+            from extractor.extractor_word import iter_word_paragraphs
+            yield from iter_word_paragraphs(file_path)
+        elif file_extension == '.xlsx':
+            from extractor.extractor_excel import iter_excel_sheets
+            yield from iter_excel_sheets(file_path)
+        elif file_extension == '.pptx':
+            from extractor.extractor_pptx import iter_pptx_slides
+            yield from iter_pptx_slides(file_path)
+        elif file_extension == '.txt':
+            yield from _iter_txt_paragraphs(file_path)
+        else:
+            # Formatos sin lectura incremental (p. ej. CSV): un solo segmento
+            yield extract_text_from_file(file_path)
+    except Exception as e:
+        raise Exception(f"Error al extraer texto de {file_path}: {str(e)}")
+
+def segment_separator(file_path: str) -> str:
+    """
+    Separador entre los segmentos de iter_text_segments para chunk_text_iter y read_head.
+    Los segmentos de PDF ya incluyen el salto entre páginas de extract_text_from_pdf.
+    """
+    if os.path.splitext(file_path)[1].lower() == '.pdf':
+        from extractor.extractor_pdf import PDF_SEGMENT_SEPARATOR
+        return PDF_SEGMENT_SEPARATOR
+    return "\n\n"
+
+def read_head(segments: Iterable[str], min_chars: int = DOCUMENT_HEAD_CHARS,
+              separator: str = "\n\n") -> Tuple[str, Iterator[str]]:
+    """
+    Leer segmentos hasta reunir min_chars caracteres sin perderlos para el chunking.
+    Args:
+        segments (Iterable[str]): Segmentos de texto.
+        min_chars (int): Caracteres mínimos del inicio del documento.
+        separator (str): Separador entre segmentos (ver segment_separator).
+    Returns:
+        Tuple[str, Iterator[str]]: Inicio del documento y un iterador con todos los segmentos.
+    """
+    iterator = iter(segments)
+    consumed = []
+    size = 0
+    for segment in iterator:
+        consumed.append(segment)
+        size += len(segment)
+        if size >= min_chars:
+            break
+    return separator.join(consumed), itertools.chain(consumed, iterator)
+
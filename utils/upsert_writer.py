@@ -0,0 +1,153 @@
+"""
+Escritor de upserts por lotes para la ingesta
+Acumula vectores en lotes acotados por número y por tamaño de la petición (Pinecone acepta
+hasta 1,000 vectores y 2 MB por upsert) y los envía en paralelo desde un pool de hilos.
+Un documento de 300 chunks se sube en unas pocas peticiones en lugar de 300.
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional
+
+from utils.metrics import span
+from utils.index_counters import get_index_counters
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+UPSERT_BATCH_BYTES = int(os.getenv("UPSERT_BATCH_BYTES", "1800000"))  # margen bajo el límite de 2 MB
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "4"))
+UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", "3"))
+
+# Bytes aproximados de un float en el JSON de la petición
+VALUE_BYTES = 20
+
+
+def estimate_vector_bytes(vector: Dict[str, Any]) -> int:
+    """Tamaño aproximado de un vector dentro de la petición de upsert"""
+    metadata = json.dumps(vector.get("metadata") or {}, ensure_ascii=False)
+    return len(vector["id"]) + len(vector["values"]) * VALUE_BYTES + len(metadata.encode("utf-8")) + 64
+
+
+class UpsertWriter:
+    """
+    Buffer de vectores con envío por lotes en paralelo.
+    Uso:
+        with UpsertWriter(index, namespace) as writer:
+            for vector in vectors:
+                writer.add(vector)
+        logger.info(writer.describe())
+    """
+
+    def __init__(self, store, namespace: str = "", batch_size: int = UPSERT_BATCH_SIZE,
+                 batch_bytes: int = UPSERT_BATCH_BYTES, concurrency: int = UPSERT_CONCURRENCY,
+                 max_retries: int = UPSERT_MAX_RETRIES):
+        self.store = store
+        self.namespace = namespace
+        self.batch_size = max(1, batch_size)
+        self.batch_bytes = max(1, batch_bytes)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="upsert")
+        self._pending: Deque[Future] = deque()
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_bytes = 0
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._elapsed: Optional[float] = None
+
+        # Métricas
+        self.vectors = 0
+        self.requests = 0
+        self.retries = 0
+
+    def _send(self, batch: List[Dict[str, Any]]):
+        """Subir un lote con reintentos (los IDs no cambian: un reintento no duplica vectores)"""
+        attempt = 0
+        while True:
+            try:
+                with span("ingesta", "upsert"):
+                    self.store.upsert(vectors=batch, namespace=self.namespace)
+                break
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = random.uniform(0, 2 ** attempt)
+                logger.warning(f"⏳ Reintentando upsert de {len(batch)} vectores en {delay:.1f}s "
+                               f"(intento {attempt + 1}/{self.max_retries}): {e}")
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+                attempt += 1
+        get_index_counters().record_upsert(batch, namespace=self.namespace)
+        with self._lock:
+            self.vectors += len(batch)
+            self.requests += 1
+
+    def _wait(self, limit: int):
+        # Contrapresión: un lote fallido se propaga al llamador
+        while len(self._pending) > limit:
+            self._pending.popleft().result()
+
+    def add(self, vector: Dict[str, Any]):
+        """Agregar un vector; se envía un lote cuando se alcanza el límite de vectores o bytes"""
+        size = estimate_vector_bytes(vector)
+        if self._buffer and (len(self._buffer) >= self.batch_size or self._buffer_bytes + size > self.batch_bytes):
+            self.flush()
+        self._buffer.append(vector)
+        self._buffer_bytes += size
+
+    def flush(self):
+        """Enviar el lote en curso sin esperar a que termine"""
+        if not self._buffer:
+            return
+        self._pending.append(self._executor.submit(self._send, self._buffer))
+        self._buffer, self._buffer_bytes = [], 0
+        self._wait(self.concurrency)
+
+    def close(self):
+        """Enviar lo pendiente y esperar todos los lotes"""
+        try:
+            self.flush()
+            self._wait(0)
+        finally:
+            self._elapsed = time.perf_counter() - self._started
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # El documento ya falló: descartar el buffer y no enmascarar el error original
+            self._buffer = []
+            self._pending.clear()
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._elapsed = time.perf_counter() - self._started
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Vectores subidos, peticiones y throughput"""
+        elapsed = self._elapsed if self._elapsed is not None else time.perf_counter() - self._started
+        with self._lock:
+            return {
+                "vectors": self.vectors,
+                "requests": self.requests,
+                "retries": self.retries,
+                "seconds": elapsed,
+                "vectors_per_second": self.vectors / elapsed if elapsed > 0 else 0.0
+            }
+
+    def describe(self) -> str:
+        stats = self.stats()
+        return (f"{stats['vectors']} vectores en {stats['requests']} peticiones "
+                f"({stats['vectors_per_second']:.0f} vectores/s)")
@@ -0,0 +1,665 @@
+"""
+Abstracción del almacén vectorial
+Backend 'pinecone' (por defecto) o 'local': embeddings float16/int8 en un archivo mapeado en
+memoria con búsqueda por fuerza bruta en NumPy (o índice IVF opcional) y filtros de metadatos.
+"""
+
+import os
+import json
+import fcntl
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", "local_vector_store")
+LOCAL_VECTOR_DTYPE = os.getenv("LOCAL_VECTOR_DTYPE", "float16")  # float16 | int8
+LOCAL_VECTOR_IVF_NLIST = int(os.getenv("LOCAL_VECTOR_IVF_NLIST", "0"))  # 0 = fuerza bruta
+LOCAL_VECTOR_IVF_NPROBE = int(os.getenv("LOCAL_VECTOR_IVF_NPROBE", "8"))
+
+
+@dataclass
+class VectorMatch:
+    """Resultado de una consulta (misma forma que los matches de Pinecone)"""
+    id: str
+    score: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    values: List[float] = field(default_factory=list)
+
+
+@dataclass
+class QueryResult:
+    matches: List[VectorMatch]
+    namespace: str = ""
+
+
+@dataclass
+class IdPage:
+    """Página de IDs de un namespace (pagination_token=None en la última)"""
+    ids: List[str]
+    pagination_token: Optional[str] = None
+
+
+@dataclass
+class NamespaceStats:
+    vector_count: int
+
+
+@dataclass
+class IndexStats:
+    total_vector_count: int
+    dimension: int
+    namespaces: Dict[str, NamespaceStats]
+
+
+class VectorStore:
+    """Interfaz común de los backends (subconjunto de la API de índices de Pinecone)"""
+
+    backend = "base"
+
+    def ensure_index(self, dimension: int, metric: str = "cosine"):
+        """Crear el índice si no existe"""
+        raise NotImplementedError
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str = "") -> int:
+        raise NotImplementedError
+
+    def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None,
+              namespace: str = "", include_metadata: bool = True, include_values: bool = False) -> QueryResult:
+        raise NotImplementedError
+
+    def update(self, id: str, set_metadata: Dict[str, Any], namespace: str = ""):
+        raise NotImplementedError
+
+    def delete(self, ids: List[str], namespace: str = ""):
+        raise NotImplementedError
+
+    def describe_index_stats(self) -> IndexStats:
+        raise NotImplementedError
+
+    def list_ids(self, namespace: str = "", limit: int = 100, pagination_token: Optional[str] = None) -> IdPage:
+        """Listar los IDs de un namespace por páginas"""
+        raise NotImplementedError
+
+    def fetch(self, ids: List[str], namespace: str = "") -> Dict[str, Dict[str, Any]]:
+        """
+        Leer vectores por ID.
+        Returns:
+            Dict[str, Dict[str, Any]]: id -> {"id", "values", "metadata"} (misma forma que upsert).
+        """
+        raise NotImplementedError
+
+
+class PineconeVectorStore(VectorStore):
+    """Backend remoto: delega en un índice de Pinecone"""
+
+    backend = "pinecone"
+
+    def __init__(self, api_key: Optional[str] = None, index_name: Optional[str] = None):
+        self.api_key = api_key or os.getenv("PINECONE_API_KEY")
+        self.index_name = index_name or os.getenv("PINECONE_INDEX_NAME", "default-index")
+        self._pc = None
+        self._index = None
+
+    @property
+    def pc(self):
+        # El SDK de Pinecone se importa y el cliente se crea en el primer uso
+        if self._pc is None:
+            from pinecone import Pinecone
+            self._pc = Pinecone(api_key=self.api_key)
+        return self._pc
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = self.pc.Index(self.index_name)
+        return self._index
+
+    def ensure_index(self, dimension: int, metric: str = "cosine"):
+        # Verificar si el índice existe y su dimensión
+        existing_indexes = self.pc.list_indexes().names()
+        if self.index_name in existing_indexes:
+            index_info = self.pc.describe_index(self.index_name)
+            if hasattr(index_info, 'dimension') and index_info.dimension != dimension:
+                logger.warning(f"Eliminando índice '{self.index_name}' con dimensión incorrecta ({index_info.dimension})...")
+                self.pc.delete_index(self.index_name)
+                existing_indexes = self.pc.list_indexes().names()
+
+        # Crear el índice si no existe
+        if self.index_name not in existing_indexes:
+            logger.info(f"Creando índice: {self.index_name}")
+            self.pc.create_index(name=self.index_name, dimension=dimension, metric=metric)
+            self._index = None
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str = "") -> int:
+        self.index.upsert(vectors=vectors, namespace=namespace)
+        return len(vectors)
+
+    def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None,
+              namespace: str = "", include_metadata: bool = True, include_values: bool = False):
+        query_kwargs = {
+            "vector": vector,
+            "top_k": top_k,
+            "include_metadata": include_metadata,
+            "include_values": include_values,
+            "namespace": namespace
+        }
+        if filter:
+            query_kwargs["filter"] = filter
+        return self.index.query(**query_kwargs)
+
+    def update(self, id: str, set_metadata: Dict[str, Any], namespace: str = ""):
+        self.index.update(id=id, set_metadata=set_metadata, namespace=namespace)
+
+    def delete(self, ids: List[str], namespace: str = ""):
+        if ids:
+            self.index.delete(ids=list(ids), namespace=namespace)
+
+    def describe_index_stats(self):
+        return self.index.describe_index_stats()
+
+    def list_ids(self, namespace: str = "", limit: int = 100, pagination_token: Optional[str] = None) -> IdPage:
+        # list_paginated solo está disponible en índices serverless
+        response = self.index.list_paginated(namespace=namespace, limit=limit, pagination_token=pagination_token)
+        pagination = getattr(response, "pagination", None)
+        return IdPage(
+            ids=[vector.id for vector in response.vectors],
+            pagination_token=getattr(pagination, "next", None) or None
+        )
+
+    def fetch(self, ids: List[str], namespace: str = "") -> Dict[str, Dict[str, Any]]:
+        if not ids:
+            return {}
+        response = self.index.fetch(ids=list(ids), namespace=namespace)
+        return {
+            vector_id: {"id": vector_id, "values": list(vector.values or []), "metadata": dict(vector.metadata or {})}
+            for vector_id, vector in response.vectors.items()
+        }
+
+
+def _matches_condition(value: Any, condition: Any) -> bool:
+    """Evaluar una condición de filtro estilo Pinecone sobre un valor de metadatos"""
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+
+    for operator, expected in condition.items():
+        if operator == "$eq":
+            ok = expected in value if isinstance(value, list) else value == expected
+        elif operator == "$ne":
+            ok = expected not in value if isinstance(value, list) else value != expected
+        elif operator == "$in":
+            ok = any(item in expected for item in value) if isinstance(value, list) else value in expected
+        elif operator == "$nin":
+            ok = not any(item in expected for item in value) if isinstance(value, list) else value not in expected
+        elif operator == "$exists":
+            ok = (value is not None) == bool(expected)
+        elif operator in ("$gt", "$gte", "$lt", "$lte"):
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                return False
+            ok = {
+                "$gt": value > expected,
+                "$gte": value >= expected,
+                "$lt": value < expected,
+                "$lte": value <= expected
+            }[operator]
+        else:
+            raise ValueError(f"Operador de filtro no soportado: {operator}")
+        if not ok:
+            return False
+    return True
+
+
+def matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """Evaluar un filtro de metadatos con la sintaxis de Pinecone ($eq, $in, $and, $or, ...)"""
+    if not filter:
+        return True
+
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub_filter) for sub_filter in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub_filter) for sub_filter in condition):
+                return False
+        elif not _matches_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Backend local: vectores normalizados en un archivo mapeado en memoria (float16 o int8)
+    y metadatos en SQLite. La similitud es coseno, igual que el índice de Pinecone.
+
+    Varios procesos pueden compartir el directorio (p. ej. el bot y auto_updater por cron):
+    las escrituras toman un flock exclusivo y cada instancia recarga su estado en memoria
+    cuando otro proceso cambió el almacén (número de generación en store.json).
+    """
+
+    backend = "local"
+    INT8_SCALE = 127.0
+
+    def __init__(self, directory: str = LOCAL_VECTOR_STORE_DIR, dtype: str = LOCAL_VECTOR_DTYPE,
+                 ivf_nlist: int = LOCAL_VECTOR_IVF_NLIST, ivf_nprobe: int = LOCAL_VECTOR_IVF_NPROBE):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Tipo de dato no soportado para el almacén local: {dtype}")
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe
+        self._lock = threading.RLock()
+
+        self._state_path = os.path.join(directory, "store.json")
+        self._vectors_path = os.path.join(directory, f"vectors.{dtype}.mmap")
+        self._lock_path = os.path.join(directory, "store.lock")
+        self._lock_file = None
+        self._lock_depth = 0
+        self.dimension: Optional[int] = None
+        self.capacity: int = 0
+        self.count: int = 0
+        self.generation: int = 0
+        self._state_signature = None
+
+        self._conn = sqlite3.connect(os.path.join(directory, "metadata.db"), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS vectors (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                namespace TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_vectors_id ON vectors (id, namespace)")
+        self._conn.commit()
+
+        # Estado en memoria: fila -> (id, namespace, metadata, vivo)
+        self._ids: List[str] = []
+        self._namespaces: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._namespace_codes = np.zeros(0, dtype=np.int32)
+        self._codes_by_namespace: Dict[str, int] = {}
+        self._row_by_key: Dict[tuple, int] = {}
+        self._matrix = None
+
+        # Índice IVF (se reconstruye tras cambios)
+        self._centroids = None
+        self._assignments = None
+        self._ivf_dirty = True
+
+        with self._lock, self._file_lock(exclusive=False):
+            self._load()
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """flock entre procesos (reentrante dentro del mismo proceso; se toma con self._lock)"""
+        if self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+        self._lock_file = open(self._lock_path, "a+")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self._lock_depth = 1
+        try:
+            yield
+        finally:
+            self._lock_depth = 0
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _signature(self):
+        # store.json se reemplaza atómicamente: cada escritura cambia el inodo
+        try:
+            stat = os.stat(self._state_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read_state(self) -> Dict[str, Any]:
+        if not os.path.exists(self._state_path):
+            return {}
+        with open(self._state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _load(self):
+        """Cargar (o recargar) el estado completo desde disco"""
+        self._state_signature = self._signature()
+        state = self._read_state()
+        self.dimension = state.get("dimension")
+        self.capacity = state.get("capacity", 0)
+        self.count = state.get("count", 0)
+        self.generation = state.get("generation", 0)
+        self._codes_by_namespace = {}
+        self._row_by_key = {}
+        self._load_rows()
+        self._matrix = None
+        self._open_matrix()
+        self._ivf_dirty = True
+
+    def _refresh(self):
+        """Recargar si otro proceso modificó el almacén desde la última lectura"""
+        if self._signature() == self._state_signature:
+            return
+        with self._file_lock(exclusive=False):
+            self._state_signature = self._signature()
+            if self._read_state().get("generation", 0) != self.generation:
+                logger.info("🔄 Almacén vectorial local modificado por otro proceso, recargando")
+                self._load()
+
+    @contextmanager
+    def _writing(self):
+        """Escritura: lock exclusivo entre procesos sobre el estado más reciente"""
+        with self._lock, self._file_lock(exclusive=True):
+            self._refresh()
+            yield
+
+    def _load_rows(self):
+        rows = self._conn.execute("SELECT row, id, namespace, metadata, deleted FROM vectors ORDER BY row").fetchall()
+        self._ids = [""] * self.count
+        self._namespaces = [""] * self.count
+        self._metadata = [{} for _ in range(self.count)]
+        self._alive = np.zeros(self.count, dtype=bool)
+        self._namespace_codes = np.zeros(self.count, dtype=np.int32)
+        for row, vector_id, namespace, metadata, deleted in rows:
+            if row >= self.count:
+                continue
+            self._ids[row] = vector_id
+            self._namespaces[row] = namespace
+            self._namespace_codes[row] = self._namespace_code(namespace)
+            self._metadata[row] = json.loads(metadata)
+            self._alive[row] = not deleted
+            if not deleted:
+                self._row_by_key[(vector_id, namespace)] = row
+
+    def _namespace_code(self, namespace: str) -> int:
+        return self._codes_by_namespace.setdefault(namespace, len(self._codes_by_namespace))
+
+    def _save_state(self):
+        # Cada escritura avanza la generación para que los demás procesos recarguen
+        self.generation += 1
+        tmp_path = f"{self._state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"dimension": self.dimension, "capacity": self.capacity, "count": self.count,
+                       "dtype": self.dtype.name, "generation": self.generation}, f)
+        os.replace(tmp_path, self._state_path)
+        self._state_signature = self._signature()
+
+    def _open_matrix(self):
+        if self.dimension and self.capacity:
+            self._matrix = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+",
+                                     shape=(self.capacity, self.dimension))
+
+    def _ensure_capacity(self, needed: int):
+        if needed <= self.capacity:
+            return
+        new_capacity = max(needed, self.capacity * 2, 1024)
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dimension * self.dtype.itemsize)
+        self.capacity = new_capacity
+        self._open_matrix()
+
+    def _encode(self, values: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        normalized = values / norms
+        if self.dtype == np.int8:
+            return np.clip(np.round(normalized * self.INT8_SCALE), -127, 127).astype(np.int8)
+        return normalized.astype(np.float16)
+
+    def _decode(self, rows) -> np.ndarray:
+        block = np.asarray(self._matrix[rows], dtype=np.float32)
+        if self.dtype == np.int8:
+            block /= self.INT8_SCALE
+        return block
+
+    # ------------------------------------------------------------------
+    # API de VectorStore
+    # ------------------------------------------------------------------
+
+    def ensure_index(self, dimension: int, metric: str = "cosine"):
+        with self._writing():
+            if self.dimension is None:
+                self.dimension = dimension
+                self._save_state()
+            elif self.dimension != dimension:
+                raise ValueError(f"El almacén local tiene dimensión {self.dimension}, no {dimension}")
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str = "") -> int:
+        if not vectors:
+            return 0
+
+        values = np.asarray([vector["values"] for vector in vectors], dtype=np.float32)
+        with self._writing():
+            if self.dimension is None:
+                self.ensure_index(values.shape[1])
+            if values.shape[1] != self.dimension:
+                raise ValueError(f"Dimensión {values.shape[1]} no coincide con el almacén ({self.dimension})")
+
+            encoded = self._encode(values)
+            new_rows = len({vector["id"] for vector in vectors if (vector["id"], namespace) not in self._row_by_key})
+            self._ensure_capacity(self.count + new_rows)
+            self._alive = np.concatenate([self._alive, np.zeros(new_rows, dtype=bool)])
+            self._namespace_codes = np.concatenate([
+                self._namespace_codes,
+                np.full(new_rows, self._namespace_code(namespace), dtype=np.int32)
+            ])
+
+            for vector, vector_values in zip(vectors, encoded):
+                key = (vector["id"], namespace)
+                metadata = vector.get("metadata") or {}
+                row = self._row_by_key.get(key)
+                if row is None:
+                    row = self.count
+                    self.count += 1
+                    self._ids.append(vector["id"])
+                    self._namespaces.append(namespace)
+                    self._metadata.append(metadata)
+                    self._alive[row] = True
+                    self._row_by_key[key] = row
+                else:
+                    self._metadata[row] = metadata
+                self._matrix[row] = vector_values
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO vectors (row, id, namespace, metadata, deleted) VALUES (?, ?, ?, ?, 0)",
+                    (row, vector["id"], namespace, json.dumps(metadata, ensure_ascii=False))
+                )
+
+            self._matrix.flush()
+            self._conn.commit()
+            self._save_state()
+            self._ivf_dirty = True
+        return len(vectors)
+
+    def _candidate_rows(self, query: np.ndarray, namespace: str, filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        mask = self._alive.copy()
+        if namespace is not None:
+            code = self._codes_by_namespace.get(namespace)
+            if code is None:
+                return np.zeros(0, dtype=np.int64)
+            mask &= self._namespace_codes == code
+
+        rows = np.flatnonzero(mask)
+        if self.ivf_nlist and len(rows) > self.ivf_nlist * 39:
+            rows = self._ivf_probe(query, rows)
+        if filter:
+            rows = np.asarray([row for row in rows if matches_filter(self._metadata[row], filter)], dtype=np.int64)
+        return rows
+
+    def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None,
+              namespace: str = "", include_metadata: bool = True, include_values: bool = False) -> QueryResult:
+        with self._lock:
+            self._refresh()
+            if not self.count or self._matrix is None:
+                return QueryResult(matches=[], namespace=namespace or "")
+
+            query = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if norm:
+                query = query / norm
+
+            rows = self._candidate_rows(query, namespace, filter)
+            if not len(rows):
+                return QueryResult(matches=[], namespace=namespace or "")
+
+            candidates = self._decode(rows)
+            scores = candidates @ query
+            k = min(top_k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            matches = [
+                VectorMatch(
+                    id=self._ids[rows[i]],
+                    score=float(scores[i]),
+                    metadata=dict(self._metadata[rows[i]]) if include_metadata else {},
+                    values=candidates[i].tolist() if include_values else []
+                )
+                for i in top
+            ]
+            return QueryResult(matches=matches, namespace=namespace or "")
+
+    def update(self, id: str, set_metadata: Dict[str, Any], namespace: str = ""):
+        with self._writing():
+            row = self._row_by_key.get((id, namespace))
+            if row is None:
+                return
+            self._metadata[row] = {**self._metadata[row], **set_metadata}
+            self._conn.execute(
+                "UPDATE vectors SET metadata = ? WHERE row = ?",
+                (json.dumps(self._metadata[row], ensure_ascii=False), row)
+            )
+            self._conn.commit()
+            self._save_state()
+
+    def delete(self, ids: List[str], namespace: str = ""):
+        with self._writing():
+            for vector_id in ids:
+                row = self._row_by_key.pop((vector_id, namespace), None)
+                if row is None:
+                    continue
+                self._alive[row] = False
+                self._conn.execute("UPDATE vectors SET deleted = 1 WHERE row = ?", (row,))
+            self._conn.commit()
+            self._save_state()
+            self._ivf_dirty = True
+
+    def describe_index_stats(self) -> IndexStats:
+        with self._lock:
+            self._refresh()
+            namespaces: Dict[str, int] = {}
+            for row in np.flatnonzero(self._alive):
+                namespaces[self._namespaces[row]] = namespaces.get(self._namespaces[row], 0) + 1
+            return IndexStats(
+                total_vector_count=int(self._alive.sum()),
+                dimension=self.dimension or 0,
+                namespaces={name: NamespaceStats(vector_count=count) for name, count in namespaces.items()}
+            )
+
+    def list_ids(self, namespace: str = "", limit: int = 100, pagination_token: Optional[str] = None) -> IdPage:
+        # El token es la siguiente fila del archivo a revisar
+        with self._lock:
+            self._refresh()
+            start = int(pagination_token or 0)
+            code = self._codes_by_namespace.get(namespace)
+            if code is None:
+                return IdPage(ids=[])
+            rows = np.flatnonzero(self._alive[start:] & (self._namespace_codes[start:] == code)) + start
+            page = rows[:limit]
+            next_token = str(int(page[-1]) + 1) if len(rows) > limit else None
+            return IdPage(ids=[self._ids[row] for row in page], pagination_token=next_token)
+
+    def fetch(self, ids: List[str], namespace: str = "") -> Dict[str, Dict[str, Any]]:
+        # Los valores salen normalizados y con la precisión del almacén (float16/int8)
+        with self._lock:
+            self._refresh()
+            found = [(vector_id, self._row_by_key[(vector_id, namespace)])
+                     for vector_id in ids if (vector_id, namespace) in self._row_by_key]
+            if not found:
+                return {}
+            values = self._decode([row for _, row in found])
+            return {
+                vector_id: {"id": vector_id, "values": values[i].tolist(), "metadata": dict(self._metadata[row])}
+                for i, (vector_id, row) in enumerate(found)
+            }
+
+    # ------------------------------------------------------------------
+    # IVF
+    # ------------------------------------------------------------------
+
+    def _build_ivf(self, iterations: int = 10):
+        """Entrenar centroides con k-means sobre los vectores vivos"""
+        rows = np.flatnonzero(self._alive)
+        data = self._decode(rows)
+        rng = np.random.default_rng(0)
+        centroids = data[rng.choice(len(rows), self.ivf_nlist, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(data @ centroids.T, axis=1)
+            for cluster in range(self.ivf_nlist):
+                members = data[assignments == cluster]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[cluster] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        self._centroids = centroids
+        self._assignments = np.full(self.count, -1, dtype=np.int32)
+        self._assignments[rows] = np.argmax(data @ centroids.T, axis=1)
+        self._ivf_dirty = False
+        logger.info(f"🧭 Índice IVF reconstruido: {self.ivf_nlist} listas, {len(rows)} vectores")
+
+    def _ivf_probe(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        if self._ivf_dirty or self._assignments is None or len(self._assignments) != self.count:
+            self._build_ivf()
+        nprobe = min(self.ivf_nprobe, self.ivf_nlist)
+        probes = np.argsort(-(self._centroids @ query))[:nprobe]
+        return rows[np.isin(self._assignments[rows], probes)]
+
+
+# Instancia global (se crea en el primer uso)
+_vector_store: Optional[VectorStore] = None
+_vector_store_lock = threading.Lock()
+
+
+def get_vector_store(backend: Optional[str] = None) -> VectorStore:
+    """
+    Obtener el almacén vectorial configurado.
+    Args:
+        backend (str, opcional): 'pinecone' o 'local'. Por defecto VECTOR_STORE_BACKEND.
+    Returns:
+        VectorStore: Instancia compartida del backend.
+    """
+    global _vector_store
+    backend = backend or VECTOR_STORE_BACKEND
+    if _vector_store is None or _vector_store.backend != backend:
+        with _vector_store_lock:
+            if _vector_store is None or _vector_store.backend != backend:
+                if backend == "local":
+                    _vector_store = LocalVectorStore()
+                elif backend == "pinecone":
+                    _vector_store = PineconeVectorStore()
+                else:
+                    raise ValueError(f"Backend de almacén vectorial no soportado: {backend}")
+                logger.info(f"🗃️ Almacén vectorial: {backend}")
+    return _vector_store
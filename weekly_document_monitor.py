@@ -11,8 +11,14 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Set
 from dotenv import load_dotenv
+
+# Cargar variables de entorno antes de importar utils (sus módulos leen la configuración al importarse)
+load_dotenv()
+
 from initial_document_analysis import InitialDocumentAnalyzer
 from metadata_enricher import generate_folder_report
+from utils.index_counters import get_index_counters
+from utils.vector_store import get_vector_store
 
 # Configurar logging
 logging.basicConfig(
@@ -53,22 +59,18 @@ class WeeklyDocumentMonitor:
     def generate_weekly_report(self):
         """Generar reporte semanal"""
         try:
-            # Obtener estadísticas del índice Pinecone
-            stats = self.analyzer.index.describe_index_stats()
-            total_vectors = stats.total_vector_count
-            
-            # Contar vectores con metadatos enriquecidos
-            enriched_count = 0
-            try:
-                query_response = self.analyzer.index.query(
-                    vector=[0] * 1536,
-                    top_k=1000,
-                    include_metadata=True,
-                    filter={"metadata_enriquecido": {"$eq": True}}
-                )
-                enriched_count = len(query_response.matches)
-            except:
-                enriched_count = "N/A"
+            # Contadores locales mantenidos por la ingesta (sin consultar el índice); la primera vez
+            # se registran los vectores que ya existían
+            get_index_counters().backfill(get_vector_store())
+            counters = get_index_counters().summary()
+            total_vectors = counters["total"]
+            enriched_count = counters["enriquecidos"]
+            desglose_clientes = "\n".join(
+                f"  - {cliente}: {count:,}" for cliente, count in counters["por_cliente"].items()
+            ) or "  - Sin datos"
+            desglose_tipos = "\n".join(
+                f"  - {tipo}: {count:,}" for tipo, count in counters["por_tipo_documento"].items()
+            ) or "  - Sin datos"
             
             # Generar reporte
             report = f"""
@@ -79,7 +81,12 @@ Período: Última semana
 
 📈 ESTADÍSTICAS DE LA BASE DE DATOS:
 • Total de vectores en Pinecone: {total_vectors:,}
-• Vectores con metadatos enriquecidos: {enriched_count}
+• Vectores con metadatos enriquecidos: {enriched_count:,}
+• Última actualización del índice: {counters['ultima_actualizacion'] or 'Nunca'}
+• Vectores por cliente:
+{desglose_clientes}
+• Vectores por tipo de documento:
+{desglose_tipos}
 • Archivos analizados esta semana: {self.analyzer.analysis_status.get('processed_files', 0)}
 • Archivos fallidos: {len(self.analyzer.analysis_status.get('failed_files', []))}
 
@@ -120,6 +127,9 @@ Período: Última semana
                 "fecha": datetime.now().isoformat(),
                 "total_vectores": total_vectors,
                 "vectores_enriquecidos": enriched_count,
+                "vectores_por_cliente": counters["por_cliente"],
+                "vectores_por_tipo_documento": counters["por_tipo_documento"],
+                "ultima_actualizacion_indice": counters["ultima_actualizacion"],
                 "archivos_procesados": self.analyzer.analysis_status.get('processed_files', 0),
                 "archivos_fallidos": len(self.analyzer.analysis_status.get('failed_files', [])),
                 "nuevos_archivos": self.count_new_files(),
@@ -226,8 +236,8 @@ Período: Última semana
             
             # Verificar OpenAI
             try:
-                from openai import OpenAI
-                client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+                from utils.openai_client import get_openai_client
+                client = get_openai_client()
                 response = client.chat.completions.create(
                     model="gpt-4o",
                     messages=[{"role": "user", "content": "test"}],